@@ -1,63 +1,182 @@
 # agents.py — Multi-agent orchestration aligned with ChatOpenAI (OpenAI)
 # Fix: ChatOpenAI.invoke returns AIMessage; we now extract .content safely.
 
-from typing import List, Dict, Any, Tuple
-from langchain_rag import qa_chain, LLM  # LLM is ChatOpenAI
+import os
+import re
+import json
+import time
+import threading
+from typing import List, Dict, Any, Tuple, Optional, Callable
 
-# --------------------------- Utilities ---------------------------
+import numpy as np
+from langchain_rag import qa_chain, llm_complete, pinned_index, chunk_id, source_info, retrieve_scored, EMB, CFG
+from llm_gateway import priority
+from prompts import generate_related_queries, classify_intent, get_intent_policy
+import tracing
+import querylog
+
+# Profile definitions live in profiles.py (importable without the pipeline).
+from profiles import PIPELINE_PROFILES, get_profile
 
-def _llm_text(resp) -> str:
-    """Return plain text from a LangChain message/response."""
-    return getattr(resp, "content", str(resp)) or ""
+# --------------------------- Utilities ---------------------------
 
-def generate_related_queries(q: str) -> List[str]:
-    """Heuristic expansion for coverage without going off-topic (kept small for speed)."""
-    ql = q.lower()
-    if any(k in ql for k in ["why", "cause", "reason", "sour", "bitter", "channel"]):
-        return [q, f"{q} cause"]  # keep it to 2 to avoid long runs
-    if any(k in ql for k in ["difference", "vs", "compare", "comparison"]):
-        return [q, f"{q} key differences"]
-    return [q, f"{q} overview"]
+def _add_usage(stats: Optional[Dict[str, Any]], usage: Optional[Dict[str, int]]) -> None:
+    """Accumulate token usage and LLM call count into a stats dict (if given)."""
+    if stats is None or usage is None:
+        return
+    stats["input_tokens"] = stats.get("input_tokens", 0) + usage.get("input_tokens", 0)
+    stats["output_tokens"] = stats.get("output_tokens", 0) + usage.get("output_tokens", 0)
+    stats["llm_calls"] = stats.get("llm_calls", 0) + 1
 
 def _doc_key(d: Any) -> Tuple[str, str]:
-    title = d.metadata.get("title") or d.metadata.get("source", "Unknown")
+    src = source_info(d)
+    title = src.get("title") or src.get("source", "Unknown")
     sid = d.metadata.get("id", "?")
     return (title, sid)
 
-def build_evidence(results: List[Dict[str, Any]], max_chars: int = 450) -> str:
-    """Flatten and de-duplicate source documents into a numbered EVIDENCE block."""
-    seen = set()
-    flat_docs = []
+def _flatten_docs(results: List[Dict[str, Any]]) -> List[Any]:
+    """Unique chunks across research passes, in retrieval order.
+
+    Keyed by chunk_id (source id, page, content hash): several chunks of one
+    page are distinct evidence, the same chunk retrieved twice is not.
+    """
+    seen, docs = set(), []
     for r in results:
         for d in r.get("source_documents", []) or []:
-            k = _doc_key(d)
-            if k in seen:
-                continue
-            seen.add(k)
-            title, sid = k
-            excerpt = (d.page_content or "")[:max_chars]
-            flat_docs.append((title, sid, excerpt))
-
-    lines = []
-    for i, (title, sid, excerpt) in enumerate(flat_docs, start=1):
-        lines.append(f"[{i}] {title} (id:{sid})\n{excerpt}")
+            key = chunk_id(d)
+            if key not in seen:
+                seen.add(key)
+                docs.append(d)
+    return docs
+
+def _format_evidence(items: List[Tuple[str, str, str]]) -> str:
+    lines = [f"[{i}] {title} (id:{sid})\n{excerpt}" for i, (title, sid, excerpt) in enumerate(items, start=1)]
     return "EVIDENCE (use only what follows; cite by bracket number):\n" + "\n\n".join(lines)
 
-# --------------------------- Agents ------------------------------
+# ---------------------- Evidence compression ---------------------
+# Near-identical excerpts (overlapping chunks, sources repeating the same
+# advice) are dropped, then the most question-relevant, least redundant
+# sentences are kept under `evidence_max_tokens`. Citation numbers are
+# assigned after compression, and the same block goes to every agent prompt.
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
 
-def researcher(query: str) -> Dict[str, Any]:
-    """Agent 1 — RAG lookup (grounded answer + docs)."""
-    return qa_chain(query)  # {"result": str, "source_documents": [...]}
+def _unit_rows(vectors: List[List[float]]) -> np.ndarray:
+    m = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    return m / np.where(norms == 0, 1.0, norms)
 
-def synthesizer(question: str, results: List[Dict[str, Any]]) -> str:
-    """Agent 2 — Merge several RAG passes into one concise, grounded draft."""
-    evidence = build_evidence(results)
+def _compress(question: str, docs: List[Any], max_tokens: int,
+              dedup_threshold: float, mmr_lambda: float) -> List[Tuple[int, str]]:
+    """(index into docs, excerpt) pairs: redundant excerpts dropped, sentences picked by MMR under a token cap."""
+    if not docs:
+        return []
+    # 1) drop excerpts nearly identical to an earlier (higher-ranked) one
+    vecs = _unit_rows(EMB.embed_documents([(d.page_content or "")[:1000] for d in docs]))
+    sims = vecs @ vecs.T
+    kept: List[int] = []
+    for i in range(len(docs)):
+        if not kept or sims[i, kept].max() < dedup_threshold:
+            kept.append(i)
+
+    # 2) greedy MMR over the kept excerpts' sentences
+    sents: List[Tuple[int, int, str]] = []  # (excerpt, position, text)
+    for doc_i in kept:
+        for pos, sent in enumerate(s.strip() for s in _SENTENCE.split(docs[doc_i].page_content or "")):
+            if len(sent) > 20:
+                sents.append((doc_i, pos, sent))
+    if not sents:
+        return [(i, (docs[i].page_content or "")[:450]) for i in kept]
+    q = _unit_rows(EMB.embed_query(question))
+    svecs = _unit_rows(EMB.embed_documents([t for _, _, t in sents]))
+    rel = svecs @ q
+    costs = np.array([len(t) // 4 + 1 for _, _, t in sents])  # ~4 chars per token
+    max_sim = np.zeros(len(sents), dtype=np.float32)  # similarity to the closest chosen sentence
+
+    chosen: List[int] = []
+    budget = int(max_tokens)
+    candidates = np.ones(len(sents), dtype=bool)
+    while budget > 0:
+        candidates &= costs <= budget  # the budget only shrinks, so these never fit again
+        if not candidates.any():
+            break
+        redundancy = max_sim if chosen else 0.0
+        scores = np.where(candidates, mmr_lambda * rel - (1 - mmr_lambda) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        candidates[best] = False
+        if chosen and max_sim[best] >= dedup_threshold:
+            continue  # same statement already selected from another source
+        max_sim = svecs @ svecs[best] if not chosen else np.maximum(max_sim, svecs @ svecs[best])
+        chosen.append(best)
+        budget -= int(costs[best])
+
+    # 3) rebuild excerpts in retrieval order, sentences in original order
+    by_doc: Dict[int, List[Tuple[int, str]]] = {}
+    for i in chosen:
+        doc_i, pos, text = sents[i]
+        by_doc.setdefault(doc_i, []).append((pos, text))
+    items = []
+    for doc_i in kept:
+        if doc_i not in by_doc:
+            continue
+        parts, last = [], None
+        for pos, text in sorted(by_doc[doc_i]):
+            if last is not None and pos != last + 1:
+                parts.append("…")
+            parts.append(text)
+            last = pos
+        items.append((doc_i, " ".join(parts)))
+    return items
+
+def collect_evidence(results: List[Dict[str, Any]], max_chars: int = 450, question: Optional[str] = None,
+                     max_tokens: Optional[int] = None) -> Tuple[str, List[Any]]:
+    """build_evidence plus the cited documents: docs[i] is evidence item [i+1]."""
+    docs = _flatten_docs(results)
+    if question and CFG["evidence_compression"]:
+        budget = max_tokens or CFG["evidence_max_tokens"]
+        with querylog.stage("evidence.compress", chunks=len(docs), max_tokens=int(budget)) as sp:
+            pairs = _compress(question, docs, budget, float(CFG["evidence_dedup_threshold"]), 0.7)
+            sp.update(excerpts=len(pairs), chars=sum(len(e) for _, e in pairs))
+    else:
+        pairs = [(i, (d.page_content or "")[:max_chars]) for i, d in enumerate(docs)]
+    items = [(*_doc_key(docs[i]), excerpt) for i, excerpt in pairs]
+    return _format_evidence(items), [docs[i] for i, _ in pairs]
+
+def build_evidence(results: List[Dict[str, Any]], max_chars: int = 450,
+                   question: Optional[str] = None, max_tokens: Optional[int] = None) -> str:
+    """Flatten and de-duplicate source documents into a numbered EVIDENCE block.
+
+    With a ``question`` and `evidence_compression` on, excerpts are compressed
+    to at most ``max_tokens`` (default `evidence_max_tokens`); otherwise each
+    chunk is truncated to ``max_chars``.
+    """
+    return collect_evidence(results, max_chars, question, max_tokens)[0]
+
+def _mini_summaries(question: str, results: List[Dict[str, Any]]) -> str:
     mini_summaries = []
     for i, r in enumerate(results, start=1):
         ans = (r.get("result") or "").strip()
         if ans:
             mini_summaries.append(f"Q{i}: {question}\nA{i}: {ans}")
-    summaries = "\n\n".join(mini_summaries)
+    return "\n\n".join(mini_summaries)
+
+# --------------------------- Agents ------------------------------
+
+def researcher(query: str, k: Optional[int] = None, max_tokens: Optional[int] = None,
+               docs: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """Agent 1 — RAG lookup (grounded answer + docs)."""
+    return qa_chain(query, k=k, max_tokens=max_tokens, docs=docs)  # {"result": str, "source_documents": [...]}
+
+def synthesizer(
+    question: str,
+    results: List[Dict[str, Any]],
+    max_tokens: Optional[int] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    evidence: Optional[str] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Agent 2 — Merge several RAG passes into one concise, grounded draft."""
+    evidence = evidence or build_evidence(results, question=question)
+    summaries = _mini_summaries(question, results)
 
     prompt = f"""
 [C] CONCISE
@@ -87,11 +206,21 @@ Relevant mini-summaries (for orientation only; do not cite these):
 Final, grounded draft with bracket citations:
 """.strip()
 
-    return _llm_text(LLM.invoke(prompt))
+    out = llm_complete(prompt, max_tokens=max_tokens, on_token=on_token)
+    _add_usage(stats, out["usage"])
+    return out["text"]
 
-def critic(question: str, draft: str, results: List[Dict[str, Any]]) -> str:
+def critic(
+    question: str,
+    draft: str,
+    results: List[Dict[str, Any]],
+    max_tokens: Optional[int] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    evidence: Optional[str] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+) -> str:
     """Agent 3 — Light review for clarity/completeness; keep it grounded."""
-    evidence = build_evidence(results)
+    evidence = evidence or build_evidence(results, question=question)
     prompt = f"""
 You are reviewing a draft answer to ensure clarity and grounding.
 
@@ -111,31 +240,51 @@ Draft:
 Provide a 'Revised Answer' that is clearer and fully supported by the evidence.
 Revised Answer:
 """.strip()
-    return _llm_text(LLM.invoke(prompt))
+    out = llm_complete(prompt, max_tokens=max_tokens, on_token=on_token)
+    _add_usage(stats, out["usage"])
+    return out["text"]
 
-# ------------------------ Orchestrator ---------------------------
+def self_checking_synthesizer(
+    question: str,
+    results: List[Dict[str, Any]],
+    max_tokens: Optional[int] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    evidence: Optional[str] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Agents 2+3 in one call — draft, self-review, and emit only the revision."""
+    evidence = evidence or build_evidence(results, question=question)
+    summaries = _mini_summaries(question, results)
+    prompt = f"""
+You are a precise coffee educator writing a single, clear explanation.
 
-def agent_run(question: str) -> str:
-    """
-    Orchestrates: Researcher -> Synthesizer -> Critic.
-    Returns the final polished answer (string).
-    """
-    # 1) Research: original + short expansion
-    queries = generate_related_queries(question)
-    results: List[Dict[str, Any]] = []
-    for q in queries:
-        try:
-            results.append(researcher(q))
-        except Exception as e:
-            results.append({"result": f"(lookup failed for '{q}': {e})", "source_documents": []})
+Rules:
+- Use ONLY the EVIDENCE block; do not add external facts or invent sources.
+- Cite as [1], [2] matching the evidence numbers.
+- Organize as short bullets or numbered steps when procedural; 4–8 sentences.
+- If the question implies 'why/how', give cause→effect→fix. If 'compare', show A vs B.
 
-    # 2) Synthesize
-    draft = synthesizer(question, results).strip()
+Work silently: draft an answer, then check every claim against EVIDENCE and
+fix unsupported claims or missing citations. Output only the checked answer.
 
-    # 3) Critique / refine
-    final = critic(question, draft, results).strip()
+Question:
+{question}
 
-    # Prefer the revised portion if present
+{evidence}
+
+Relevant mini-summaries (for orientation only; do not cite these):
+{summaries}
+
+Revised Answer:
+""".strip()
+    out = llm_complete(prompt, max_tokens=max_tokens, on_token=on_token)
+    _add_usage(stats, out["usage"])
+    return out["text"]
+
+# ------------------------ Orchestrator ---------------------------
+
+def _revised_part(final: str, draft: str) -> str:
+    """Prefer the revised portion if present."""
     lowered = final.lower()
     if "revised answer" in lowered:
         try:
@@ -144,3 +293,257 @@ def agent_run(question: str) -> str:
         except Exception:
             return final
     return final or draft
+
+def agent_answer(
+    question: str,
+    profile: Optional[str] = None,
+    on_stage: Optional[Callable[[str], None]] = None,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    prefetched: Optional[List[Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Orchestrates: Researcher -> Synthesizer -> Critic.
+    Returns a qa_chain-shaped dict: "result" (the polished answer),
+    "source_documents" (docs[i] is citation [i+1]), "usage", "trace_id" and
+    "stats" (profile, per-stage latency, token and call counts).
+
+    ``profile`` picks a PIPELINE_PROFILES entry (default: config.yaml's
+    `agent_profile`). ``on_stage`` is called with "research", "synthesize",
+    "critique" (or "self_check") as each stage starts. ``on_event`` receives
+    the run as it happens:
+        {"event": "research", "queries": [...], "source_documents": [...]}
+        {"event": "draft", "token": "..."}      synthesizer / self-check output
+        {"event": "critique", "token": "..."}   critic output
+        {"event": "final", "result": "...", "source_documents": [...]}
+    Raising from either callback aborts the run. ``prefetched`` are docs
+    already retrieved for the original question (see auto_answer), reused by
+    its research pass.
+    """
+    notify = on_stage or (lambda stage: None)
+    emit = on_event or (lambda event: None)
+
+    def stream(name: str) -> Optional[Callable[[str], None]]:
+        # token callbacks only when someone listens (otherwise no streaming call)
+        return (lambda token: emit({"event": name, "token": token})) if on_event else None
+
+    prof = get_profile(profile)
+    budgets = prof["max_tokens"]
+    stats: Dict[str, Any] = {"profile": prof["name"], "stages": {}}
+    # One index version for every lookup in the run, even if a new one is
+    # published mid-run; LLM calls queue behind standard Q&A in the gateway.
+    with querylog.logged("multi_agent", question) as qlog, pinned_index(), priority("multi_agent"), \
+            tracing.span("agent_run", profile=prof["name"]) as root:
+        stats["trace_id"] = root.trace_id
+        qlog.update(intent=classify_intent(question), profile=prof["name"], trace_id=root.trace_id)
+        t0 = time.perf_counter()
+
+        # 1) Research: original + short expansion
+        queries = generate_related_queries(question, prof["expansions"])
+        results: List[Dict[str, Any]] = []
+        notify("research")
+        with querylog.stage("research", queries=len(queries), k=prof["retrieval_k"]):
+            for q in queries:
+                try:
+                    reuse = prefetched[:prof["retrieval_k"]] if (prefetched and q == question) else None
+                    r = researcher(q, k=prof["retrieval_k"], max_tokens=budgets.get("research"), docs=reuse)
+                    _add_usage(stats, r.get("usage"))
+                    results.append(r)
+                except Exception as e:
+                    results.append({"result": f"(lookup failed for '{q}': {e})", "source_documents": []})
+        # Built once so the synthesizer and critic cite the same numbering
+        evidence, sources = collect_evidence(results, question=question)
+        emit({"event": "research", "queries": queries, "source_documents": sources})
+        t1 = time.perf_counter()
+
+        if prof["merge_critique"]:
+            # 2+3) One self-checking synthesis call
+            notify("self_check")
+            with querylog.stage("self_check"):
+                final = self_checking_synthesizer(question, results, budgets.get("synthesis"), stats, evidence,
+                                                  stream("draft")).strip()
+            answer = _revised_part(final, final)
+            t2 = t3 = time.perf_counter()
+        else:
+            # 2) Synthesize
+            notify("synthesize")
+            with querylog.stage("synthesize"):
+                draft = synthesizer(question, results, budgets.get("synthesis"), stats, evidence,
+                                    stream("draft")).strip()
+            t2 = time.perf_counter()
+
+            # 3) Critique / refine
+            notify("critique")
+            with querylog.stage("critique"):
+                final = critic(question, draft, results, budgets.get("critique"), stats, evidence,
+                               stream("critique")).strip()
+            answer = _revised_part(final, draft)
+            t3 = time.perf_counter()
+        qlog.update(chunk_ids=[chunk_id(d) for d in sources], input_tokens=stats.get("input_tokens", 0),
+                    output_tokens=stats.get("output_tokens", 0))
+
+    stats["stages"] = {"research": t1 - t0, "synthesis": t2 - t1, "critique": t3 - t2}
+    stats["latency_s"] = t3 - t0
+    emit({"event": "final", "result": answer, "source_documents": sources})
+    return {
+        "result": answer,
+        "source_documents": sources,
+        "usage": {"input_tokens": stats.get("input_tokens", 0), "output_tokens": stats.get("output_tokens", 0)},
+        "trace_id": stats["trace_id"],
+        "stats": stats,
+    }
+
+
+def agent_run(
+    question: str,
+    profile: Optional[str] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    on_stage: Optional[Callable[[str], None]] = None,
+    prefetched: Optional[List[Any]] = None,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> str:
+    """agent_answer's final answer text; pass a dict as ``stats`` to receive its stats."""
+    out = agent_answer(question, profile=profile, on_stage=on_stage, on_event=on_event, prefetched=prefetched)
+    if stats is not None:
+        stats.update(out["stats"])
+    return out["result"]
+
+
+# ------------------------ Auto mode ------------------------------
+# Decides Standard vs Multi-Agent from signals that cost one vector search:
+#   intent    comparative / synthesis questions usually need several sources
+#   spread    top relevance minus the mean of the rest; a clear winner means
+#             one chunk answers it
+#   coverage  share of the question's content words found in the top chunks
+# Two or more "needs more" signals → agent_run. The first search is reused
+# by whichever path runs.
+_STOPWORDS = {"what", "which", "when", "where", "does", "with", "from", "that", "this",
+              "have", "your", "about", "into", "than", "should", "there", "their", "make"}
+_CONTENT_WORD = re.compile(r"[a-z0-9][a-z0-9-]{3,}")
+_MODE_LOG_LOCK = threading.Lock()
+
+def choose_mode(question: str, probe_k: int = 5) -> Dict[str, Any]:
+    intent = classify_intent(question)
+    hits = retrieve_scored(question, probe_k)
+    scores = [float(s) for _, s in hits]
+    spread = (scores[0] - sum(scores[1:]) / len(scores[1:])) if len(scores) > 1 else (scores[0] if scores else 0.0)
+    words = {w for w in _CONTENT_WORD.findall(question.lower()) if w not in _STOPWORDS}
+    top_k = int(get_intent_policy(intent)["retrieval_k"])
+    text = " ".join((d.page_content or "").lower() for d, _ in hits[:top_k])
+    coverage = (sum(w in text for w in words) / len(words)) if words else 1.0
+
+    reasons = []
+    if intent in ("comparative", "synthesis"):
+        reasons.append(f"{intent} question")
+    if coverage < float(CFG["auto_min_coverage"]):
+        reasons.append(f"coverage {coverage:.2f}")
+    if spread < float(CFG["auto_min_spread"]):
+        reasons.append(f"flat scores (spread {spread:.3f})")
+    return {
+        "mode": "multi_agent" if len(reasons) >= 2 else "standard",
+        "intent": intent,
+        "top_score": round(scores[0], 4) if scores else None,
+        "spread": round(spread, 4),
+        "coverage": round(coverage, 3),
+        "reasons": reasons,
+        "docs": [d for d, _ in hits],
+    }
+
+def _log_mode_decision(row: Dict[str, Any]) -> None:
+    path = CFG["mode_log_path"]
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with _MODE_LOG_LOCK, open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    except OSError:
+        pass
+
+def auto_answer(
+    question: str,
+    profile: Optional[str] = None,
+    on_stage: Optional[Callable[[str], None]] = None,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Route to qa_chain or agent_answer with choose_mode; returns a qa_chain-shaped dict.
+
+    Adds "mode" ("standard" | "multi_agent") and "routing" (the signals).
+    ``on_stage`` gets "route" first, then the chosen pipeline's stages;
+    ``on_event`` gets agent_answer's events when the question is escalated,
+    and just the "final" event when it stays on the standard path.
+    """
+    t0 = time.perf_counter()
+    with querylog.logged("auto", question) as qlog, pinned_index(), tracing.span("auto_answer") as root:
+        if on_stage:
+            on_stage("route")
+        with querylog.stage("route") as sp:
+            probe_k = max(5, int(get_profile(profile)["retrieval_k"]))
+            decision = choose_mode(question, probe_k)
+            docs = decision.pop("docs")
+            sp.update(**{k: v for k, v in decision.items() if v is not None})
+        route_s = time.perf_counter() - t0
+
+        if decision["mode"] == "multi_agent":
+            out = agent_answer(question, profile=profile, on_stage=on_stage, on_event=on_event, prefetched=docs)
+        else:
+            out = qa_chain(question, on_stage=on_stage, docs=docs)
+            if on_event:
+                on_event({"event": "final", "result": out["result"],
+                          "source_documents": out.get("source_documents", [])})
+        out.update(mode=decision["mode"], routing=decision, trace_id=root.trace_id)
+        qlog.update(
+            mode=decision["mode"],
+            auto=True,
+            intent=decision["intent"],
+            trace_id=root.trace_id,
+            chunk_ids=[chunk_id(d) for d in out.get("source_documents", [])],
+            **(out.get("usage") or {}),
+        )
+
+    _log_mode_decision({
+        "ts": time.time(),
+        "question": question,
+        **decision,
+        "profile": get_profile(profile)["name"],
+        "route_s": round(route_s, 4),
+        "latency_s": round(time.perf_counter() - t0, 3),
+    })
+    return out
+
+
+# ------------------- Profile comparison (CLI) --------------------
+# python agents.py --profiles fast balanced deep "Why does espresso taste sour?"
+
+def main():
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Measure latency and token cost per agent profile.")
+    ap.add_argument("questions", nargs="*", default=[
+        "Why does espresso taste sour?",
+        "What is the optimal coffee-to-water ratio for V60 brewing?",
+        "What's the difference between immersion and percolation brewing?",
+    ])
+    ap.add_argument("--profiles", nargs="+", default=list(PIPELINE_PROFILES))
+    args = ap.parse_args()
+
+    print(f"{'profile':10} {'avg s':>7} {'research':>9} {'synth':>7} {'critique':>9} {'in tok':>8} {'out tok':>8} {'calls':>6}")
+    for name in args.profiles:
+        runs = []
+        for q in args.questions:
+            s: Dict[str, Any] = {}
+            agent_run(q, profile=name, stats=s)
+            runs.append(s)
+        n = len(runs) or 1
+        avg = lambda f: sum(f(r) for r in runs) / n
+        print(
+            f"{name:10} {avg(lambda r: r['latency_s']):7.2f} "
+            f"{avg(lambda r: r['stages']['research']):9.2f} "
+            f"{avg(lambda r: r['stages']['synthesis']):7.2f} "
+            f"{avg(lambda r: r['stages']['critique']):9.2f} "
+            f"{avg(lambda r: r.get('input_tokens', 0)):8.0f} "
+            f"{avg(lambda r: r.get('output_tokens', 0)):8.0f} "
+            f"{avg(lambda r: r.get('llm_calls', 0)):6.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
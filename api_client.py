@@ -0,0 +1,120 @@
+# api_client.py — Thin client for server.py with the same call signatures as
+# langchain_rag.qa_chain and agents.agent_answer / agent_run / auto_answer, so app.py can
+# switch to it when `api_url` (or COFFEE_API_URL) is set. Uses only the
+# standard library (and profiling.py, which doesn't load the pipeline).
+
+import json
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional
+
+from settings import CFG
+from profiling import is_requested
+
+API_URL = (CFG.get("api_url") or "").rstrip("/")
+
+
+class APIError(RuntimeError):
+    """Non-2xx response from server.py (status kept for callers that retry on 503)."""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(f"API {status}: {detail}")
+        self.status = status
+
+
+def _post(path: str, body: Dict[str, Any], timeout: float):
+    req = urllib.request.Request(
+        API_URL + path,
+        data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        return urllib.request.urlopen(req, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        try:
+            detail = json.loads(e.read().decode("utf-8")).get("detail", e.reason)
+        except Exception:
+            detail = e.reason
+        raise APIError(e.code, str(detail)) from None
+
+
+def _ask(path: str, body: Dict[str, Any], on_stage: Optional[Callable[[str], None]],
+         on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """POST a question; stream stage events to on_stage and agent events to on_event when given."""
+    timeout = float(CFG["api_timeout_s"]) + 10
+    if is_requested():
+        body = {**body, "sampling_profile": True}  # profiled on the server, see profiling.requested()
+    if on_stage is None and on_event is None:
+        with _post(path, body, timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+    # Raising from on_stage (e.g. jobs.JobCancelled) closes the stream, which
+    # cancels the job on the server too.
+    with _post(path + "/stream", body, timeout) as resp:
+        for line in resp:
+            event = json.loads(line.decode("utf-8"))
+            if event["event"] == "stage":
+                if event["stage"] != "started" and on_stage:
+                    on_stage(event["stage"])
+            elif event["event"] == "result":
+                return event
+            elif event["event"] == "error":
+                raise APIError(event.get("status", 500), event.get("error", "unknown error"))
+            elif on_event:
+                if "source_documents" in event:
+                    event["source_documents"] = _docs(event["source_documents"])
+                on_event(event)
+    raise APIError(502, "stream ended without a result")
+
+
+def _docs(raw):
+    # app.py reads doc.metadata / doc.page_content like LangChain Documents
+    return [SimpleNamespace(page_content=d["page_content"], metadata=d["metadata"], source=d.get("source"))
+            for d in raw]
+
+
+def source_info(doc: Any) -> Dict[str, Any]:
+    """Source attributes the server resolved for a returned document."""
+    return getattr(doc, "source", None) or doc.metadata
+
+
+def qa_chain(question: str, k: Optional[int] = None, max_tokens: Optional[int] = None,
+             on_stage: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    out = _ask("/qa", {"question": question, "k": k}, on_stage)
+    out["source_documents"] = _docs(out.get("source_documents", []))
+    return out
+
+
+def agent_answer(question: str, profile: Optional[str] = None, on_stage: Optional[Callable[[str], None]] = None,
+                 on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    out = _ask("/agent", {"question": question, "profile": profile}, on_stage, on_event)
+    out["source_documents"] = _docs(out.get("source_documents", []))
+    out["stats"] = {
+        "trace_id": out.get("trace_id"),
+        "stages": out.get("stages") or {},
+        "latency_s": out.get("elapsed_s"),
+        **(out.get("usage") or {}),
+    }
+    return out
+
+
+def agent_run(question: str, profile: Optional[str] = None, stats: Optional[Dict[str, Any]] = None,
+              on_stage: Optional[Callable[[str], None]] = None) -> str:
+    out = agent_answer(question, profile, on_stage)
+    if stats is not None:
+        stats.update(out["stats"])
+    return out["result"]
+
+
+def auto_answer(question: str, profile: Optional[str] = None, on_stage: Optional[Callable[[str], None]] = None,
+                on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    out = _ask("/auto", {"question": question, "profile": profile}, on_stage, on_event)
+    out["source_documents"] = _docs(out.get("source_documents", []))
+    out["mode"] = "multi_agent" if out.get("mode") == "Multi-Agent AI" else "standard"
+    return out
+
+
+def healthcheck() -> Dict[str, Any]:
+    with urllib.request.urlopen(API_URL + "/health", timeout=10) as resp:
+        return json.loads(resp.read().decode("utf-8"))
@@ -1,10 +1,25 @@
 # app.py — Coffee Learning Portal v3.4 (Progress & Sources Fixed)
 import streamlit as st
-from langchain_rag import qa_chain
-from agents import agent_run
+from settings import CFG
+from profiles import PIPELINE_PROFILES, get_profile
+from tracing import get_trace
+if CFG.get("api_url"):
+    # Thin client: the pipeline runs in server.py (no models loaded here)
+    from api_client import qa_chain, agent_answer, auto_answer, source_info
+else:
+    from langchain_rag import qa_chain, source_info
+    from agents import agent_answer, auto_answer
+from curriculum import MODULES
+from jobs import get_runner, JobCancelled
+from singleflight import get_singleflight, flight_key
+from profiling import profile_request, requested, profile_path, top_frames
+from collections import deque
+import functools
 import time
 import re
 
+_PAGE_T0 = time.perf_counter()
+
 # ============================================
 # PAGE CONFIGURATION
 # ============================================
@@ -18,7 +33,9 @@ st.set_page_config(
 # ============================================
 # MODERN BLUE THEME STYLING
 # ============================================
-st.markdown("""
+# Static markup lives in module constants; with the sections below running as
+# fragments, it is only re-sent on a full page run.
+PAGE_CSS = """
     <style>
     /* Main container */
     .main {
@@ -155,7 +172,8 @@ st.markdown("""
         font-size: 14px;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(PAGE_CSS, unsafe_allow_html=True)
 
 # ============================================
 # SESSION STATE INITIALIZATION
@@ -179,52 +197,32 @@ if "last_answer" not in st.session_state:
 if "current_question" not in st.session_state:
     st.session_state.current_question = ""
 
-# ============================================
-# MODULE CONTENT
-# ============================================
-MODULES = {
-    "Pillar 1: Coffee Sensory Evaluation & Flavor Science": {
-        "icon": "👅",
-        "short_name": "Sensory & Flavor",
-        "questions": [
-            "How are coffee flavors categorized across aroma, taste, and aftertaste?",
-            "What is the role of the World Coffee Research Sensory Lexicon, and how are its intensity scales applied in practice?",
-            "How can I describe coffee flavors precisely during a cupping session?",
-            "How can I design a simple comparative tasting to train my palate in recognizing sweetness and acidity?",
-            "How do different processing methods—washed, natural, and honey—shape a coffee’s sensory profile?"
-        ]
-    },
-    "Pillar 2: Espresso Mastery & Milk-Based Drinks": {
-        "icon": "☕️",
-        "short_name": "Espresso & Milk",
-        "questions": [
-            "How do grind size and dose affect espresso extraction?",
-            "What is the ideal espresso brewing temperature and pressure?",
-            "How does milk steaming temperature influence foam quality?",
-            "What are the key steps to dial in espresso properly?",
-            "What are the differences between latte, cappuccino, and flat white textures?"
-        ]
-    },
-    "Pillar 3: Hand-Brewed Coffee Methods": {
-        "icon": "🫖",
-        "short_name": "Hand Brewing",
-        "questions": [
-            "What is the optimal coffee-to-water ratio for V60 brewing?",
-            "How does water temperature affect extraction in pour-over methods?",
-            "What's the difference between immersion and percolation brewing?",
-            "How does pouring technique influence agitation and flavor?",
-            "How do various brewing methods highlight different coffee origins?"
-        ]
-    }
-}
+if "active_job" not in st.session_state:
+    st.session_state.active_job = None
+
+if "job_error" not in st.session_state:
+    st.session_state.job_error = None
+
+if "render_times" not in st.session_state:
+    st.session_state.render_times = deque(maxlen=200)
+
+# Process-wide worker pool shared by all sessions
+JOBS = get_runner(int(CFG.get("job_workers", 4)))
+# Identical questions asked at the same time share one pipeline run
+FLIGHTS = get_singleflight(CFG.get("singleflight_lock_dir"))
 
 # ============================================
 # HELPER FUNCTIONS
 # ============================================
-def calculate_progress():
-    """Calculate overall learning progress"""
+def progress_counts():
+    """(questions completed, questions in the curriculum)"""
     total_questions = sum(len(MODULES[m]["questions"]) for m in MODULES)
     completed = sum(len(st.session_state.completed_modules[m]) for m in st.session_state.completed_modules)
+    return completed, total_questions
+
+def calculate_progress():
+    """Calculate overall learning progress"""
+    completed, total_questions = progress_counts()
     return completed / total_questions if total_questions > 0 else 0
 
 def is_module_complete(module_name):
@@ -271,23 +269,61 @@ def highlight_citations(text):
     highlighted = re.sub(pattern, r'<span class="citation-ref">[\1]</span>', text)
     return highlighted
 
+def timed(section):
+    """Record how long each run of a page section takes (shown in the sidebar with ⏱️ on)."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                st.session_state.render_times.append((section, (time.perf_counter() - t0) * 1000))
+        return run
+    return deco
+
+def render_times_summary():
+    """Median / max script time per section over this session's recent runs."""
+    by_section = {}
+    for section, ms in st.session_state.render_times:
+        by_section.setdefault(section, []).append(ms)
+    return [
+        f"`{section}` {sorted(xs)[len(xs) // 2]:.0f} ms median, {max(xs):.0f} ms max ({len(xs)} runs)"
+        for section, xs in sorted(by_section.items())
+    ]
+
 # ============================================
 # SIDEBAR (WITH FIXED PROGRESS)
 # ============================================
-with st.sidebar:
-    st.markdown("### ☕️ Coffee Learning")
-    st.caption("AI-Powered Barista Training")
-    
-    st.divider()
-    
+# The page is split into fragments (sidebar progress, answer panel, pillar
+# list) that rerun on their own widgets only. Buttons update session state in
+# on_click callbacks, which run before the rerun, so no st.rerun() is needed
+# to show the change; st.rerun() is left for state shared across sections
+# (a finished answer, a reset, a picked question).
+def _confirm_reset(show):
+    st.session_state.show_reset_confirm = show
+
+def _reset_progress():
+    st.session_state.completed_modules = {m: [] for m in MODULES}
+    st.session_state.questions_asked = 0
+    st.session_state.expanded_pillars = set()
+    st.session_state.last_answer = None
+    st.session_state.current_question = ""
+    st.session_state.job_error = None
+    st.session_state.show_reset_confirm = False
+
+@st.fragment
+@timed("sidebar_progress")
+def sidebar_progress():
+    """Progress metrics and the reset action."""
     # Progress overview (FIXED - recalculates each time)
     st.markdown("### 📊 Progress")
     overall_progress = calculate_progress()
     st.progress(overall_progress)
     st.caption(f"{int(overall_progress * 100)}% Complete")
-    
+
     st.markdown("")
-    
+
     # Stats
     col1, col2 = st.columns(2)
     with col1:
@@ -295,53 +331,64 @@ with st.sidebar:
     with col2:
         modules_done = sum(1 for m in MODULES if is_module_complete(m))
         st.metric("Pillars", f"{modules_done}/3")
-    
+
     col1, col2 = st.columns(2)
-    total_completed = sum(len(st.session_state.completed_modules[m]) for m in st.session_state.completed_modules)
-    total_questions = sum(len(MODULES[m]["questions"]) for m in MODULES)
-    
+    total_completed, total_questions = progress_counts()
+
     with col1:
         st.metric("Answered", total_completed)
     with col2:
         st.metric("Total", total_questions)
-    
+
     st.divider()
-    
+
     # Actions
     st.markdown("### ⚙️ Actions")
-    
-    if st.button("🔄 Reset Progress", use_container_width=True, key="sidebar_reset"):
-        st.session_state.show_reset_confirm = True
-    
+
+    st.button("🔄 Reset Progress", use_container_width=True, key="sidebar_reset",
+              on_click=_confirm_reset, args=(True,))
+
     if st.session_state.get("show_reset_confirm", False):
         st.warning("⚠️ Are you sure?")
         col1, col2 = st.columns(2)
         with col1:
             if st.button("Yes", use_container_width=True, key="confirm_yes"):
-                st.session_state.completed_modules = {m: [] for m in MODULES}
-                st.session_state.questions_asked = 0
-                st.session_state.expanded_pillars = set()
-                st.session_state.last_answer = None
-                st.session_state.current_question = ""
-                st.session_state.show_reset_confirm = False
-                st.rerun()
+                _reset_progress()
+                st.rerun()  # answer panel and pillars reset too
         with col2:
-            if st.button("No", use_container_width=True, key="confirm_no"):
-                st.session_state.show_reset_confirm = False
-                st.rerun()
-    
+            st.button("No", use_container_width=True, key="confirm_no",
+                      on_click=_confirm_reset, args=(False,))
+
+with st.sidebar:
+    st.markdown("### ☕️ Coffee Learning")
+    st.caption("AI-Powered Barista Training")
+
     st.divider()
-    
+
+    sidebar_progress()
+
+    st.divider()
+
+    # Diagnostics
+    st.toggle("⏱️ Show timing breakdown", key="show_timing", help="Per-stage spans (retrieval, prompt, LLM, critic) for each answer, and script time per page section")
+    st.toggle("🔬 Profile next answers", key="profile_next", help="Record a sampling profile (flamegraph-ready) of each question while on")
+    if st.session_state.get("show_timing") and st.session_state.render_times:
+        with st.expander("⏱️ Script time per section", expanded=False):
+            for line in render_times_summary():
+                st.caption(line)
+
+    st.divider()
+
     # About
     with st.expander("ℹ️ About", expanded=False):
         st.markdown("""
         **Coffee Learning Portal**
-        
+
         Built with:
         - 🤖 LangChain RAG
         - 🧠 Multi-Agent AI
         - 📚 15+ Sources
-        
+
         v3.4 - Progress Fixed
         """)
 
@@ -355,151 +402,285 @@ st.markdown('<div class="subtitle">Want to become coffee-smart and barista-ready
 
 st.markdown("")
 
+ANSWER_MODES = {
+    "auto": "🤖 Auto",
+    "standard": "⚡ Standard",
+    "multi_agent": "🧠 Multi-Agent Deep Research",
+}
+
 # ============================================
-# QUESTION INPUT
+# PROCESS QUESTION (BACKGROUND JOB)
 # ============================================
-question = st.text_input(
-    "Ask your coffee question here:",
-    value=st.session_state.current_question,
-    placeholder="e.g., Why does espresso taste sour?",
-    label_visibility="collapsed"
-)
+# The pipeline runs in the process-wide worker pool (jobs.py); this session
+# only keeps the job id, so reruns and widget clicks don't lose the work.
+STAGE_LABELS = {
+    "retrieve": "Searching knowledge base",
+    "generate": "Generating response",
+    "research": "Researcher searching knowledge base",
+    "synthesize": "Synthesizer combining information",
+    "critique": "Critic reviewing answer quality",
+    "self_check": "Synthesizer drafting and self-checking",
+    "shared": "Joining an identical question already being answered",
+    "route": "Choosing standard or multi-agent",
+}
+MODE_LABELS = {"standard": "Standard RAG", "multi_agent": "Multi-Agent AI"}
+
+def _answer_question(question, answer_mode, agent_profile, on_stage=None, on_event=None):
+    if answer_mode == "auto":
+        result = auto_answer(question, profile=agent_profile, on_stage=on_stage, on_event=on_event)
+        return result, MODE_LABELS[result["mode"]]
+    if answer_mode == "multi_agent":
+        result = agent_answer(question, profile=agent_profile, on_stage=on_stage, on_event=on_event)
+        return result, "Multi-Agent AI"
+    return qa_chain(question, on_stage=on_stage), "Standard RAG"
+
+def _profiled_answer(question, answer_mode, agent_profile, on_stage=None, on_event=None):
+    if CFG.get("api_url"):
+        # api_client forwards the request; the server records the profile
+        return _answer_question(question, answer_mode, agent_profile, on_stage, on_event)
+    with profile_request(answer_mode, question=question) as prof:
+        result, mode = _answer_question(question, answer_mode, agent_profile, on_stage, on_event)
+        if prof is not None:
+            prof.meta["trace_id"] = result.get("trace_id")
+            result = {**result, "profile_id": prof.id}
+    return result, mode
+
+def run_question(question, answer_mode, agent_profile, sample=False, on_stage=None, on_event=None, check=None):
+    """Job body — runs on a worker thread, never in the script run."""
+    with requested(sample):
+        if not CFG.get("singleflight", True):
+            return _profiled_answer(question, answer_mode, agent_profile, on_stage, on_event)
+        key = flight_key(answer_mode, question, profile=agent_profile if answer_mode != "standard" else None)
+        result, _ = FLIGHTS.do(
+            key,
+            lambda: _profiled_answer(question, answer_mode, agent_profile, on_stage, on_event),
+            on_join=(lambda: on_stage("shared")) if on_stage else None,
+            retry_on=(JobCancelled,),  # leader cancelled → a waiting duplicate runs it itself
+            check=check,  # this duplicate cancelled → stop waiting
+        )
+    return result
+
+def submit_question(question, answer_mode, agent_profile):
+    """Start the pipeline job for a question (Brew Answer)."""
+    st.session_state.questions_asked += 1
+    st.session_state.job_error = None
+    if answer_mode != "standard":
+        merged = get_profile(agent_profile)["merge_critique"]
+        multi_stages = ["research", "self_check"] if merged else ["research", "synthesize", "critique"]
+    if answer_mode == "multi_agent":
+        planned = multi_stages
+    elif answer_mode == "auto":
+        # the stage list is settled once the router has picked a path
+        planned = {"standard": ["route", "retrieve", "generate"], "multi_agent": ["route"] + multi_stages}
+    else:
+        planned = ["retrieve", "generate"]
+    st.session_state.active_job = {
+        "id": JOBS.submit(answer_mode, question, run_question, question, answer_mode, agent_profile,
+                          st.session_state.get("profile_next", False), with_events=answer_mode != "standard",
+                          with_check=True),
+        "multi": answer_mode == "multi_agent",
+        "stages": planned,
+    }
 
-if question != st.session_state.current_question:
-    st.session_state.current_question = question
+@st.fragment(run_every=1.0)
+@timed("job_progress")
+def job_progress_panel():
+    """Polls the active job; hands the result to the page once it finishes."""
+    active = st.session_state.active_job
+    job = JOBS.get(active["id"]) if active else None
+    if job is None:
+        st.session_state.active_job = None
+        st.rerun()
+        return
+
+    if job.done:
+        st.session_state.active_job = None
+        if job.status == "done":
+            result, mode = job.result
+            st.session_state.last_answer = {
+                "question": job.question,
+                "result": result,
+                "elapsed": job.elapsed,
+                "mode": mode,
+                "auto": bool(result.get("routing")),
+                "timestamp": time.strftime("%H:%M:%S", time.localtime(job.finished)),
+                # recorded before the rerun so sidebar and pillars show it in the same run
+                "completed_module": mark_question_complete(job.question),
+            }
+        elif job.status == "error":
+            st.session_state.job_error = job.error
+        # One page run: the answer, sidebar progress and pillar ticks all change
+        st.rerun()
+        return
+
+    seen = [name for name, _ in job.stages]
+    planned = active["stages"]
+    if isinstance(planned, dict):  # auto mode
+        planned = planned["multi_agent"] if "research" in seen else planned["standard"]
+    lines = []
+    if "shared" in seen:
+        lines.append(f"⏳ {STAGE_LABELS['shared']}")
+    for i, name in enumerate(planned, start=1):
+        if name == job.stage:
+            icon = "⏳"
+        elif name in seen:
+            icon = "✅"
+        else:
+            icon = "▫️"
+        lines.append(f"{icon} <strong>Stage {i}:</strong> {STAGE_LABELS.get(name, name)}")
+    title = "🧠 Multi-Agent System Working..." if (active["multi"] or "research" in seen) else "☕ Brewing Your Answer..."
+    st.markdown(f"""
+    <div class="loading-container">
+        <div class="spinner"></div>
+        <h3 style="color: #1e3a8a; margin: 20px 0 10px 0;">{title}</h3>
+        <p style="color: #64748b; margin: 5px 0;">
+            {"<br>".join(lines)}
+        </p>
+        <p style="color: #94a3b8; font-size: 12px; margin-top: 10px;">
+            Elapsed: {job.elapsed:.0f}s
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+    # Multi-agent runs stream their draft, then the critic's revision
+    research = next((e for e in job.events if e["event"] == "research"), None)
+    if research:
+        st.caption(f"📚 Researcher found {len(research['source_documents'])} evidence excerpts")
+    if job.partial.get("critique"):
+        label, partial = "Critic revising the draft", job.partial["critique"]
+    else:
+        label, partial = "Synthesizer draft", job.partial.get("draft")
+    if partial:
+        with st.container(border=True):
+            st.caption(f"✍️ {label} (in progress)")
+            st.markdown(highlight_citations(partial) + " ▌", unsafe_allow_html=True)
+    if st.button("✖️ Cancel", key="cancel_job_btn"):
+        JOBS.cancel(job.id)
+        st.session_state.active_job = None
+        st.rerun()
 
-# Options
-col1, col2, col3 = st.columns([2, 2, 1])
+def _clear_answer():
+    st.session_state.last_answer = None
+    st.session_state.current_question = ""
 
-with col1:
-    use_multi_agent = st.checkbox(
-        "🧠 Multi-Agent Deep Research",
-        help="""
-        **3-Stage AI Process:**
-        1. Researcher searches knowledge base
-        2. Synthesizer combines findings
-        3. Critic reviews and improves
-        
-        ⏱️ Takes 20-40 seconds (vs 5-15 sec standard)
-        """,
-        key="use_multi_agent"
+# ============================================
+# QUESTION INPUT + ANSWER PANEL
+# ============================================
+@st.fragment
+@timed("answer_panel")
+def answer_panel():
+    """Question box, job progress and the answer; Brew and Clear rerun only this."""
+    question = st.text_input(
+        "Ask your coffee question here:",
+        value=st.session_state.current_question,
+        placeholder="e.g., Why does espresso taste sour?",
+        label_visibility="collapsed"
     )
 
-with col2:
-    if use_multi_agent:
-        st.caption("⚡ Advanced: ~20-40 sec")
-    else:
-        st.caption("⚡ Standard: ~5-15 sec")
+    if question != st.session_state.current_question:
+        st.session_state.current_question = question
 
-with col3:
-    brew_button = st.button(
-        "☕️ Brew Answer", 
-        type="primary", 
-        use_container_width=True, 
-        disabled=(not question),
-        key="brew_btn"
-    )
+    # Options
+    col1, col2, col3 = st.columns([2, 2, 1])
 
-st.markdown("")
+    with col1:
+        answer_mode = st.radio(
+            "Mode",
+            list(ANSWER_MODES),
+            index=list(ANSWER_MODES).index(CFG.get("answer_mode", "auto")),
+            format_func=ANSWER_MODES.get,
+            horizontal=True,
+            label_visibility="collapsed",
+            help="""
+            **Auto:** one quick search decides whether the question needs the
+            multi-agent pipeline (comparisons, scattered evidence) or a standard answer.
+
+            **Multi-Agent (3 stages):**
+            1. Researcher searches knowledge base
+            2. Synthesizer combines findings
+            3. Critic reviews and improves
+
+            ⏱️ Slower than standard; **Depth** trades answer quality against time
+            """,
+            key="answer_mode",
+        )
 
-# ============================================
-# PROCESS QUESTION
-# ============================================
-if brew_button and question:
-    st.session_state.questions_asked += 1
-    
-    loading_placeholder = st.empty()
-    
-    with loading_placeholder.container():
-        if use_multi_agent:
-            st.markdown("""
-            <div class="loading-container">
-                <div class="spinner"></div>
-                <h3 style="color: #1e3a8a; margin: 20px 0 10px 0;">🧠 Multi-Agent System Working...</h3>
-                <p style="color: #64748b; margin: 5px 0;">
-                    <strong>Stage 1:</strong> Researcher searching knowledge base<br>
-                    <strong>Stage 2:</strong> Synthesizer combining information<br>
-                    <strong>Stage 3:</strong> Critic reviewing answer quality
-                </p>
-                <p style="color: #94a3b8; font-size: 12px; margin-top: 10px;">Estimated: 20-40 seconds</p>
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown("""
-            <div class="loading-container">
-                <div class="spinner"></div>
-                <h3 style="color: #1e3a8a; margin: 20px 0 10px 0;">☕ Brewing Your Answer...</h3>
-                <p style="color: #64748b;">Searching knowledge base and generating response</p>
-                <p style="color: #94a3b8; font-size: 12px; margin-top: 10px;">Estimated: 5-15 seconds</p>
-            </div>
-            """, unsafe_allow_html=True)
-    
-    start_time = time.time()
-    
-    try:
-        if use_multi_agent:
-            answer_text = agent_run(question)
-            result = {
-                "result": answer_text,
-                "source_documents": []  # Multi-agent doesn't return docs
-            }
-            mode = "Multi-Agent AI"
+    with col2:
+        if answer_mode != "standard":
+            profile_names = list(PIPELINE_PROFILES)
+            agent_profile = st.selectbox(
+                "Depth",
+                profile_names,
+                index=profile_names.index(get_profile()["name"]),
+                format_func=lambda p: PIPELINE_PROFILES[p]["label"],
+                label_visibility="collapsed",
+                key="agent_profile",
+                help="Used whenever the multi-agent pipeline runs" if answer_mode == "auto" else None,
+            )
         else:
-            result = qa_chain(question)
-            mode = "Standard RAG"
-        
-        elapsed = time.time() - start_time
-        loading_placeholder.empty()
-        
-        st.session_state.last_answer = {
-            "question": question,
-            "result": result,
-            "elapsed": elapsed,
-            "mode": mode,
-            "timestamp": time.strftime("%H:%M:%S")
-        }
-        
-        # IMPORTANT: Force rerun to update progress bars
-        st.rerun()
-        
-    except Exception as e:
-        loading_placeholder.empty()
-        st.error(f"❌ Error: {str(e)}")
+            agent_profile = None
+            st.caption("⚡ Standard: one search, one LLM call")
+
+    with col3:
+        brew_button = st.button(
+            "☕️ Brew Answer",
+            type="primary",
+            use_container_width=True,
+            disabled=(not question) or bool(st.session_state.active_job),
+            key="brew_btn"
+        )
+
+    st.markdown("")
+
+    if brew_button and question:
+        submit_question(question, answer_mode, agent_profile)
+
+    if st.session_state.active_job:
+        job_progress_panel()
+
+    if st.session_state.job_error:
+        st.error(f"❌ Error: {st.session_state.job_error}")
         st.info("💡 Check if Ollama/OpenAI is running and API keys are set")
 
+    if st.session_state.last_answer:
+        show_answer(st.session_state.last_answer)
+
+    st.markdown("---")
+
+    if not st.session_state.last_answer:
+        st.info("💡 **Tip:** Select a pillar below and click **Ask** on any question to get started.")
+
 # ============================================
 # DISPLAY ANSWER (WITH FIXED SOURCE COUNT)
 # ============================================
-if st.session_state.last_answer:
-    answer_data = st.session_state.last_answer
+def show_answer(answer_data):
     answer_text = answer_data['result']['result']
     highlighted_answer = highlight_citations(answer_text)
-    
+
     st.markdown(f"""
     <div class="answer-box">
         <h3>☕ Your Answer</h3>
         <p style="color: #64748b; font-size: 14px; margin-bottom: 16px;">
             <strong>Question:</strong> {answer_data['question']}<br>
-            <strong>Time:</strong> {answer_data['timestamp']} | <strong>Mode:</strong> {answer_data['mode']}
+            <strong>Time:</strong> {answer_data['timestamp']} | <strong>Mode:</strong> {answer_data['mode']}{" (auto)" if answer_data.get("auto") else ""}
         </p>
         <div style="color: #1e3a8a; line-height: 1.8; font-size: 16px;">
             {highlighted_answer}
         </div>
     </div>
     """, unsafe_allow_html=True)
-    
+
     # Metadata (FIXED SOURCE COUNT)
     col1, col2, col3, col4 = st.columns(4)
-    
+
     with col1:
         st.metric("⏱️ Time", f"{answer_data['elapsed']:.1f}s")
-    
+
     with col2:
         st.metric("🔧 Mode", answer_data['mode'])
-    
+
     with col3:
         # FIX #1: Show correct source/citation count
-        if answer_data['mode'] == "Multi-Agent AI":
+        if answer_data['mode'] == "Multi-Agent AI" and not answer_data['result'].get("source_documents"):
             citation_count = count_citations(answer_text)
             if citation_count > 0:
                 st.metric("📄 Citations", citation_count)
@@ -508,20 +689,17 @@ if st.session_state.last_answer:
         else:
             source_count = len(answer_data['result'].get("source_documents", []))
             st.metric("📄 Sources", source_count)
-    
+
     with col4:
-        if st.button("🗑️ Clear", use_container_width=True, key="clear_answer_btn"):
-            st.session_state.last_answer = None
-            st.session_state.current_question = ""
-            st.rerun()
-    
-    # Show sources (Standard RAG only)
-    if answer_data['mode'] == "Standard RAG" and answer_data['result'].get("source_documents"):
+        st.button("🗑️ Clear", use_container_width=True, key="clear_answer_btn", on_click=_clear_answer)
+
+    # Show sources (multi-agent sources are numbered like its [n] citations)
+    if answer_data['result'].get("source_documents"):
         with st.expander("📚 View Sources", expanded=False):
             for i, doc in enumerate(answer_data['result']["source_documents"], 1):
                 st.markdown(f"""
-                **[{i}] {doc.metadata.get('title', 'Unknown Source')}**
-                
+                **[{i}] {source_info(doc).get('title', 'Unknown Source')}**
+
                 *Excerpt:* {doc.page_content[:300]}...
                 """)
                 if i < len(answer_data['result']["source_documents"]):
@@ -529,90 +707,141 @@ if st.session_state.last_answer:
     elif answer_data['mode'] == "Multi-Agent AI":
         citation_count = count_citations(answer_text)
         st.info(f"""
-        **ℹ️ Multi-Agent Mode:** Sources are analyzed internally by 3 AI agents. 
+        **ℹ️ Multi-Agent Mode:** Sources are analyzed internally by 3 AI agents.
         {f"Found **{citation_count} citations** in the answer text above." if citation_count > 0 else "Citations appear as [1], [2], [3] in the answer."}
         """)
-    
-    # Track progress (FIX #2: Better tracking)
-    completed_module = mark_question_complete(answer_data['question'])
+
+    # Per-request timing breakdown (from tracing spans)
+    trace_id = answer_data['result'].get("trace_id")
+    if st.session_state.get("show_timing") and trace_id:
+        with st.expander("⏱️ Timing Breakdown", expanded=True):
+            rows = get_trace(trace_id)
+            if not rows:
+                st.caption("No spans recorded here (tracing disabled, trace expired, or answered by the API server — see its trace file).")
+            for row in rows:
+                attrs = row["attributes"]
+                details = ", ".join(
+                    f"{k}={attrs[k]}" for k in ("k", "input_tokens", "output_tokens", "cache_hit") if k in attrs
+                )
+                indent = "&nbsp;" * 4 * row["depth"]
+                st.markdown(
+                    f"{indent}`{row['name']}` — **{row['duration_ms']:.0f} ms**"
+                    + (f" <span style='color:#64748b'>({details})</span>" if details else ""),
+                    unsafe_allow_html=True,
+                )
+
+    # Sampling profile (sidebar toggle or `profiling_sample_rate`)
+    profile_id = answer_data['result'].get("profile_id")
+    if profile_id:
+        with st.expander("🔬 Sampling Profile", expanded=False):
+            path = profile_path(profile_id)
+            if path is None:
+                st.caption(f"Recorded by the API server: `GET {CFG.get('api_url')}/profiles/{profile_id}` (folded stacks).")
+            else:
+                with open(path, encoding="utf-8") as f:
+                    folded = f.read()
+                st.caption(f"`{path}` — folded stacks for flamegraph.pl, speedscope or inferno. Hottest frames:")
+                st.dataframe(top_frames(folded), use_container_width=True, hide_index=True)
+                st.download_button("⬇️ Download folded stacks", folded, file_name=f"{profile_id}.folded",
+                                   key="download_profile_btn")
+
+    # Track progress (FIX #2: Better tracking) — marked when the job finished,
+    # reported once
+    completed_module = answer_data.pop("completed_module", None)
     if completed_module:
         st.success(f"✅ Progress saved in {MODULES[completed_module]['short_name']}")
-        
+
         if is_module_complete(completed_module):
             st.balloons()
             st.success(f"🎉 You completed **{MODULES[completed_module]['short_name']}**!")
 
-st.markdown("---")
-
-if not st.session_state.last_answer:
-    st.info("💡 **Tip:** Select a pillar below and click **Ask** on any question to get started.")
+answer_panel()
 
 st.markdown("")
 
 # ============================================
 # LEARNING PILLARS
 # ============================================
-st.markdown("### Choose a Pillar:")
-
-for pillar_idx, (module_name, module_data) in enumerate(MODULES.items()):
-    is_complete = is_module_complete(module_name)
-    is_expanded = module_name in st.session_state.expanded_pillars
-    completed_count = len(st.session_state.completed_modules[module_name])
-    total_count = len(module_data["questions"])
-    progress = completed_count / total_count
-    
-    with st.container():
-        col1, col2, col3 = st.columns([8, 1, 1])
-        
-        with col1:
-            st.markdown(f"### {module_data['icon']} {module_name}")
-        
-        with col2:
-            toggle_label = "▼" if is_expanded else "▶"
-            if st.button(toggle_label, key=f"toggle_{pillar_idx}", use_container_width=True):
-                if is_expanded:
-                    st.session_state.expanded_pillars.discard(module_name)
-                else:
-                    st.session_state.expanded_pillars.add(module_name)
-                st.rerun()
-        
-        
-        st.progress(progress)
-        status_emoji = "✅" if is_complete else "📖"
-        st.caption(f"{status_emoji} {completed_count}/{total_count} questions • {int(progress * 100)}%")
-        
-        if is_expanded:
-            st.markdown("")
-            
-            for q_idx, q in enumerate(module_data["questions"]):
-                is_answered = q in st.session_state.completed_modules[module_name]
-                status_icon = "✅" if is_answered else "⭕"
-                
-                q_col1, q_col2 = st.columns([5, 1])
-                
-                with q_col1:
-                    bg_color = "#dbeafe" if is_answered else "#f8fafc"
-                    border_color = "#10b981" if is_answered else "#3b82f6"
-                    st.markdown(f"""
-                    <div style="
-                        background-color: {bg_color};
-                        border-left: 4px solid {border_color};
-                        padding: 14px 16px;
-                        border-radius: 8px;
-                        margin: 8px 0;
-                    ">
-                        {status_icon} <strong>Q{q_idx + 1}:</strong> {q}
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with q_col2:
-                    if st.button("Ask", key=f"ask_{pillar_idx}_{q_idx}", use_container_width=True):
-                        st.session_state.current_question = q
-                        st.rerun()
-            
-            st.markdown("")
-    
-    st.markdown("")
+@functools.lru_cache(maxsize=None)
+def _question_row_html(q_idx, q, is_answered):
+    status_icon = "✅" if is_answered else "⭕"
+    bg_color = "#dbeafe" if is_answered else "#f8fafc"
+    border_color = "#10b981" if is_answered else "#3b82f6"
+    return f"""
+    <div style="
+        background-color: {bg_color};
+        border-left: 4px solid {border_color};
+        padding: 14px 16px;
+        border-radius: 8px;
+        margin: 8px 0;
+    ">
+        {status_icon} <strong>Q{q_idx + 1}:</strong> {q}
+    </div>
+    """
+
+def _toggle_pillar(module_name):
+    if module_name in st.session_state.expanded_pillars:
+        st.session_state.expanded_pillars.discard(module_name)
+    else:
+        st.session_state.expanded_pillars.add(module_name)
+
+def _pick_question(q):
+    st.session_state.current_question = q
+    st.session_state.question_picked = True
+
+@st.fragment
+@timed("pillars")
+def pillar_list():
+    """The three pillars; expanding or collapsing one reruns only this list."""
+    if st.session_state.pop("question_picked", False):
+        # Ask fills the question box in the answer panel: go straight to one
+        # page run instead of redrawing this list first
+        st.rerun(scope="app")
+    st.markdown("### Choose a Pillar:")
+
+    for pillar_idx, (module_name, module_data) in enumerate(MODULES.items()):
+        is_complete = is_module_complete(module_name)
+        is_expanded = module_name in st.session_state.expanded_pillars
+        completed_count = len(st.session_state.completed_modules[module_name])
+        total_count = len(module_data["questions"])
+        progress = completed_count / total_count
+
+        with st.container():
+            col1, col2, col3 = st.columns([8, 1, 1])
+
+            with col1:
+                st.markdown(f"### {module_data['icon']} {module_name}")
+
+            with col2:
+                toggle_label = "▼" if is_expanded else "▶"
+                st.button(toggle_label, key=f"toggle_{pillar_idx}", use_container_width=True,
+                          on_click=_toggle_pillar, args=(module_name,))
+
+
+            st.progress(progress)
+            status_emoji = "✅" if is_complete else "📖"
+            st.caption(f"{status_emoji} {completed_count}/{total_count} questions • {int(progress * 100)}%")
+
+            if is_expanded:
+                st.markdown("")
+
+                for q_idx, q in enumerate(module_data["questions"]):
+                    is_answered = q in st.session_state.completed_modules[module_name]
+
+                    q_col1, q_col2 = st.columns([5, 1])
+
+                    with q_col1:
+                        st.markdown(_question_row_html(q_idx, q, is_answered), unsafe_allow_html=True)
+
+                    with q_col2:
+                        st.button("Ask", key=f"ask_{pillar_idx}_{q_idx}", use_container_width=True,
+                                  on_click=_pick_question, args=(q,))
+
+                st.markdown("")
+
+        st.markdown("")
+
+pillar_list()
 
 # ============================================
 # PROGRESS SUMMARY
@@ -621,6 +850,7 @@ st.markdown("---")
 st.markdown("### 🎯 Your Learning Progress")
 
 col1, col2, col3, col4 = st.columns(4)
+total_completed, total_questions = progress_counts()
 
 with col1:
     st.metric("Overall", f"{int(calculate_progress() * 100)}%")
@@ -633,4 +863,6 @@ with col3:
     st.metric("Questions Done", f"{total_completed}/{total_questions}")
 
 with col4:
-    st.metric("Total Asked", st.session_state.questions_asked)
\ No newline at end of file
+    st.metric("Total Asked", st.session_state.questions_asked)
+
+st.session_state.render_times.append(("page", (time.perf_counter() - _PAGE_T0) * 1000))
@@ -0,0 +1,212 @@
+# bench/common.py — Shared setup for the benchmark scripts.
+# Importing this module points the process at the repo root and, unless the
+# caller already chose otherwise, forces the offline replay LLM backend with
+# the response cache bypassed so runs are deterministic and network-free.
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import subprocess
+import resource
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+os.chdir(ROOT)  # config.yaml and ./chroma_db are resolved relative to the repo root
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault("LLM_BACKEND", "replay")
+os.environ.setdefault("LLM_CACHE_BYPASS", "1")
+
+from curriculum import MODULES  # noqa: E402
+
+RESULTS_DIR = ROOT / "bench" / "results"
+
+
+# ----------------------------
+# Question sets
+# ----------------------------
+def module_questions() -> List[str]:
+    return [q for m in MODULES.values() for q in m["questions"]]
+
+_SUBJECTS = ["espresso", "pour-over", "V60", "French press", "cold brew", "cappuccino", "flat white", "cupping"]
+_DEFECTS = ["sour", "bitter", "thin", "astringent", "flat"]
+_VARIABLES = ["grind size", "water temperature", "dose", "brew ratio", "agitation", "milk temperature"]
+_TEMPLATES = [
+    "Why does my {s} taste {d}?",
+    "How does {v} affect {s}?",
+    "What is the difference between {s} and {s2}?",
+    "What is the ideal {v} for {s}?",
+    "How do I fix {d} {s}?",
+]
+
+def synthetic_questions(n: int = 100, seed: int = 7) -> List[str]:
+    """Deterministic free-form questions covering all four prompt routes."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        s, s2 = rng.sample(_SUBJECTS, 2)
+        out.append(rng.choice(_TEMPLATES).format(s=s, s2=s2, d=rng.choice(_DEFECTS), v=rng.choice(_VARIABLES)))
+    return out
+
+def question_set(name: str, synthetic_n: int = 100) -> List[str]:
+    if name == "modules":
+        return module_questions()
+    if name == "synthetic":
+        return synthetic_questions(synthetic_n)
+    if name == "all":
+        return module_questions() + synthetic_questions(synthetic_n)
+    raise ValueError(f"Unknown question set '{name}' (modules | synthetic | all)")
+
+
+def labeled_queries(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """[{question, relevant: [source ids]}] from bench/labeled_queries.yaml."""
+    import yaml
+    with open(path or ROOT / "bench" / "labeled_queries.yaml", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+# ----------------------------
+# Corpus (for scripts that build throwaway indexes)
+# ----------------------------
+def load_corpus(csv_path: Optional[str] = None) -> List[Any]:
+    """Raw (unsplit) documents loaded exactly as data/process_sources.py does."""
+    sys.path.insert(0, str(ROOT / "data"))
+    import process_sources
+    docs, _ = process_sources.load_from_csv(csv_path or process_sources.CFG.get("sources_csv", "data/sources 2.csv"))
+    return docs
+
+def dir_size(path: Any) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+# ----------------------------
+# Retrieval quality
+# ----------------------------
+def retrieval_metrics(ranked_sources: List[str], relevant: List[str], ks: List[int]) -> Dict[str, float]:
+    """recall@k / hit@k over source ids of a ranked chunk list, plus reciprocal rank."""
+    rel = set(relevant)
+    out: Dict[str, float] = {}
+    for k in ks:
+        found = rel & set(ranked_sources[:k])
+        out[f"recall@{k}"] = len(found) / len(rel) if rel else 0.0
+        out[f"hit@{k}"] = 1.0 if found else 0.0
+    rr = 0.0
+    for rank, sid in enumerate(ranked_sources, start=1):
+        if sid in rel:
+            rr = 1.0 / rank
+            break
+    out["rr"] = rr
+    return out
+
+def mean_metrics(rows: List[Dict[str, float]]) -> Dict[str, float]:
+    if not rows:
+        return {}
+    return {key: round(sum(r[key] for r in rows) / len(rows), 4) for key in rows[0]}
+
+
+# ----------------------------
+# Measurement
+# ----------------------------
+def percentile(values: List[float], p: float) -> float:
+    """Linear-interpolated percentile (p in 0..100)."""
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    pos = (len(xs) - 1) * p / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (pos - lo)
+
+def summarize(latencies_s: List[float], wall_s: float, errors: int = 0) -> Dict[str, Any]:
+    ms = [x * 1000.0 for x in latencies_s]
+    n = len(ms)
+    return {
+        "n": n,
+        "errors": errors,
+        "mean_ms": round(sum(ms) / n, 3) if n else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3) if ms else 0.0,
+        "throughput_per_s": round(n / wall_s, 3) if wall_s > 0 else 0.0,
+    }
+
+def peak_rss_mb() -> float:
+    """Process high-water RSS (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+def run_stage(
+    fn: Callable[[Any], Any],
+    items: List[Any],
+    warmup: int = 1,
+    memory_items: int = 5,
+) -> Dict[str, Any]:
+    """Time fn over items; then re-run a few under tracemalloc for peak Python memory."""
+    for it in items[:warmup]:
+        fn(it)
+    latencies, errors = [], 0
+    wall0 = time.perf_counter()
+    for it in items:
+        t0 = time.perf_counter()
+        try:
+            fn(it)
+        except Exception:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - t0)
+    res = summarize(latencies, time.perf_counter() - wall0, errors)
+
+    if memory_items:
+        tracemalloc.start()
+        for it in items[:memory_items]:
+            try:
+                fn(it)
+            except Exception:
+                pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        res["py_peak_alloc_mb"] = round(peak / 1e6, 2)
+    res["peak_rss_mb"] = peak_rss_mb()
+    return res
+
+
+# ----------------------------
+# Results
+# ----------------------------
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def run_metadata(extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    meta = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "llm_backend": os.environ.get("LLM_BACKEND"),
+    }
+    meta.update(extra or {})
+    return meta
+
+def save_results(kind: str, payload: Dict[str, Any], out: Optional[str] = None) -> Path:
+    path = Path(out) if out else RESULTS_DIR / f"{kind}-{payload['meta']['commit']}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, indent=2))
+    return path
+
+def print_table(results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'stage':28} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'py MB':>7}")
+    for name, r in results.items():
+        print(
+            f"{name:28} {r['n']:5d} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['p99_ms']:9.2f} "
+            f"{r['throughput_per_s']:9.2f} {r.get('py_peak_alloc_mb', 0):7.2f}"
+        )
@@ -0,0 +1,27 @@
+# bench/compare.py — Diff two benchmark result files (e.g. across commits).
+#
+#   python bench/compare.py bench/results/e2e-abc1234.json bench/results/e2e-def5678.json
+
+import sys
+import json
+
+
+def main():
+    if len(sys.argv) != 3:
+        raise SystemExit("usage: python bench/compare.py <baseline.json> <candidate.json>")
+    base, cand = (json.load(open(p)) for p in sys.argv[1:3])
+    print(f"baseline {base['meta']['commit']}  →  candidate {cand['meta']['commit']}\n")
+    print(f"{'stage':28} {'metric':8} {'base':>10} {'cand':>10} {'Δ%':>8}")
+    for stage, b in base["results"].items():
+        c = cand["results"].get(stage)
+        if c is None:
+            print(f"{stage:28} (missing in candidate)")
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s"):
+            bv, cv = b.get(metric, 0.0), c.get(metric, 0.0)
+            delta = (cv - bv) / bv * 100.0 if bv else 0.0
+            print(f"{stage:28} {metric[:-3] if metric.endswith('_ms') else 'ops/s':8} {bv:10.2f} {cv:10.2f} {delta:+7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# bench/e2e.py — End-to-end latency benchmark for the RAG pipeline.
+# Runs the MODULES questions and/or a synthetic set through retrieval, _ctx,
+# build_evidence, qa_chain and agent_run on the replay (offline) LLM, and
+# writes p50/p95/p99, throughput and peak memory to bench/results/.
+#
+#   python bench/e2e.py                          # all questions, replay LLM
+#   python bench/e2e.py --set modules --latency-ms 0 --tps 0
+#   python bench/compare.py bench/results/e2e-<old>.json bench/results/e2e-<new>.json
+
+import argparse
+
+import common  # sets cwd / sys.path / replay backend before the pipeline loads
+
+import langchain_rag as rag
+import agents
+
+
+def main():
+    ap = argparse.ArgumentParser(description="End-to-end pipeline benchmark (offline LLM).")
+    ap.add_argument("--set", default="all", choices=["modules", "synthetic", "all"])
+    ap.add_argument("--synthetic-n", type=int, default=100)
+    ap.add_argument("--agent-n", type=int, default=15, help="questions for agent_run (slowest stage)")
+    ap.add_argument("--profile", default=None, help="agent pipeline profile (default: config.yaml)")
+    ap.add_argument("--latency-ms", type=float, default=None, help="override replay time-to-first-token")
+    ap.add_argument("--tps", type=float, default=None, help="override replay tokens/sec (0 = instant)")
+    ap.add_argument("--stages", nargs="+", default=["retrieve", "_ctx", "build_evidence", "qa_chain", "agent_run"])
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    if isinstance(rag.LLM, rag.ReplayLLM):
+        if args.latency_ms is not None:
+            rag.LLM.latency_s = args.latency_ms / 1000.0
+        if args.tps is not None:
+            rag.LLM.tokens_per_sec = args.tps
+
+    questions = common.question_set(args.set, args.synthetic_n)
+    print(f"Benchmarking {len(questions)} questions (backend={rag.CFG['llm_backend']}) …")
+
+    # Pre-retrieved inputs so the formatting stages are timed in isolation.
+    docs_by_q = {q: rag.retrieve(q) for q in questions}
+    research_by_q = {
+        q: [{"result": "", "source_documents": rag.retrieve(x)} for x in agents.generate_related_queries(q)]
+        for q in questions
+    }
+
+    stages = {
+        "retrieve": lambda q: rag.retrieve(q),
+        "_ctx": lambda q: rag._ctx(docs_by_q[q]),
+        "build_evidence": lambda q: agents.build_evidence(research_by_q[q], question=q),
+        "qa_chain": lambda q: rag.qa_chain(q),
+        "agent_run": lambda q: agents.agent_run(q, profile=args.profile),
+    }
+
+    results = {}
+    for name in args.stages:
+        items = questions[: args.agent_n] if name == "agent_run" else questions
+        results[name] = common.run_stage(stages[name], items, memory_items=3 if name == "agent_run" else 5)
+
+    common.print_table(results)
+    replay = rag.LLM if isinstance(rag.LLM, rag.ReplayLLM) else None
+    payload = {
+        "meta": common.run_metadata({
+            "suite": "e2e",
+            "question_set": args.set,
+            "questions": len(questions),
+            "agent_profile": agents.get_profile(args.profile)["name"],
+            "retrieval_k": rag.CFG["retrieval_k"],
+            "replay_latency_ms": replay.latency_s * 1000.0 if replay else None,
+            "replay_tokens_per_sec": replay.tokens_per_sec if replay else None,
+        }),
+        "results": results,
+    }
+    print(f"Saved → {common.save_results('e2e', payload, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
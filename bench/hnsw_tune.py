@@ -0,0 +1,110 @@
+# bench/hnsw_tune.py — HNSW (M / ef_construction / ef_search) tuner.
+# Pulls the stored chunk embeddings out of ./chroma_db, builds HNSW graphs with
+# hnswlib (the library Chroma uses under the hood) for each setting, and
+# measures recall@k against exact brute-force search, query latency and build
+# time. Recommends the fastest setting that meets --target-recall and prints
+# the matching `hnsw:` block for config.yaml.
+#
+#   python bench/hnsw_tune.py
+#   python bench/hnsw_tune.py --M 8 16 32 --ef-construction 64 100 200 --ef-search 10 20 50 100 --k 3
+
+import time
+import argparse
+import itertools
+
+import numpy as np
+
+import common
+
+import hnswlib
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_community.vectorstores import Chroma
+
+from settings import CFG
+from index_store import hnsw_settings, current_index
+
+
+def exact_topk(data: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    if space == "l2":
+        d = (queries ** 2).sum(1)[:, None] - 2 * queries @ data.T + (data ** 2).sum(1)[None, :]
+    elif space == "cosine":
+        dn = data / np.linalg.norm(data, axis=1, keepdims=True)
+        qn = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        d = -(qn @ dn.T)
+    else:  # ip
+        d = -(queries @ data.T)
+    return np.argsort(d, axis=1)[:, :k]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Tune HNSW parameters against exact search.")
+    ap.add_argument("--M", nargs="+", type=int, default=[8, 16, 32])
+    ap.add_argument("--ef-construction", nargs="+", type=int, default=[64, 100, 200])
+    ap.add_argument("--ef-search", nargs="+", type=int, default=[10, 20, 50, 100])
+    ap.add_argument("--space", default=None, help="l2 | cosine | ip (default: config.yaml hnsw.space)")
+    ap.add_argument("--k", type=int, default=None, help="default: config.yaml retrieval_k")
+    ap.add_argument("--target-recall", type=float, default=0.99)
+    ap.add_argument("--repeat", type=int, default=20, help="query passes per setting for stable latency")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    space = args.space or hnsw_settings(CFG)["space"]
+    k = args.k or int(CFG["retrieval_k"])
+
+    emb = HuggingFaceEmbeddings(model_name=CFG["embedding_model"])
+    _, index_dir = current_index(CFG["persist_directory"])
+    store = Chroma(embedding_function=emb, persist_directory=index_dir)
+    data = np.asarray(store._collection.get(include=["embeddings"])["embeddings"], dtype=np.float32)
+    if len(data) == 0:
+        raise SystemExit("Index is empty — run `python data/process_sources.py` first.")
+    questions = [q["question"] for q in common.labeled_queries()] + common.synthetic_questions(200)
+    queries = np.asarray(emb.embed_documents(questions), dtype=np.float32)
+    k = min(k, len(data))
+    truth = exact_topk(data, queries, k, space)
+    print(f"Corpus: {len(data)} chunks × {data.shape[1]} dims, {len(queries)} queries, space={space}, k={k}")
+
+    rows = []
+    for M, efc in itertools.product(args.M, args.ef_construction):
+        index = hnswlib.Index(space=space, dim=data.shape[1])
+        t0 = time.perf_counter()
+        index.init_index(max_elements=len(data), M=M, ef_construction=efc, random_seed=7)
+        index.add_items(data, np.arange(len(data)))
+        build_s = time.perf_counter() - t0
+        for efs in args.ef_search:
+            index.set_ef(max(efs, k))
+            latencies = []
+            for _ in range(args.repeat):
+                for q in queries:
+                    t1 = time.perf_counter()
+                    index.knn_query(q, k=k)
+                    latencies.append(time.perf_counter() - t1)
+            labels, _ = index.knn_query(queries, k=k)
+            recall = float(np.mean([len(set(a) & set(b)) / k for a, b in zip(labels, truth)]))
+            lat = common.summarize(latencies, sum(latencies))
+            rows.append({
+                "M": M, "ef_construction": efc, "ef_search": efs,
+                "recall": round(recall, 4), "build_ms": round(build_s * 1000, 2),
+                "p50_us": round(lat["p50_ms"] * 1000, 1), "p95_us": round(lat["p95_ms"] * 1000, 1),
+            })
+            r = rows[-1]
+            print(f"M={M:3d} efC={efc:4d} efS={efs:4d}  recall@{k}={r['recall']:.4f}  "
+                  f"p50={r['p50_us']:7.1f}µs p95={r['p95_us']:7.1f}µs  build={r['build_ms']:.1f}ms")
+
+    ok = [r for r in rows if r["recall"] >= args.target_recall]
+    best = min(ok, key=lambda r: (r["p95_us"], r["M"], r["ef_construction"])) if ok else max(rows, key=lambda r: r["recall"])
+    print(f"\nRecommended for {len(data)} chunks (recall ≥ {args.target_recall}):" if ok
+          else f"\nNo setting reached recall {args.target_recall}; highest-recall setting:")
+    print(f"hnsw:\n  space: {space}\n  M: {best['M']}\n  ef_construction: {best['ef_construction']}\n  ef_search: {best['ef_search']}")
+
+    payload = {
+        "meta": common.run_metadata({"suite": "hnsw_tune", "chunks": len(data), "dims": int(data.shape[1]),
+                                     "queries": len(queries), "space": space, "k": k,
+                                     "target_recall": args.target_recall}),
+        "recommended": best,
+        "results": rows,
+    }
+    print(f"Saved → {common.save_results('hnsw_tune', payload, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
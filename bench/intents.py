@@ -0,0 +1,82 @@
+# bench/intents.py — Prompt size and latency per question intent.
+# Runs the question set through qa_chain with intent-aware retrieval
+# (prompts.INTENT_POLICIES) and with the fixed global retrieval_k, and
+# reports per intent: questions, chunks in context, average prompt tokens
+# (as the backend counts them) and latency.
+#
+#   python bench/intents.py
+#   python bench/intents.py --set modules --latency-ms 0 --tps 0
+
+import time
+import argparse
+from collections import defaultdict
+
+import common  # sets cwd / sys.path / replay backend before the pipeline loads
+
+import langchain_rag as rag
+from prompts import classify_intent
+
+
+def run(questions, adaptive):
+    rag.CFG["adaptive_retrieval"] = adaptive
+    rows = defaultdict(lambda: {"latencies": [], "prompt_tokens": [], "chunks": []})
+    for q in questions:
+        t0 = time.perf_counter()
+        r = rag.qa_chain(q)
+        row = rows[classify_intent(q)]
+        row["latencies"].append(time.perf_counter() - t0)
+        row["prompt_tokens"].append((r.get("usage") or {}).get("input_tokens", 0))
+        row["chunks"].append(len(r.get("source_documents", [])))
+    out = {}
+    for intent, row in sorted(rows.items()):
+        n = len(row["latencies"])
+        out[intent] = {
+            "n": n,
+            "avg_chunks": round(sum(row["chunks"]) / n, 2),
+            "avg_prompt_tokens": round(sum(row["prompt_tokens"]) / n, 1),
+            "avg_latency_ms": round(sum(row["latencies"]) / n * 1000, 1),
+            "p95_latency_ms": round(common.percentile(row["latencies"], 95) * 1000, 1),
+        }
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-intent prompt tokens and latency (offline LLM).")
+    ap.add_argument("--set", default="all", choices=["modules", "synthetic", "all"])
+    ap.add_argument("--synthetic-n", type=int, default=100)
+    ap.add_argument("--latency-ms", type=float, default=None, help="override replay time-to-first-token")
+    ap.add_argument("--tps", type=float, default=None, help="override replay tokens/sec (0 = instant)")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    if isinstance(rag.LLM, rag.ReplayLLM):
+        if args.latency_ms is not None:
+            rag.LLM.latency_s = args.latency_ms / 1000.0
+        if args.tps is not None:
+            rag.LLM.tokens_per_sec = args.tps
+
+    questions = common.question_set(args.set, args.synthetic_n)
+    print(f"Running {len(questions)} questions (backend={rag.CFG['llm_backend']}) …")
+    results = {"adaptive": run(questions, True), "fixed": run(questions, False)}
+
+    print(f"\n{'intent':13} {'mode':9} {'n':>4} {'chunks':>7} {'prompt tok':>11} {'avg ms':>9} {'p95 ms':>9}")
+    for intent in results["adaptive"]:
+        for mode in ("fixed", "adaptive"):
+            r = results[mode][intent]
+            print(f"{intent:13} {mode:9} {r['n']:4d} {r['avg_chunks']:7.2f} {r['avg_prompt_tokens']:11.1f} "
+                  f"{r['avg_latency_ms']:9.1f} {r['p95_latency_ms']:9.1f}")
+
+    payload = {
+        "meta": common.run_metadata({
+            "suite": "intents",
+            "question_set": args.set,
+            "questions": len(questions),
+            "retrieval_k": rag.CFG["retrieval_k"],
+        }),
+        "results": results,
+    }
+    print(f"Saved → {common.save_results('intents', payload, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# bench/loadtest.py — Concurrent-user load generator for the serving path.
+# Simulates N users (threads) sharing this process's EMB / VSTORE / LLM
+# globals, exactly like concurrent Streamlit sessions, and ramps N up to show
+# where throughput stops scaling and tail latency / errors take off.
+#
+#   python bench/loadtest.py                                  # ramp 1→32 users, 20 s per step
+#   python bench/loadtest.py --users 1 4 16 --duration 10 --agent-ratio 0.3 --module-ratio 0.8
+
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from typing import Any, Dict, List
+
+import common
+
+import langchain_rag as rag
+import agents
+
+
+def _user(
+    uid: int,
+    args: argparse.Namespace,
+    modules_qs: List[str],
+    free_qs: List[str],
+    start: threading.Barrier,
+    records: List[Dict[str, Any]],
+) -> None:
+    rng = random.Random(args.seed * 1000 + uid)
+    start.wait()
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        q = rng.choice(modules_qs if rng.random() < args.module_ratio else free_qs)
+        target = "agent_run" if rng.random() < args.agent_ratio else "qa_chain"
+        t0 = time.perf_counter()
+        err = None
+        try:
+            if target == "agent_run":
+                agents.agent_run(q, profile=args.profile)
+            else:
+                rag.qa_chain(q)
+        except Exception as e:
+            err = type(e).__name__
+        records.append({"target": target, "latency_s": time.perf_counter() - t0, "error": err})
+        if args.think_ms:
+            time.sleep(rng.uniform(0, 2 * args.think_ms) / 1000.0)
+
+
+def run_level(n_users: int, args: argparse.Namespace, modules_qs: List[str], free_qs: List[str]) -> Dict[str, Any]:
+    records: List[Dict[str, Any]] = []  # list.append is atomic under the GIL
+    start = threading.Barrier(n_users + 1)
+    threads = [
+        threading.Thread(target=_user, args=(u, args, modules_qs, free_qs, start, records), daemon=True)
+        for u in range(n_users)
+    ]
+    for t in threads:
+        t.start()
+    start.wait()
+    wall0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall0
+
+    ok = [r for r in records if r["error"] is None]
+    res = common.summarize([r["latency_s"] for r in ok], wall, errors=len(records) - len(ok))
+    res["users"] = n_users
+    res["error_rate"] = round(res["errors"] / len(records), 4) if records else 0.0
+    res["error_types"] = dict(Counter(r["error"] for r in records if r["error"]))
+    res["by_target"] = {
+        target: common.summarize([r["latency_s"] for r in ok if r["target"] == target], wall)
+        for target in ("qa_chain", "agent_run")
+    }
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Concurrent-user load test (stubbed/replayed LLM).")
+    ap.add_argument("--users", nargs="+", type=int, default=[1, 2, 4, 8, 16, 32])
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds per concurrency step")
+    ap.add_argument("--agent-ratio", type=float, default=0.2, help="fraction of requests sent to agent_run")
+    ap.add_argument("--module-ratio", type=float, default=0.7, help="fraction of MODULES vs free-form questions")
+    ap.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a user's requests")
+    ap.add_argument("--profile", default=None, help="agent pipeline profile")
+    ap.add_argument("--latency-ms", type=float, default=None, help="override replay time-to-first-token")
+    ap.add_argument("--tps", type=float, default=None, help="override replay tokens/sec (0 = instant)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    if isinstance(rag.LLM, rag.ReplayLLM):
+        if args.latency_ms is not None:
+            rag.LLM.latency_s = args.latency_ms / 1000.0
+        if args.tps is not None:
+            rag.LLM.tokens_per_sec = args.tps
+
+    modules_qs = common.module_questions()
+    free_qs = common.synthetic_questions(200, seed=args.seed)
+    rag.qa_chain(modules_qs[0])  # warm the embedder and index before the first step
+
+    print(f"{'users':>5} {'req':>6} {'ops/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err %':>6}")
+    levels = []
+    for n in args.users:
+        r = run_level(n, args, modules_qs, free_qs)
+        levels.append(r)
+        print(
+            f"{n:5d} {r['n'] + r['errors']:6d} {r['throughput_per_s']:8.2f} {r['p50_ms']:9.1f} "
+            f"{r['p95_ms']:9.1f} {r['p99_ms']:9.1f} {r['error_rate'] * 100:6.2f}"
+            + (f"  {r['error_types']}" if r["error_types"] else "")
+        )
+
+    # Knee: first step where adding users no longer buys ≥10% throughput
+    knee = None
+    for prev, cur in zip(levels, levels[1:]):
+        if cur["throughput_per_s"] < prev["throughput_per_s"] * 1.10:
+            knee = prev["users"]
+            break
+    if knee is not None:
+        print(f"\nThroughput saturates at ~{knee} concurrent users.")
+
+    payload = {
+        "meta": common.run_metadata({
+            "suite": "loadtest",
+            "duration_s": args.duration,
+            "agent_ratio": args.agent_ratio,
+            "module_ratio": args.module_ratio,
+            "think_ms": args.think_ms,
+            "agent_profile": agents.get_profile(args.profile)["name"],
+        }),
+        "saturation_users": knee,
+        "levels": levels,
+    }
+    print(f"Saved → {common.save_results('loadtest', payload, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
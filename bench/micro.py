@@ -0,0 +1,56 @@
+# bench/micro.py — Micro-benchmarks for embedding and vector search.
+# Kept separate from bench/e2e.py so model/index changes can be measured
+# without any LLM (or replay) in the loop.
+#
+#   python bench/micro.py
+#   python bench/micro.py --k 1 3 5 10 20 --batch 1 8 32
+
+import argparse
+
+import common
+
+import langchain_rag as rag
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Embedding and retrieval micro-benchmarks.")
+    ap.add_argument("--k", nargs="+", type=int, default=[1, 3, 5, 10])
+    ap.add_argument("--batch", nargs="+", type=int, default=[1, 8, 32])
+    ap.add_argument("--synthetic-n", type=int, default=100)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    questions = common.question_set("all", args.synthetic_n)
+    results = {}
+
+    # Embedding: single query, then document batches
+    results["embed_query"] = common.run_stage(rag.EMB.embed_query, questions)
+    for b in args.batch:
+        batches = [questions[i:i + b] for i in range(0, len(questions), b)]
+        r = common.run_stage(rag.EMB.embed_documents, batches)
+        r["texts_per_s"] = round(r["throughput_per_s"] * b, 2)
+        results[f"embed_documents[b={b}]"] = r
+
+    # Vector search with a precomputed query vector (no embedding cost) …
+    vectors = {q: rag.EMB.embed_query(q) for q in questions}
+    for k in args.k:
+        results[f"search_by_vector[k={k}]"] = common.run_stage(
+            lambda q, k=k: rag.VSTORE.similarity_search_by_vector(vectors[q], k=k), questions
+        )
+    # … and the full retriever path (embedding + search) at the configured k
+    results[f"retrieve[k={rag.CFG['retrieval_k']}]"] = common.run_stage(rag.retrieve, questions)
+
+    common.print_table(results)
+    payload = {
+        "meta": common.run_metadata({
+            "suite": "micro",
+            "embedding_model": rag.CFG["embedding_model"],
+            "chroma_count": rag.healthcheck()["chroma_count"],
+        }),
+        "results": results,
+    }
+    print(f"Saved → {common.save_results('micro', payload, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# bench/mode_report.py — What auto mode decided and how much time it saved.
+# Reads the decisions agents.auto_answer logs to `mode_log_path` and reports
+# the split per intent, average latency per chosen path, and the latency
+# saved by answering questions with qa_chain instead of escalating, using
+# the measured multi-agent latency as the baseline for what "always tick
+# multi-agent" would have cost.
+#
+#   python bench/mode_report.py
+#   python bench/mode_report.py --log logs/mode_decisions.jsonl --since-hours 24
+
+import json
+import time
+import argparse
+from collections import defaultdict
+
+import common  # noqa: F401 — cwd / sys.path
+
+from settings import CFG
+from profiles import PIPELINE_PROFILES
+
+
+def load(path, since_hours=None):
+    cutoff = time.time() - since_hours * 3600 if since_hours else 0
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                if row.get("ts", 0) >= cutoff:
+                    rows.append(row)
+    return rows
+
+
+def _estimate_s(profile):
+    # "~20-40 sec" → 30.0, used when no multi-agent run was logged for a profile
+    lo, hi = PIPELINE_PROFILES[profile]["estimate"].strip("~ sec").split("-")
+    return (float(lo) + float(hi)) / 2
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Summarize auto-mode decisions.")
+    ap.add_argument("--log", default=CFG["mode_log_path"])
+    ap.add_argument("--since-hours", type=float, default=None)
+    args = ap.parse_args()
+
+    rows = load(args.log, args.since_hours)
+    if not rows:
+        raise SystemExit(f"No decisions in {args.log}")
+
+    by_intent = defaultdict(lambda: {"standard": 0, "multi_agent": 0})
+    lat = defaultdict(list)
+    multi_by_profile = defaultdict(list)
+    for r in rows:
+        by_intent[r["intent"]][r["mode"]] += 1
+        lat[r["mode"]].append(r["latency_s"])
+        if r["mode"] == "multi_agent":
+            multi_by_profile[r["profile"]].append(r["latency_s"])
+
+    print(f"{len(rows)} auto-mode questions\n")
+    print(f"{'intent':13} {'standard':>9} {'multi':>6}")
+    for intent, c in sorted(by_intent.items()):
+        print(f"{intent:13} {c['standard']:9d} {c['multi_agent']:6d}")
+
+    print(f"\n{'path':12} {'n':>5} {'avg s':>7} {'p95 s':>7}")
+    for mode in ("standard", "multi_agent"):
+        xs = lat.get(mode, [])
+        if xs:
+            print(f"{mode:12} {len(xs):5d} {sum(xs) / len(xs):7.2f} {common.percentile(xs, 95):7.2f}")
+
+    # Saved = for each question answered by qa_chain, (multi-agent latency
+    # for its profile) − (what it actually took).
+    saved = 0.0
+    for r in rows:
+        if r["mode"] != "standard":
+            continue
+        ref = multi_by_profile.get(r["profile"])
+        baseline = sum(ref) / len(ref) if ref else _estimate_s(r["profile"])
+        saved += max(0.0, baseline - r["latency_s"])
+    routing = [r.get("route_s", 0.0) for r in rows]
+    print(f"\nRouting overhead: avg {sum(routing) / len(routing) * 1000:.0f} ms per question")
+    print(f"Latency saved vs always multi-agent: {saved:.0f} s total, "
+          f"{saved / len(rows):.1f} s per question")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# bench/rerank.py — Cross-encoder rerank: quality gained vs latency spent.
+# For each labeled query, compares plain vector top-k with "fetch N
+# candidates, keep the cross-encoder's best k" (reranker.py) on recall@k /
+# MRR and context tokens, and times the rerank stage cold (empty score
+# cache) and warm (every pair cached) against `rerank_budget_ms`. Plain top-k
+# at larger k is listed too, as the "just raise retrieval_k" alternative.
+#
+#   python bench/rerank.py
+#   python bench/rerank.py --candidates 10 20 40 --batch-size 8 16 32 --backend onnx
+
+import time
+import argparse
+
+import common
+
+import langchain_rag as rag
+from reranker import build_reranker
+
+SNIPPET_CHARS = 900  # mirrors _ctx in langchain_rag.py
+
+
+def _ctx_tokens(docs):
+    return sum(max(1, len((d.page_content or "")[:SNIPPET_CHARS]) // 4) for d in docs)
+
+
+def quality(ranked_docs, queries, k):
+    rows = [common.retrieval_metrics([str(d.metadata.get("id", "?")) for d in docs], q["relevant"], [k])
+            for docs, q in zip(ranked_docs, queries)]
+    m = common.mean_metrics(rows)
+    return {"recall": m[f"recall@{k}"], "mrr": m["rr"], "ctx_tokens": round(sum(map(_ctx_tokens, ranked_docs)) / len(ranked_docs), 1)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Rerank quality and stage latency on labeled queries.")
+    ap.add_argument("--k", type=int, default=None, help="chunks sent to the LLM (default: retrieval_k)")
+    ap.add_argument("--candidates", nargs="+", type=int, default=[10, 20, 40])
+    ap.add_argument("--batch-size", nargs="+", type=int, default=None, help="default: rerank_batch_size")
+    ap.add_argument("--backend", default=None, choices=["torch", "onnx"])
+    ap.add_argument("--queries", default=None, help="labeled queries YAML")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    cfg = dict(rag.CFG)
+    if args.backend:
+        cfg["rerank_backend"] = args.backend
+    k = args.k or int(cfg["retrieval_k"])
+    queries = common.labeled_queries(args.queries)
+    pool = {q["question"]: rag.VSTORE.similarity_search(q["question"], k=max(args.candidates)) for q in queries}
+
+    baseline = {f"top{kk}": quality([pool[q["question"]][:kk] for q in queries], queries, kk)
+                for kk in sorted({k, 2 * k, max(8, k)})}
+    for name, r in baseline.items():
+        print(f"{name:>16}: recall={r['recall']:.3f} mrr={r['mrr']:.3f} ctx≈{r['ctx_tokens']:.0f}tok")
+
+    rows = []
+    for n in args.candidates:
+        for bs in args.batch_size or [int(cfg["rerank_batch_size"])]:
+            rr = build_reranker({**cfg, "rerank_batch_size": bs})
+            rr.warm()
+            runs = {}
+            for phase in ("cold", "warm"):  # warm: same pairs again, served from the score cache
+                lat, ranked = [], []
+                for q in queries:
+                    t0 = time.perf_counter()
+                    top, _ = rr.rerank(q["question"], pool[q["question"]][:n], k, key=rag.chunk_id)
+                    lat.append(time.perf_counter() - t0)
+                    ranked.append([d for d, _ in top])
+                runs[phase] = (common.summarize(lat, sum(lat)), ranked)
+            cold, ranked = runs["cold"]
+            warm = runs["warm"][0]
+            row = {
+                "candidates": n,
+                "batch_size": bs,
+                "backend": rr.backend,
+                **quality(ranked, queries, k),
+                "cold_p50_ms": cold["p50_ms"],
+                "cold_p95_ms": cold["p95_ms"],
+                "warm_p50_ms": warm["p50_ms"],
+                "budget_ms": rr.budget_ms,
+                "within_budget": cold["p95_ms"] <= rr.budget_ms,
+            }
+            rows.append(row)
+            print(f"rerank {n:3d}→{k} bs={bs:3d} ({row['backend']}): recall={row['recall']:.3f} mrr={row['mrr']:.3f} "
+                  f"ctx≈{row['ctx_tokens']:.0f}tok cold p50/p95={row['cold_p50_ms']:.1f}/{row['cold_p95_ms']:.1f}ms "
+                  f"warm p50={row['warm_p50_ms']:.2f}ms {'✓' if row['within_budget'] else '✗'} budget {row['budget_ms']:.0f}ms")
+
+    payload = {
+        "meta": common.run_metadata({"suite": "rerank", "queries": len(queries), "k": k,
+                                     "rerank_model": cfg["rerank_model"]}),
+        "results": {"baseline": baseline, "rerank": rows},
+    }
+    print(f"Saved → {common.save_results('rerank', payload, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# bench/retrieval_sweep.py — recall@k vs latency over chunking settings.
+# Builds a throwaway Chroma index from the same sources for every
+# (chunk_size, chunk_overlap) pair, runs bench/labeled_queries.yaml against it
+# at several k, and reports recall@k, hit@k, MRR, index size, query latency
+# and the average context tokens _ctx would send to the LLM. Settings on the
+# cost/quality Pareto front are marked with "*".
+#
+#   python bench/retrieval_sweep.py
+#   python bench/retrieval_sweep.py --chunk-size 500 800 1000 1500 --overlap 0 100 200 --k 3 5 8
+
+import time
+import shutil
+import argparse
+import tempfile
+import itertools
+from typing import Any, Dict, List
+
+import common
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_community.vectorstores import Chroma
+
+SNIPPET_CHARS = 900  # mirrors _ctx in langchain_rag.py
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def evaluate(store: Any, queries: List[Dict[str, Any]], ks: List[int]) -> Dict[str, Any]:
+    kmax = max(ks)
+    per_query, ctx_tokens = [], {k: [] for k in ks}
+    latencies = {k: [] for k in ks}
+    for item in queries:
+        for k in ks:
+            t0 = time.perf_counter()
+            store.similarity_search(item["question"], k=k)
+            latencies[k].append(time.perf_counter() - t0)
+        docs = store.similarity_search(item["question"], k=kmax)
+        ranked = [str(d.metadata.get("id", "?")) for d in docs]
+        per_query.append(common.retrieval_metrics(ranked, item["relevant"], ks))
+        for k in ks:
+            ctx_tokens[k].append(sum(_approx_tokens((d.page_content or "")[:SNIPPET_CHARS]) for d in docs[:k]))
+
+    quality = common.mean_metrics(per_query)
+    out = {"mrr": quality.pop("rr"), **quality}
+    for k in ks:
+        lat = common.summarize(latencies[k], sum(latencies[k]))
+        out[f"p50_ms@{k}"] = lat["p50_ms"]
+        out[f"p95_ms@{k}"] = lat["p95_ms"]
+        out[f"ctx_tokens@{k}"] = round(sum(ctx_tokens[k]) / len(ctx_tokens[k]), 1)
+    return out
+
+
+def pareto(rows: List[Dict[str, Any]], quality_key: str, cost_key: str) -> None:
+    """Flag rows not dominated on (higher quality, lower cost)."""
+    for r in rows:
+        r["pareto"] = not any(
+            o is not r and o[quality_key] >= r[quality_key] and o[cost_key] <= r[cost_key]
+            and (o[quality_key] > r[quality_key] or o[cost_key] < r[cost_key])
+            for o in rows
+        )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Sweep chunk_size / chunk_overlap / k against labeled queries.")
+    ap.add_argument("--chunk-size", nargs="+", type=int, default=[500, 750, 1000, 1500])
+    ap.add_argument("--overlap", nargs="+", type=int, default=[0, 100, 200])
+    ap.add_argument("--k", nargs="+", type=int, default=[1, 3, 5, 8])
+    ap.add_argument("--csv", default=None, help="sources CSV (default: config.yaml sources_csv)")
+    ap.add_argument("--queries", default=None, help="labeled queries YAML")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    queries = common.labeled_queries(args.queries)
+    print("Loading sources …")
+    docs = common.load_corpus(args.csv)
+    print(f"Loaded {len(docs)} documents, {len(queries)} labeled queries.")
+
+    import process_sources  # on sys.path after load_corpus
+    embeddings = HuggingFaceEmbeddings(model_name=process_sources.CFG["embedding_model"])
+    ks = sorted(set(args.k))
+    focus_k = int(process_sources.CFG.get("retrieval_k", 3))
+    if focus_k not in ks:
+        focus_k = ks[0]
+
+    rows = []
+    for size, overlap in itertools.product(args.chunk_size, args.overlap):
+        if overlap >= size:
+            continue
+        splits = RecursiveCharacterTextSplitter(chunk_size=size, chunk_overlap=overlap).split_documents(docs)
+        tmp = tempfile.mkdtemp(prefix="coffee-sweep-")
+        try:
+            t0 = time.perf_counter()
+            store = Chroma.from_documents(
+                documents=splits,
+                embedding=embeddings,
+                persist_directory=tmp,
+                collection_name=f"sweep_{size}_{overlap}",
+            )
+            build_s = time.perf_counter() - t0
+            row = {
+                "chunk_size": size,
+                "chunk_overlap": overlap,
+                "chunks": len(splits),
+                "build_s": round(build_s, 2),
+                "index_mb": round(common.dir_size(tmp) / 1e6, 2),
+                **evaluate(store, queries, ks),
+            }
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        rows.append(row)
+        print(
+            f"size={size:5d} overlap={overlap:4d} chunks={row['chunks']:5d} "
+            f"recall@{focus_k}={row[f'recall@{focus_k}']:.3f} mrr={row['mrr']:.3f} "
+            f"p50={row[f'p50_ms@{focus_k}']:.1f}ms ctx≈{row[f'ctx_tokens@{focus_k}']:.0f}tok "
+            f"index={row['index_mb']:.1f}MB"
+        )
+
+    pareto(rows, f"recall@{focus_k}", f"ctx_tokens@{focus_k}")
+    print(f"\nPareto front (recall@{focus_k} vs context tokens):")
+    for r in sorted((r for r in rows if r["pareto"]), key=lambda r: r[f"ctx_tokens@{focus_k}"]):
+        print(f"  * chunk_size={r['chunk_size']} chunk_overlap={r['chunk_overlap']} "
+              f"recall@{focus_k}={r[f'recall@{focus_k}']:.3f} ctx≈{r[f'ctx_tokens@{focus_k}']:.0f}tok")
+
+    payload = {
+        "meta": common.run_metadata({"suite": "retrieval_sweep", "queries": len(queries), "k": ks, "focus_k": focus_k}),
+        "results": rows,
+    }
+    print(f"Saved → {common.save_results('retrieval_sweep', payload, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
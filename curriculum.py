@@ -0,0 +1,38 @@
+# curriculum.py — Learning pillars and their guided questions.
+# Shared by app.py and the benchmark / evaluation scripts in bench/.
+
+MODULES = {
+    "Pillar 1: Coffee Sensory Evaluation & Flavor Science": {
+        "icon": "👅",
+        "short_name": "Sensory & Flavor",
+        "questions": [
+            "How are coffee flavors categorized across aroma, taste, and aftertaste?",
+            "What is the role of the World Coffee Research Sensory Lexicon, and how are its intensity scales applied in practice?",
+            "How can I describe coffee flavors precisely during a cupping session?",
+            "How can I design a simple comparative tasting to train my palate in recognizing sweetness and acidity?",
+            "How do different processing methods—washed, natural, and honey—shape a coffee’s sensory profile?"
+        ]
+    },
+    "Pillar 2: Espresso Mastery & Milk-Based Drinks": {
+        "icon": "☕️",
+        "short_name": "Espresso & Milk",
+        "questions": [
+            "How do grind size and dose affect espresso extraction?",
+            "What is the ideal espresso brewing temperature and pressure?",
+            "How does milk steaming temperature influence foam quality?",
+            "What are the key steps to dial in espresso properly?",
+            "What are the differences between latte, cappuccino, and flat white textures?"
+        ]
+    },
+    "Pillar 3: Hand-Brewed Coffee Methods": {
+        "icon": "🫖",
+        "short_name": "Hand Brewing",
+        "questions": [
+            "What is the optimal coffee-to-water ratio for V60 brewing?",
+            "How does water temperature affect extraction in pour-over methods?",
+            "What's the difference between immersion and percolation brewing?",
+            "How does pouring technique influence agitation and flavor?",
+            "How do various brewing methods highlight different coffee origins?"
+        ]
+    }
+}
@@ -0,0 +1,88 @@
+# data/dedup.py
+# Ingest-time near-duplicate chunk removal with MinHash + LSH banding.
+# Chunks whose word-shingle Jaccard similarity to an earlier chunk is at
+# least `threshold` are dropped; the kept (canonical) chunk records where its
+# duplicates came from in metadata, so citations can still mention them.
+import re, zlib, random
+from typing import Dict, List, Optional, Tuple
+
+_MERSENNE = (1 << 61) - 1
+_WORD = re.compile(r"\w+")
+
+
+class MinHasher:
+    """num_perm universal-hash permutations over 5-word shingles."""
+
+    def __init__(self, num_perm: int = 128, shingle: int = 5, seed: int = 7):
+        rng = random.Random(seed)
+        self.shingle = shingle
+        self.perms = [(rng.randrange(1, _MERSENNE), rng.randrange(0, _MERSENNE)) for _ in range(num_perm)]
+
+    def shingles(self, text: str) -> set:
+        words = _WORD.findall(text.lower())
+        n = self.shingle
+        if len(words) < n:
+            return {zlib.crc32(" ".join(words).encode("utf-8"))}
+        return {zlib.crc32(" ".join(words[i:i + n]).encode("utf-8")) for i in range(len(words) - n + 1)}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        sh = self.shingles(text)
+        return tuple(min((a * x + b) % _MERSENNE for x in sh) for a, b in self.perms)
+
+
+def estimate_jaccard(s1: Tuple[int, ...], s2: Tuple[int, ...]) -> float:
+    return sum(a == b for a, b in zip(s1, s2)) / len(s1)
+
+
+def _label(meta: Dict, sources: Optional[Dict[str, Dict]] = None) -> str:
+    src = (sources or {}).get(str(meta.get("id"))) or meta
+    title = src.get("title") or src.get("source") or meta.get("id") or "?"
+    page = meta.get("page")
+    return f"{title}@p{page}" if page is not None else str(title)
+
+
+def dedup_chunks(chunks: List, threshold: float = 0.8, num_perm: int = 128, bands: int = 16,
+                 sources: Optional[Dict[str, Dict]] = None) -> Tuple[List, int]:
+    """Drop near-duplicate LangChain Documents; returns (kept, n_dropped).
+
+    ``sources`` is the ingest source table, used to name the dropped chunks'
+    sources in ``dup_sources``.
+
+    bands × rows = num_perm; 16 bands of 8 rows make chunks above ~0.7
+    estimated Jaccard likely to collide in some band, and candidates are then
+    checked against `threshold` on the full signature.
+    """
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm=num_perm)
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+    kept, sigs, dropped = [], [], 0
+
+    for d in chunks:
+        sig = hasher.signature(d.page_content or "")
+        keys = [(b, sig[b * rows:(b + 1) * rows]) for b in range(bands)]
+        match = None
+        for key in keys:
+            for j in buckets.get(key, ()):
+                if estimate_jaccard(sig, sigs[j]) >= threshold:
+                    match = j
+                    break
+            if match is not None:
+                break
+
+        if match is None:
+            for key in keys:
+                buckets.setdefault(key, []).append(len(kept))
+            kept.append(d)
+            sigs.append(sig)
+            continue
+
+        # Chroma metadata values must be scalars: provenance as a "; "-joined string
+        canon = kept[match].metadata
+        label = _label(d.metadata, sources)
+        prev = canon.get("dup_sources", "")
+        if label not in prev.split("; "):
+            canon["dup_sources"] = f"{prev}; {label}" if prev else label
+        canon["dup_count"] = int(canon.get("dup_count", 0)) + 1
+        dropped += 1
+
+    return kept, dropped
@@ -0,0 +1,277 @@
+# data/index_tool.py
+# Maintenance CLI for the Chroma index.
+#   report  — chunks per source, exact / near-duplicate chunks, rows whose CSV
+#             entry is gone, on-disk size by component, per-chunk metadata
+#             size vs. the source table, embedding-model checks
+#   compact — drop duplicates (and optionally near-duplicates / orphans) and
+#             write the survivors to a new index version with a freshly built
+#             HNSW segment, then publish it (running apps hot-swap to it)
+#
+#   python data/index_tool.py report
+#   python data/index_tool.py compact --near --drop-orphans
+import os, sys, csv, time, json, hashlib, argparse
+from collections import Counter, defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root
+from settings import CFG
+from index_store import (
+    hnsw_metadata, current_index, new_version_dir, read_manifest, write_manifest,
+    read_sources, write_sources, resolve_source, publish_version, prune_versions,
+)
+
+import numpy as np
+from langchain_community.vectorstores import Chroma
+
+ADD_BATCH = 5000  # below Chroma's max batch size
+
+
+# ---------- Loading ----------
+def load_index(index_dir: str) -> dict:
+    store = Chroma(persist_directory=index_dir)
+    got = store._collection.get(include=["embeddings", "documents", "metadatas"])
+    return {
+        "ids": list(got["ids"]),
+        "texts": [t or "" for t in got["documents"]],
+        "metas": [m or {} for m in got["metadatas"]],
+        "vectors": np.asarray(got["embeddings"], dtype=np.float32),
+        "collection_meta": dict(store._collection.metadata or {}),
+        "sources": read_sources(index_dir),
+    }
+
+def source_of(meta: dict, sources: dict) -> str:
+    src = resolve_source(meta, sources)
+    return src.get("title") or src.get("source") or "Unknown"
+
+
+# ---------- Checks ----------
+def exact_duplicates(texts: list) -> list:
+    """Row indexes whose text already appeared earlier (first copy is kept)."""
+    seen, dups = set(), []
+    for i, t in enumerate(texts):
+        h = hashlib.sha1(" ".join(t.split()).encode("utf-8")).hexdigest()
+        if h in seen:
+            dups.append(i)
+        else:
+            seen.add(h)
+    return dups
+
+def near_duplicates(vectors: np.ndarray, threshold: float, skip: set, block: int = 1024) -> list:
+    """Row indexes within `threshold` cosine similarity of an earlier kept row."""
+    if len(vectors) == 0:
+        return []
+    unit = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+    dropped = set(skip)
+    out = []
+    for start in range(0, len(unit), block):
+        sims = unit[start:start + block] @ unit.T
+        for r in range(sims.shape[0]):
+            i = start + r
+            if i in dropped:
+                continue
+            # only earlier rows that survive count as the "original"
+            earlier = np.nonzero(sims[r, :i] >= threshold)[0]
+            if any(j not in dropped for j in earlier):
+                dropped.add(i)
+                out.append(i)
+    return out
+
+def orphaned_rows(metas: list, sources: dict, csv_path: str) -> list:
+    """Rows whose CSV source (matched by url_or_path) is no longer listed."""
+    try:
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            listed = {(r.get("url_or_path") or "").strip() for r in csv.DictReader(f)}
+    except FileNotFoundError:
+        print(f"[warn] CSV not found: {csv_path}; skipping orphan check")
+        return []
+    srcs = [resolve_source(m, sources) for m in metas]
+    return [i for i, m in enumerate(srcs) if "url_or_path" in m and m["url_or_path"].strip() not in listed]
+
+# What process_sources.py keeps on each chunk; the rest belongs in sources.json
+CHUNK_KEYS = ("id", "page", "chunk", "dup_sources", "dup_count")
+
+def metadata_cost(metas: list, sources: dict, k: int, rounds: int = 200) -> dict:
+    """Per-chunk metadata size, compact vs. with the source attributes inline,
+    and the time to decode one query's worth (k rows) of each."""
+    compact = [{key: m[key] for key in CHUNK_KEYS if key in m} for m in metas]
+    inline = [{**resolve_source(m, sources), **m} for m in metas]
+    out = {}
+    for name, rows in (("compact", compact), ("inline", inline)):
+        blobs = [json.dumps(m, ensure_ascii=False) for m in rows]
+        sample = (blobs * (k // max(1, len(blobs)) + 1))[:k] if blobs else []
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for b in sample:
+                json.loads(b)
+        out[name] = {
+            "keys_per_chunk": round(sum(map(len, rows)) / max(1, len(rows)), 1),
+            "bytes_per_chunk": round(sum(map(len, blobs)) / max(1, len(blobs)), 1),
+            "decode_us_per_query": round((time.perf_counter() - t0) / rounds * 1e6, 1),
+        }
+    out["table_bytes"] = len(json.dumps(sources, ensure_ascii=False))
+    out["table_sources"] = len(sources)
+    return out
+
+_COMPONENTS = {
+    "chroma.sqlite3": "sqlite (metadata, documents, WAL)",
+    "data_level0.bin": "hnsw vectors + level-0 graph",
+    "link_lists.bin": "hnsw upper-level graph",
+    "index_metadata.pickle": "hnsw id map",
+}
+
+def disk_usage(index_dir: str) -> dict:
+    sizes = Counter()
+    for dirpath, _, files in os.walk(index_dir):
+        if os.path.join(index_dir, "versions") in dirpath:
+            continue  # a legacy root holding newer versions: count only its own files
+        for name in files:
+            sizes[_COMPONENTS.get(name, "other")] += os.path.getsize(os.path.join(dirpath, name))
+    return dict(sizes)
+
+def model_checks(index: dict, manifest: dict, probe: bool) -> list:
+    problems = []
+    built_with = manifest.get("embedding_model")
+    if built_with and built_with != CFG["embedding_model"]:
+        problems.append(f"index built with {built_with}, config uses {CFG['embedding_model']}")
+    if probe and len(index["vectors"]):
+        from langchain_huggingface import HuggingFaceEmbeddings
+        dims = len(HuggingFaceEmbeddings(model_name=CFG["embedding_model"]).embed_query("probe"))
+        if dims != index["vectors"].shape[1]:
+            problems.append(f"index vectors have {index['vectors'].shape[1]} dims, "
+                            f"{CFG['embedding_model']} produces {dims}")
+    return problems
+
+
+# ---------- Commands ----------
+def analyze(index_dir: str, args) -> dict:
+    index = load_index(index_dir)
+    dups = exact_duplicates(index["texts"])
+    near = near_duplicates(index["vectors"], args.threshold, set(dups)) if args.near else []
+    orphans = orphaned_rows(index["metas"], index["sources"], args.csv)
+    return {"index": index, "exact": dups, "near": near, "orphans": orphans}
+
+def report(args):
+    version, index_dir = current_index(CFG["persist_directory"])
+    found = analyze(index_dir, args)
+    index = found["index"]
+    manifest = read_manifest(index_dir)
+
+    per_source = defaultdict(lambda: [0, 0])
+    for i in found["exact"]:
+        per_source[source_of(index["metas"][i], index["sources"])][1] += 1
+    for m in index["metas"]:
+        per_source[source_of(m, index["sources"])][0] += 1
+
+    print(f"Index: {index_dir} (version {version or 'legacy'}) — {len(index['ids'])} chunks")
+    print(f"\n{'source':55} {'chunks':>7} {'dups':>5}")
+    for src, (n, d) in sorted(per_source.items(), key=lambda kv: -kv[1][0]):
+        print(f"{src[:55]:55} {n:7d} {d:5d}")
+
+    print(f"\nExact duplicates:  {len(found['exact'])}")
+    if args.near:
+        print(f"Near duplicates:   {len(found['near'])} (cosine ≥ {args.threshold})")
+    print(f"Orphaned rows:     {len(found['orphans'])} (source no longer in {args.csv})")
+
+    print("\nOn disk:")
+    sizes = disk_usage(index_dir)
+    for comp, b in sorted(sizes.items(), key=lambda kv: -kv[1]):
+        print(f"  {comp:35} {b / 1e6:8.2f} MB")
+    print(f"  {'total':35} {sum(sizes.values()) / 1e6:8.2f} MB")
+
+    k = int(CFG["retrieval_k"])
+    cost = metadata_cost(index["metas"], index["sources"], k)
+    layout = "source table" if index["sources"] else "attributes inline (legacy; rebuild with process_sources.py)"
+    print(f"\nChunk metadata ({layout}; {cost['table_sources']} sources, {cost['table_bytes'] / 1e3:.1f} KB table):")
+    for name in ("compact", "inline"):
+        c = cost[name]
+        print(f"  {name:8} {c['keys_per_chunk']:5.1f} keys {c['bytes_per_chunk']:7.0f} B/chunk "
+              f"{c['bytes_per_chunk'] * len(index['ids']) / 1e6:7.2f} MB total  "
+              f"decode {c['decode_us_per_query']:6.1f} µs per query (k={k})")
+
+    problems = model_checks(index, manifest, probe=not args.skip_model)
+    print("\nEmbedding model: " + ("; ".join(problems) if problems else f"ok ({CFG['embedding_model']})"))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "index_dir": index_dir, "version": version, "chunks": len(index["ids"]),
+                "per_source": {s: {"chunks": n, "duplicates": d} for s, (n, d) in per_source.items()},
+                "exact_duplicates": len(found["exact"]), "near_duplicates": len(found["near"]),
+                "orphans": len(found["orphans"]), "disk_bytes": sizes, "metadata": cost,
+                "model_problems": problems,
+            }, f, indent=2)
+
+def compact(args):
+    root = CFG["persist_directory"]
+    version, index_dir = current_index(root)
+    found = analyze(index_dir, args)
+    index = found["index"]
+    drop = set(found["exact"]) | set(found["near"])
+    if args.drop_orphans:
+        drop |= set(found["orphans"])
+    keep = [i for i in range(len(index["ids"])) if i not in drop]
+    print(f"{len(index['ids'])} chunks → {len(keep)} "
+          f"(exact {len(found['exact'])}, near {len(found['near'])}, "
+          f"orphans {len(found['orphans']) if args.drop_orphans else 0})")
+    if args.dry_run:
+        return
+
+    # Re-adding the stored embeddings (no re-embedding) into a new collection
+    # builds a fresh HNSW graph without the tombstones deletes leave behind.
+    new_version, out_dir = new_version_dir(root)
+    t0 = time.time()
+    store = Chroma(persist_directory=out_dir, collection_metadata=hnsw_metadata(CFG))
+    for start in range(0, len(keep), ADD_BATCH):
+        rows = keep[start:start + ADD_BATCH]
+        store._collection.add(
+            ids=[index["ids"][i] for i in rows],
+            embeddings=index["vectors"][rows].tolist(),
+            documents=[index["texts"][i] for i in rows],
+            metadatas=[index["metas"][i] for i in rows],
+        )
+    if index["sources"]:
+        write_sources(out_dir, index["sources"])
+    write_manifest(out_dir, {
+        **read_manifest(index_dir),
+        "version": new_version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "build_s": round(time.time() - t0, 1),
+        "chunks": len(keep),
+        "hnsw": hnsw_metadata(CFG),
+        "compacted_from": version or index_dir,
+        "removed": {"exact": len(found["exact"]), "near": len(found["near"]),
+                    "orphans": len(found["orphans"]) if args.drop_orphans else 0},
+    })
+    before = sum(disk_usage(index_dir).values())
+    after = sum(disk_usage(out_dir).values())
+    print(f"Wrote version {new_version}: {before / 1e6:.2f} MB → {after / 1e6:.2f} MB")
+    if args.no_publish:
+        print(f"Not published; run `echo {new_version} > {os.path.join(root, 'CURRENT')}` to switch.")
+        return
+    publish_version(root, new_version)
+    prune_versions(root, keep=int(CFG["index_keep_versions"]))
+    print(f"✅ Published {new_version}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect and compact the Chroma index.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("report", "compact"):
+        p = sub.add_parser(name)
+        p.add_argument("--csv", default=CFG.get("sources_csv", "data/sources 2.csv"))
+        p.add_argument("--near", action="store_true", help="also find near-duplicates by embedding similarity")
+        p.add_argument("--threshold", type=float, default=0.97, help="cosine similarity for --near")
+    rep, comp = sub.choices["report"], sub.choices["compact"]
+    rep.add_argument("--skip-model", action="store_true", help="don't load the embedding model for the dims check")
+    rep.add_argument("--json", default=None, help="also write the report to this file")
+    comp.add_argument("--drop-orphans", action="store_true")
+    comp.add_argument("--dry-run", action="store_true")
+    comp.add_argument("--no-publish", action="store_true", help="build the new version but leave CURRENT alone")
+    args = ap.parse_args()
+    if args.cmd == "report":
+        report(args)
+    else:
+        compact(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
 # data/process_sources.py
 # Ingests pdf / web / youtube (with local transcript support) and builds Chroma.
-import os, csv, yaml
+import sys, csv, json, yaml, time, hashlib
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root
+from index_store import (
+    hnsw_metadata, new_version_dir, write_manifest, write_sources, publish_version, prune_versions,
+)
+from dedup import dedup_chunks
+
 # ---- LangChain loaders ----
 try:
     from langchain_community.document_loaders import (
@@ -59,18 +65,24 @@ def load_youtube(url: str, fallback_txt_dir: str = "data/raw"):
     return []
 
 # ---------- CSV Loader ----------
-def load_from_csv(csv_path: str) -> list:
-    """Load and normalize all sources (pdf, web, youtube, txt)."""
+def load_from_csv(csv_path: str) -> tuple:
+    """Load all sources (pdf, web, youtube, txt); returns (docs, source table).
+
+    Documents carry only their source id (and page, if the loader has one);
+    the CSV row for each id goes into the table once instead of onto every
+    chunk.
+    """
     csv_path = Path(csv_path)
     if not csv_path.exists():
         raise SystemExit(f"[Fatal] CSV not found: {csv_path}")
 
-    docs = []
+    docs, sources = [], {}
     with open(csv_path, newline="", encoding="utf-8") as f:
         for row in csv.DictReader(f):
             t = (row["type"] or "").strip().lower()
             src = (row["url_or_path"] or "").strip()
             meta = {k: row[k] for k in row}
+            sid = (row.get("id") or "").strip() or f"{meta.get('title', '?')}@{src}"
 
             try:
                 if t == "pdf":
@@ -101,24 +113,28 @@ def load_from_csv(csv_path: str) -> list:
                     continue
 
                 for d in new:
-                    d.metadata.update(meta)
-                    d.metadata.setdefault(
-                        "id",
-                        f"{meta.get('title','?')}@{d.metadata.get('page', d.metadata.get('source','?'))}"
-                    )
+                    compact = {"id": sid}
+                    if d.metadata.get("page") is not None:
+                        compact["page"] = d.metadata["page"]
+                    d.metadata = compact
+                if new:
+                    sources[sid] = {**meta, "id": sid}
                 docs.extend(new)
 
             except Exception as e:
                 print(f"[Load error] {t} {src}: {e}")
 
-    return docs
+    return docs, sources
+
+def _meta_bytes(metas: list) -> float:
+    return sum(len(json.dumps(m, ensure_ascii=False)) for m in metas) / max(1, len(metas))
 
 # ---------- Main Build ----------
 def main():
     print("Loading sources...")
     csv_path = "data/sources 2.csv"
-    docs = load_from_csv(csv_path)
-    print(f"Loaded {len(docs)} documents.")
+    docs, sources = load_from_csv(csv_path)
+    print(f"Loaded {len(docs)} documents from {len(sources)} sources.")
 
     print("Splitting...")
     splitter = RecursiveCharacterTextSplitter(
@@ -126,16 +142,62 @@ def main():
         chunk_overlap=CFG["chunk_overlap"]
     )
     splits = splitter.split_documents(docs)
+    ordinal = {}
+    for d in splits:  # position of the chunk within its source
+        d.metadata["chunk"] = ordinal[d.metadata["id"]] = ordinal.get(d.metadata["id"], -1) + 1
     print(f"Created {len(splits)} chunks.")
 
-    print("Embedding & writing Chroma...")
+    dropped = 0
+    if CFG.get("dedup", True):
+        print("Removing near-duplicate chunks...")
+        splits, dropped = dedup_chunks(splits, threshold=float(CFG.get("dedup_threshold", 0.8)), sources=sources)
+        print(f"Dropped {dropped} near-duplicates; {len(splits)} chunks left.")
+
+    # Build into a fresh version directory; running apps keep serving the
+    # current one until CURRENT is flipped below.
+    root = CFG["persist_directory"]
+    version, out_dir = new_version_dir(root)
+    print(f"Embedding & writing Chroma version {version}...")
+    t0 = time.time()
     embeddings = HuggingFaceEmbeddings(model_name=CFG["embedding_model"])
     Chroma.from_documents(
         documents=splits,
         embedding=embeddings,
-        persist_directory=CFG["persist_directory"]
+        persist_directory=out_dir,
+        collection_metadata=hnsw_metadata(CFG),
     )
-    print(f"✅ Done. Chroma DB built at {CFG['persist_directory']}")
+    write_sources(out_dir, sources)
+    with open(csv_path, "rb") as f:
+        csv_sha = hashlib.sha256(f.read()).hexdigest()
+    # what the chunks carry now vs. the CSV row copied onto each of them
+    metas = [d.metadata for d in splits]
+    inline = [{**sources[m["id"]], **m} for m in metas]
+    write_manifest(out_dir, {
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "build_s": round(time.time() - t0, 1),
+        "sources_csv": csv_path,
+        "sources_sha256": csv_sha,
+        "documents": len(docs),
+        "chunks": len(splits),
+        "near_duplicates_dropped": dropped,
+        "sources": len(sources),
+        "chunk_metadata_bytes": round(_meta_bytes(metas), 1),
+        "inline_metadata_bytes": round(_meta_bytes(inline), 1),
+        "embedding_model": CFG["embedding_model"],
+        "chunk_size": CFG["chunk_size"],
+        "chunk_overlap": CFG["chunk_overlap"],
+        "hnsw": hnsw_metadata(CFG),
+    })
+
+    print(f"Chunk metadata: {_meta_bytes(metas):.0f} bytes/chunk "
+          f"(was ≥{_meta_bytes(inline):.0f} with the CSV row inline); {len(sources)} sources in sources.json")
+
+    publish_version(root, version)
+    removed = prune_versions(root, keep=int(CFG.get("index_keep_versions", 2)))
+    print(f"✅ Done. Published index version {version} ({out_dir})")
+    if removed:
+        print(f"Removed old versions: {', '.join(removed)}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,280 @@
+# index_store.py — Vector index settings shared by ingest and query time.
+# Kept free of model/LLM imports so data/process_sources.py and the bench
+# scripts can use it without loading the RAG pipeline.
+
+import json
+import math
+import os
+import shutil
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+# Chroma's own defaults, so an index built before these settings existed
+# keeps behaving the same.
+DEFAULT_HNSW = {
+    "space": "l2",            # l2 | cosine | ip — fixed once the collection exists
+    "M": 16,                  # graph degree: recall ↑, memory/build time ↑
+    "ef_construction": 100,   # build-time candidate list: recall ↑, build time ↑
+    "ef_search": 10,          # query-time candidate list: recall ↑, latency ↑ (also fixed at build)
+}
+
+
+def hnsw_settings(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """`hnsw:` block from config.yaml merged over the defaults."""
+    return {**DEFAULT_HNSW, **(cfg.get("hnsw") or {})}
+
+
+def hnsw_metadata(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """Chroma collection metadata for the configured HNSW parameters."""
+    h = hnsw_settings(cfg)
+    return {
+        "hnsw:space": h["space"],
+        "hnsw:M": int(h["M"]),
+        "hnsw:construction_ef": int(h["ef_construction"]),
+        "hnsw:search_ef": int(h["ef_search"]),
+    }
+
+
+def hnsw_drift(collection: Any, cfg: Dict[str, Any]) -> Dict[str, Tuple[Any, Any]]:
+    """{key: (built, configured)} for HNSW settings the index was built without.
+
+    All four, ef_search included, are copied into the HNSW segment when the
+    collection is created, so a changed value only takes effect after a
+    rebuild (data/process_sources.py, or data/index_tool.py compact, which
+    re-adds the stored embeddings without re-embedding).
+    """
+    built = dict(getattr(collection, "metadata", None) or {})
+    return {k: (built.get(k), v) for k, v in hnsw_metadata(cfg).items()
+            if k in built and built[k] != v}
+
+
+# ----------------------------
+# Versioned index directories
+# ----------------------------
+# data/process_sources.py builds each index into its own directory,
+#   <persist_directory>/versions/<version>/   (Chroma files + manifest.json)
+# and then publishes it by atomically replacing <persist_directory>/CURRENT,
+# which holds the active version name. Readers never see a half-written
+# index. An old flat ./chroma_db with no CURRENT file is still used as is.
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+
+def new_version_dir(root: str) -> Tuple[str, str]:
+    """(version, path) of a fresh, empty version directory under root."""
+    version = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(root, "versions", version)
+    n = 1
+    while os.path.exists(path):
+        n += 1
+        path = os.path.join(root, "versions", f"{version}-{n}")
+    os.makedirs(path)
+    return os.path.basename(path), path
+
+
+def write_manifest(path: str, manifest: Dict[str, Any]) -> None:
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# Per-source attributes (title, url, topic, ...) live once per version in
+# sources.json, keyed by the CSV id; chunks only carry that id plus their
+# page and ordinal. Indexes built before the table existed keep the
+# attributes on every chunk, which resolve_source() falls back to.
+SOURCES_FILE = "sources.json"
+
+
+def write_sources(path: str, sources: Dict[str, Dict[str, Any]]) -> None:
+    with open(os.path.join(path, SOURCES_FILE), "w", encoding="utf-8") as f:
+        json.dump(sources, f, ensure_ascii=False, indent=1)
+
+
+def read_sources(path: str) -> Dict[str, Dict[str, Any]]:
+    """The version's source table ({} for an index without one)."""
+    try:
+        with open(os.path.join(path, SOURCES_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def resolve_source(meta: Dict[str, Any], sources: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Source attributes for a chunk's metadata (the chunk's own for legacy indexes)."""
+    return sources.get(str(meta.get("id"))) or meta
+
+
+def publish_version(root: str, version: str) -> None:
+    """Point CURRENT at version (write a temp file, then rename it over CURRENT)."""
+    if not os.path.isdir(os.path.join(root, "versions", version)):
+        raise FileNotFoundError(f"no such index version: {version}")
+    tmp = os.path.join(root, f".{CURRENT_FILE}.{os.getpid()}")
+    with open(tmp, "w") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, CURRENT_FILE))
+
+
+def current_index(root: str) -> Tuple[Optional[str], str]:
+    """(version, directory) of the published index; (None, root) for a legacy flat index."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            version = f.read().strip()
+    except OSError:
+        return None, root
+    return version, os.path.join(root, "versions", version)
+
+
+def list_versions(root: str) -> List[str]:
+    vdir = os.path.join(root, "versions")
+    return sorted(os.listdir(vdir)) if os.path.isdir(vdir) else []
+
+
+def prune_versions(root: str, keep: int = 2) -> List[str]:
+    """Delete old versions, keeping the published one plus the newest `keep` others.
+
+    The kept ones let a process that hasn't swapped yet finish its requests.
+    """
+    current, _ = current_index(root)
+    others = [v for v in list_versions(root) if v != current]
+    old = others[:len(others) - keep] if keep > 0 else others
+    for v in old:
+        shutil.rmtree(os.path.join(root, "versions", v), ignore_errors=True)
+    return old
+
+
+# ----------------------------
+# Read-only memory-mapped snapshot
+# ----------------------------
+# Used by serve_prefork.py: the parent exports the Chroma collection once to
+# flat files, maps them read-only and forks workers, so every worker shares
+# the same physical pages for vectors and chunk text instead of loading its
+# own copy of the index.
+SNAPSHOT_FILES = ("vectors.npy", "rows.bin", "offsets.npy", "snapshot.json")
+
+
+def export_snapshot(collection: Any, out_dir: str, space: str = "l2",
+                    index_version: Optional[str] = None) -> Dict[str, Any]:
+    """Write a Chroma collection's vectors, texts and metadata to out_dir."""
+    import numpy as np
+
+    os.makedirs(out_dir, exist_ok=True)
+    got = collection.get(include=["embeddings", "documents", "metadatas"])
+    vectors = np.asarray(got["embeddings"], dtype=np.float32)
+    offsets = [0]
+    with open(os.path.join(out_dir, "rows.bin"), "wb") as f:
+        for text, meta in zip(got["documents"], got["metadatas"]):
+            blob = json.dumps({"t": text or "", "m": meta or {}}, ensure_ascii=False).encode("utf-8")
+            f.write(blob)
+            offsets.append(offsets[-1] + len(blob))
+    np.save(os.path.join(out_dir, "vectors.npy"), vectors)
+    np.save(os.path.join(out_dir, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+    info = {"count": int(len(vectors)), "dims": int(vectors.shape[1]) if len(vectors) else 0,
+            "space": space, "index_version": index_version}
+    with open(os.path.join(out_dir, "snapshot.json"), "w") as f:
+        json.dump(info, f)
+    return info
+
+
+class _SnapshotRetriever:
+    def __init__(self, store: "MmapStore", k: int):
+        self.store = store
+        self.k = k
+
+    def get_relevant_documents(self, query: str) -> List[Any]:
+        return self.store.similarity_search(query, k=self.k)
+
+    invoke = get_relevant_documents
+
+
+class _SnapshotCollection:
+    """Just enough of a Chroma collection for healthcheck()."""
+
+    def __init__(self, store: "MmapStore"):
+        self.store = store
+        self.metadata = {"snapshot": store.path, "hnsw:space": store.space}
+
+    def count(self) -> int:
+        return len(self.store.vectors)
+
+
+class MmapStore:
+    """Exact-search, read-only vector store over an export_snapshot() directory.
+
+    Implements the subset of the LangChain Chroma API the pipeline uses
+    (similarity_search*, as_retriever). Vectors and rows are np.memmap views,
+    so forked workers share them; a hit only decodes its own row.
+    """
+
+    def __init__(self, path: str, embedding_function: Any):
+        import numpy as np
+
+        self.path = path
+        self.embedding_function = embedding_function
+        with open(os.path.join(path, "snapshot.json")) as f:
+            info = json.load(f)
+        self.space = info.get("space", "l2")
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.rows = np.memmap(os.path.join(path, "rows.bin"), dtype=np.uint8, mode="r") if info["count"] else None
+        self._norms = np.linalg.norm(self.vectors, axis=1) if self.space == "cosine" else None
+        self._collection = _SnapshotCollection(self)
+
+    def _row(self, i: int):
+        from langchain_core.documents import Document
+
+        blob = bytes(self.rows[int(self.offsets[i]):int(self.offsets[i + 1])])
+        row = json.loads(blob.decode("utf-8"))
+        return Document(page_content=row["t"], metadata=row["m"])
+
+    def _search(self, vector: List[float], k: int):
+        import numpy as np
+
+        if self.rows is None:
+            return [], []
+        q = np.asarray(vector, dtype=np.float32)
+        if self.space == "cosine":
+            dist = 1.0 - (self.vectors @ q) / (self._norms * (np.linalg.norm(q) or 1.0) + 1e-12)
+        elif self.space == "ip":
+            dist = -(self.vectors @ q)
+        else:
+            dist = ((self.vectors - q) ** 2).sum(axis=1)
+        k = min(int(k), len(dist))
+        idx = np.argpartition(dist, k - 1)[:k]
+        idx = idx[np.argsort(dist[idx])]
+        return idx, dist[idx]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **_: Any) -> List[Any]:
+        idx, _ = self._search(embedding, k)
+        return [self._row(i) for i in idx]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **_: Any):
+        idx, dist = self._search(self.embedding_function.embed_query(query), k)
+        return [(self._row(i), float(d)) for i, d in zip(idx, dist)]
+
+    def similarity_search(self, query: str, k: int = 4, **_: Any) -> List[Any]:
+        return [d for d, _ in self.similarity_search_with_score(query, k)]
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4, **_: Any):
+        """Higher is better, using the same formulas as LangChain's Chroma wrapper."""
+        out = []
+        for d, dist in self.similarity_search_with_score(query, k):
+            if self.space == "cosine":
+                score = 1.0 - dist
+            elif self.space == "ip":
+                score = -dist
+            else:
+                score = 1.0 - dist / math.sqrt(2)  # dist is squared L2, as Chroma returns
+            out.append((d, score))
+        return out
+
+    def as_retriever(self, search_kwargs: Optional[Dict[str, Any]] = None) -> _SnapshotRetriever:
+        return _SnapshotRetriever(self, int((search_kwargs or {}).get("k", 4)))
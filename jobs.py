@@ -0,0 +1,169 @@
+# jobs.py — Process-wide background job runner for the Streamlit app.
+# app.py submits qa_chain / agent_run calls here instead of running them in
+# the script thread, keeps only the job id in st.session_state, and polls
+# for stage progress. Jobs outlive script reruns, any session can cancel its
+# own job, and the shared thread pool keeps one user's long multi-agent run
+# from blocking other sessions.
+
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class JobCancelled(Exception):
+    """Raised inside a job at the next stage boundary after cancel()."""
+
+
+class Job:
+    """State of one submitted request, safe to read from any thread."""
+
+    def __init__(self, kind: str, question: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.question = question
+        self.status = "queued"          # queued | running | done | error | cancelled
+        self.stages: List[Tuple[str, float]] = []
+        self.events: List[Dict[str, Any]] = []   # structured pipeline events (see on_event)
+        self.partial: Dict[str, str] = {}        # streamed text so far, by event name
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.exception: Optional[BaseException] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    # Passed to the pipeline as its `on_stage` callback.
+    def progress(self, stage: str) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled(stage)
+        self.stages.append((stage, time.time()))
+
+    # Passed as `check` to job bodies that wait outside the pipeline (a
+    # singleflight follower waiting on another job's run).
+    def check(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled("waiting")
+
+    # Passed as `on_event` to pipelines that stream (agents.agent_answer):
+    # token events are accumulated into `partial`, others kept in order.
+    def on_event(self, event: Dict[str, Any]) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled(event.get("event", "event"))
+        if "token" in event:
+            name = event["event"]
+            self.partial[name] = self.partial.get(name, "") + event["token"]
+        else:
+            self.events.append(event)
+
+    @property
+    def future(self):
+        """The concurrent.futures.Future running this job (None until submitted)."""
+        return self._future
+
+    @property
+    def stage(self) -> Optional[str]:
+        return self.stages[-1][0] if self.stages else None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "error", "cancelled")
+
+    @property
+    def elapsed(self) -> float:
+        start = self.started or self.created
+        return (self.finished or time.time()) - start
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self.status = "cancelled"
+            self.finished = time.time()
+
+
+class JobRunner:
+    """Thread pool + job registry shared by every session in the process."""
+
+    def __init__(self, max_workers: int = 4, keep_seconds: float = 3600.0):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="brew-job")
+        self.keep_seconds = keep_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, question: str, fn: Callable[..., Any], *args: Any,
+               with_events: bool = False, with_check: bool = False, **kwargs: Any) -> str:
+        """Run fn(*args, on_stage=job.progress, **kwargs) in the pool; returns the job id.
+
+        With ``with_events`` fn also gets ``on_event=job.on_event``, with
+        ``with_check`` ``check=job.check``.
+        """
+        job = Job(kind, question)
+        if with_events:
+            kwargs["on_event"] = job.on_event
+        if with_check:
+            kwargs["check"] = job.check
+
+        def _run():
+            job.status = "running"
+            job.started = time.time()
+            try:
+                job.progress("started")
+                job.result = fn(*args, on_stage=job.progress, **kwargs)
+                job.status = "done"
+            except JobCancelled:
+                job.status = "cancelled"
+            except Exception as e:
+                job.error = str(e)
+                job.exception = e
+                job.status = "error"
+            finally:
+                job.finished = time.time()
+
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job._future = self.executor.submit(_run)
+        return job.id
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id) if job_id else None
+
+    def cancel(self, job_id: str) -> None:
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.keep_seconds
+        for jid in [j.id for j in self._jobs.values() if j.done and (j.finished or 0) < cutoff]:
+            del self._jobs[jid]
+
+    def pending(self) -> int:
+        """Jobs currently running or waiting for a worker."""
+        with self._lock:
+            return sum(not j.done for j in self._jobs.values())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            "jobs_running": sum(j.status == "running" for j in jobs),
+            "jobs_queued": sum(j.status == "queued" for j in jobs),
+        }
+
+
+_RUNNER: Optional[JobRunner] = None
+_RUNNER_LOCK = threading.Lock()
+
+
+def get_runner(max_workers: int = 4) -> JobRunner:
+    """The process-wide runner (created on first use)."""
+    global _RUNNER
+    with _RUNNER_LOCK:
+        if _RUNNER is None:
+            _RUNNER = JobRunner(max_workers=max_workers)
+        return _RUNNER
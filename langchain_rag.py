@@ -1,6 +1,12 @@
 import os
-import yaml
-from typing import Dict, Any, List
+import re
+import json
+import time
+import hashlib
+import threading
+import contextlib
+import contextvars
+from typing import Dict, Any, List, Optional, Callable
 
 # Silence HF tokenizers fork warnings
 os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
@@ -15,30 +21,35 @@ from langchain_community.vectorstores import Chroma
 from langchain_openai import ChatOpenAI
 
 #  Prompt router (your file)
-from prompts import route_prompt
+from prompts import route_prompt, classify_intent, get_intent_policy, generate_related_queries
+
+#  Nested timing spans (OTLP-shaped JSONL export)
+import tracing
+
+#  Structured per-request query log (buffered, off the request path)
+import querylog
+
+#  Prompt-level response cache (SQLite)
+from llm_cache import LLMCache, prompt_key
+
+#  Process-wide LLM admission control (rate limits, adaptive concurrency)
+from llm_gateway import LLMGateway
+
+#  Local cross-encoder reranking of over-fetched candidates
+from reranker import build_reranker
+
+#  HNSW settings shared with data/process_sources.py
+from index_store import hnsw_metadata, hnsw_drift, current_index, read_sources, resolve_source
 
 
 # ----------------------------
 # 1) Defaults & config loader
 # ----------------------------
-DEFAULT_CFG = {
-    "llm_model": "gpt-4o-mini",                           # fast & economical
-    "embedding_model": "sentence-transformers/all-MiniLM-L6-v2",
-    "persist_directory": "./chroma_db",
-    "retrieval_k": 3,
-    "chunk_size": 1000,                                   # used at ingest time
-    "chunk_overlap": 200,                                 # used at ingest time
-}
-
-def load_cfg(path: str = "config.yaml") -> Dict[str, Any]:
-    try:
-        with open(path, "r") as f:
-            data = yaml.safe_load(f) or {}
-    except FileNotFoundError:
-        data = {}
-    return {**DEFAULT_CFG, **data}
+# Lives in settings.py so lightweight callers (app.py in API-client mode,
+# server.py) can read config.yaml without loading models.
+from settings import DEFAULT_CFG, load_cfg, CFG
 
-CFG = load_cfg()
+tracing.configure(CFG["tracing"], CFG["trace_path"])
 
 
 # ----------------------------
@@ -47,37 +58,288 @@ CFG = load_cfg()
 # Embeddings must match what you used at ingest time
 EMB = HuggingFaceEmbeddings(model_name=CFG["embedding_model"])
 
-# Load the persisted DB (built by data/process_sources.py)
-VSTORE = Chroma(
-    embedding_function=EMB,
-    persist_directory=CFG["persist_directory"],
-)
+def _open_store(path: str):
+    store = Chroma(
+        embedding_function=EMB,
+        persist_directory=path,
+        collection_metadata=hnsw_metadata(CFG),
+    )
+    drift = hnsw_drift(store._collection, CFG)  # type: ignore[attr-defined]
+    if drift:
+        print(f"[hnsw] index at {path} was built with different settings "
+              f"({', '.join(f'{k}={b} (config {c})' for k, (b, c) in drift.items())}); "
+              "rebuild or run `python data/index_tool.py compact` to apply them")
+    return store
+
+# Load the published index version (built by data/process_sources.py)
+INDEX_VERSION, INDEX_PATH = current_index(CFG["persist_directory"])
+VSTORE = _open_store(INDEX_PATH)
+# Title / url / topic per source id, shared by all chunks of that source
+SOURCES = read_sources(INDEX_PATH)
 
 # Create a retriever
 RETR = VSTORE.as_retriever(search_kwargs={"k": CFG["retrieval_k"]})
 
-# OpenAI chat model
-LLM = ChatOpenAI(
-    model=CFG["llm_model"],
-    temperature=0.2,
-    timeout=60,
-    max_retries=2,
+
+# ----------------------------
+# 2a) Index hot-swap
+# ----------------------------
+# process_sources.py publishes a new version by flipping CURRENT. Each request
+# pins the (VSTORE, RETR, SOURCES) it started with, so requests in flight finish
+# on the old version while new ones pick up the new one; no restart, no cold
+# model load.
+_INDEX_LOCK = threading.Lock()
+_INDEX_CHECKED = 0.0
+_PINNED: "contextvars.ContextVar[Optional[tuple]]" = contextvars.ContextVar("rag_pinned_index", default=None)
+
+def maybe_reload_index(force: bool = False) -> bool:
+    """Swap VSTORE/RETR/SOURCES if a newer index version was published; True if swapped."""
+    global VSTORE, RETR, SOURCES, INDEX_VERSION, INDEX_PATH, _INDEX_CHECKED
+    if not CFG["index_hot_swap"] and not force:
+        return False
+    now = time.monotonic()
+    if not force and now - _INDEX_CHECKED < float(CFG["index_check_interval_s"]):
+        return False
+    with _INDEX_LOCK:
+        _INDEX_CHECKED = now
+        version, path = current_index(CFG["persist_directory"])
+        if version == INDEX_VERSION:
+            return False
+        try:
+            store = _open_store(path)  # outside the swap: readers keep using the old one meanwhile
+        except Exception as e:
+            print(f"[index] could not open version {version}: {e}")
+            return False
+        retr = store.as_retriever(search_kwargs={"k": CFG["retrieval_k"]})
+        sources = read_sources(path)
+        VSTORE, RETR, SOURCES, INDEX_VERSION, INDEX_PATH = store, retr, sources, version, path
+    print(f"[index] now serving version {version}")
+    return True
+
+@contextlib.contextmanager
+def pinned_index():
+    """Use one index version for everything inside the block (nests)."""
+    if _PINNED.get() is not None:
+        yield
+        return
+    maybe_reload_index()
+    token = _PINNED.set((VSTORE, RETR, SOURCES))
+    try:
+        yield
+    finally:
+        _PINNED.reset(token)
+
+
+# ----------------------------
+# 2b) LLM backends
+# ----------------------------
+# `llm_backend: openai` calls the API; `record` calls it and appends every
+# response to `llm_recordings`; `replay` serves those recordings offline with
+# synthetic latency (time-to-first-token + tokens/sec) so the whole pipeline
+# can be benchmarked without network access.
+class ReplayMessage:
+    """Minimal AIMessage stand-in returned by the replay backend."""
+
+    def __init__(self, content: str, usage: Dict[str, int]):
+        self.content = content
+        self.usage_metadata = usage
+        self.response_metadata: Dict[str, Any] = {}
+
+
+def _replay_key(prompt: str, kwargs: Dict[str, Any]) -> str:
+    return prompt_key(CFG["llm_model"], CFG["llm_temperature"], prompt, kwargs.get("max_tokens"))
+
+
+class RecordingLLM:
+    """Wraps a real chat model and appends each response to a JSONL file."""
+
+    def __init__(self, llm: Any, path: str):
+        self.llm = llm
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def invoke(self, prompt: str, **kwargs: Any):
+        resp = self.llm.invoke(prompt, **kwargs)
+        rec = {
+            "key": _replay_key(prompt, kwargs),
+            "text": getattr(resp, "content", str(resp)) or "",
+            "usage": _usage(resp),
+            "prompt_head": prompt[:120],
+        }
+        self._write(rec)
+        return resp
+
+    def stream(self, prompt: str, **kwargs: Any):
+        parts, usage = [], {"input_tokens": 0, "output_tokens": 0}
+        for chunk in self.llm.stream(prompt, **kwargs):
+            parts.append(getattr(chunk, "content", "") or "")
+            for name, n in _usage(chunk).items():
+                usage[name] += n
+            yield chunk
+        self._write({"key": _replay_key(prompt, kwargs), "text": "".join(parts), "usage": usage,
+                     "prompt_head": prompt[:120]})
+
+    def _write(self, rec: Dict[str, Any]) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+class ReplayRateLimited(Exception):
+    """Simulated provider 429 from the replay backend (see `replay_rpm_limit`)."""
+
+    status_code = 429
+
+
+class ReplayLLM:
+    """Serves recorded responses with configurable synthetic latency."""
+
+    def __init__(self, path: str, latency_ms: float = 300, tokens_per_sec: float = 60, on_miss: str = "stub",
+                 rpm_limit: int = 0):
+        self.path = path
+        self.latency_s = float(latency_ms) / 1000.0
+        self.tokens_per_sec = float(tokens_per_sec)
+        self.on_miss = on_miss
+        self.rpm_limit = int(rpm_limit or 0)
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.misses = 0
+        self._calls: List[float] = []
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        rec = json.loads(line)
+                        self.records[rec["key"]] = rec
+
+    def _stub(self, prompt: str, max_tokens: Optional[int]) -> Dict[str, Any]:
+        """Deterministic placeholder answer sized like a real completion."""
+        n_words = min(int(max_tokens or 160), 160)
+        seed = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        words = [f"brew{seed[i % 40]}" for i in range(n_words)]
+        text = "Replayed stub answer [1]. " + " ".join(words) + " [2]."
+        return {"text": text, "usage": {"input_tokens": len(prompt) // 4, "output_tokens": n_words}}
+
+    def _lookup(self, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        rec = self.records.get(_replay_key(prompt, kwargs))
+        if rec is None:
+            self.misses += 1
+            if self.on_miss == "error":
+                raise KeyError(f"No recorded LLM response for prompt: {prompt[:80]!r}")
+            rec = self._stub(prompt, kwargs.get("max_tokens"))
+        return rec
+
+    def _admit(self) -> None:
+        # Sliding one-minute window, like a provider's requests/min limit
+        now = time.monotonic()
+        with self._lock:
+            self._calls = [t for t in self._calls if now - t < 60.0]
+            if len(self._calls) >= self.rpm_limit:
+                raise ReplayRateLimited(f"replay backend over {self.rpm_limit} requests/min")
+            self._calls.append(now)
+
+    def invoke(self, prompt: str, **kwargs: Any) -> ReplayMessage:
+        if self.rpm_limit:
+            self._admit()
+        rec = self._lookup(prompt, kwargs)
+        out_tokens = rec["usage"].get("output_tokens", 0)
+        delay = self.latency_s + (out_tokens / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        return ReplayMessage(rec["text"], dict(rec["usage"]))
+
+    def stream(self, prompt: str, **kwargs: Any):
+        """Word-sized chunks at `tokens_per_sec`; usage arrives on the last one."""
+        if self.rpm_limit:
+            self._admit()
+        rec = self._lookup(prompt, kwargs)
+        if self.latency_s > 0:
+            time.sleep(self.latency_s)
+        words = re.findall(r"\S+\s*", rec["text"])
+        out_tokens = rec["usage"].get("output_tokens", 0)
+        per_word = (out_tokens / self.tokens_per_sec / len(words)) if (words and self.tokens_per_sec > 0) else 0.0
+        for w in words[:-1]:
+            if per_word > 0:
+                time.sleep(per_word)
+            yield ReplayMessage(w, {})
+        if per_word > 0 and words:
+            time.sleep(per_word)
+        yield ReplayMessage(words[-1] if words else "", dict(rec["usage"]))
+
+
+def build_llm(cfg: Dict[str, Any]):
+    """Construct the LLM backend named by `llm_backend`."""
+    backend = cfg["llm_backend"]
+    if backend == "replay":
+        return ReplayLLM(
+            cfg["llm_recordings"],
+            latency_ms=cfg["replay_latency_ms"],
+            tokens_per_sec=cfg["replay_tokens_per_sec"],
+            on_miss=cfg["replay_on_miss"],
+            rpm_limit=cfg["replay_rpm_limit"],
+        )
+    # OpenAI chat model (retries belong to the gateway when it is on, so a
+    # burst of 429s backs off together instead of every caller retrying)
+    chat = ChatOpenAI(
+        model=cfg["llm_model"],
+        temperature=cfg["llm_temperature"],
+        timeout=60,
+        max_retries=0 if cfg["llm_gateway"] else 2,
+        stream_usage=True,  # token counts on the last chunk of llm_complete(on_token=...)
+    )
+    if backend == "record":
+        return RecordingLLM(chat, cfg["llm_recordings"])
+    if backend != "openai":
+        raise ValueError(f"Unknown llm_backend '{backend}' (openai | record | replay)")
+    return chat
+
+LLM = build_llm(CFG)
+
+# Shared by every LLM call site (set LLM_CACHE_BYPASS=1 to disable per process).
+# Only the live backend is cached: recording must see every call and replay
+# should keep its synthetic latency.
+LLM_CACHE = LLMCache(
+    CFG["llm_cache_path"],
+    max_bytes=int(float(CFG["llm_cache_max_mb"]) * 1024 * 1024),
+    enabled=CFG["llm_cache"] and CFG["llm_backend"] == "openai",
+)
+
+# Every backend call in the process (qa_chain, researcher, synthesizer,
+# critic) queues here; agent_run lowers its priority below standard Q&A.
+GATEWAY = LLMGateway(
+    rpm=float(CFG["llm_rpm"] or 0),
+    tpm=float(CFG["llm_tpm"] or 0),
+    max_concurrency=int(CFG["llm_max_concurrency"]),
+    min_concurrency=int(CFG["llm_min_concurrency"]),
+    max_queue=int(CFG["llm_max_queue"]),
+    queue_timeout_s=float(CFG["llm_queue_timeout_s"]),
+    max_retries=int(CFG["llm_max_retries"]),
+    enabled=bool(CFG["llm_gateway"]),
 )
 
+# qa_chain over-fetches `rerank_candidates` and keeps the best k by this
+# model (loaded on first use; serve_prefork warms it before forking).
+RERANKER = build_reranker(CFG) if CFG["rerank"] else None
+
 
 # ----------------------------
 # 3) Helpers
 # ----------------------------
-def _ctx(docs: List[Any]) -> str:
+def source_info(d: Any) -> Dict[str, Any]:
+    """Source attributes (title, url_or_path, topic, ...) for a chunk, from the in-memory table."""
+    pinned = _PINNED.get()
+    return resolve_source(getattr(d, "metadata", {}) or {}, pinned[2] if pinned else SOURCES)
+
+def _ctx(docs: List[Any], k: Optional[int] = None, snippet_chars: int = 900) -> str:
     """Format top-k documents into a short, citeable context block."""
     parts = []
-    k = int(CFG.get("retrieval_k", 3)) or 3
+    k = int(k or CFG.get("retrieval_k", 3)) or 3
     for i, d in enumerate(docs[:k]):
-        meta = getattr(d, "metadata", {}) or {}
-        title = meta.get("title") or meta.get("source") or "Unknown"
-        sid = meta.get("id", "?")
+        src = source_info(d)
+        title = src.get("title") or src.get("source") or "Unknown"
+        sid = (getattr(d, "metadata", {}) or {}).get("id", "?")
         # keep snippets short to reduce hallucinations/latency
-        snippet = (d.page_content or "")[:900]
+        snippet = (d.page_content or "")[:snippet_chars]
         parts.append(f"[{i+1}] ({title} - id:{sid})\n{snippet}")
     return "\n\n".join(parts)
 
@@ -86,34 +348,212 @@ def refresh_retriever(k: int = None):
     if k is not None:
         CFG["retrieval_k"] = int(k)
     global RETR
-    RETR = VSTORE.as_retriever(search_kwargs={"k": CFG["retrieval_k"]})
+    with _INDEX_LOCK:
+        RETR = VSTORE.as_retriever(search_kwargs={"k": CFG["retrieval_k"]})
+
+def chunk_id(d: Any) -> str:
+    """Stable id for a chunk: source id, page and a short content hash."""
+    meta = getattr(d, "metadata", {}) or {}
+    digest = hashlib.sha1((d.page_content or "").encode("utf-8")).hexdigest()[:8]
+    return f"{meta.get('id', '?')}:{meta.get('page', '-')}:{digest}"
+
+def retrieve(question: str, k: Optional[int] = None) -> List[Any]:
+    """Top-k search; uses the shared retriever unless a different k is asked for."""
+    store, retr, _ = _PINNED.get() or (VSTORE, RETR, SOURCES)
+    with querylog.stage("retrieve", k=int(k or CFG["retrieval_k"])) as sp:
+        if k is None or int(k) == int(CFG["retrieval_k"]):
+            docs = retr.get_relevant_documents(question)
+        else:
+            docs = store.similarity_search(question, k=int(k))
+        sp.set("chunk_ids", [chunk_id(d) for d in docs])
+        querylog.note_retrieved([chunk_id(d) for d in docs])
+        return docs
+
+def retrieve_scored(question: str, k: int) -> List[Any]:
+    """[(doc, relevance)] best first, relevance in Chroma's 0..1-ish convention."""
+    store, _, _ = _PINNED.get() or (VSTORE, RETR, SOURCES)
+    with querylog.stage("retrieve", k=int(k), scored=True) as sp:
+        hits = store.similarity_search_with_relevance_scores(question, k=int(k))
+        sp.set("chunk_ids", [chunk_id(d) for d, _ in hits])
+        querylog.note_retrieved([chunk_id(d) for d, _ in hits])
+        return hits
+
+def retrieve_for_intent(question: str, policy: Dict[str, Any], first: Optional[List[Any]] = None) -> List[Any]:
+    """Top-k for the intent's policy; with `expand`, merge results of related phrasings.
+
+    ``first`` reuses results already retrieved for ``question`` itself.
+    """
+    k = int(policy["retrieval_k"])
+    if not policy["expand"]:
+        return first[:k] if first is not None else retrieve(question, k)
+    merged, seen = [], set()
+    ranked = [
+        first[:k] if (first is not None and q == question) else retrieve(q, k)
+        for q in generate_related_queries(question, 2)
+    ]
+    # interleave so each phrasing's best hits come first
+    for rank in range(k):
+        for docs in ranked:
+            if rank < len(docs) and chunk_id(docs[rank]) not in seen:
+                seen.add(chunk_id(docs[rank]))
+                merged.append(docs[rank])
+    return merged[:k]
+
+def rerank(question: str, docs: List[Any], top_n: int) -> List[Any]:
+    """Best ``top_n`` of ``docs`` by the cross-encoder (docs unchanged when reranking is off)."""
+    if RERANKER is None:
+        return docs[:top_n]
+    with querylog.stage("rerank", top_n=int(top_n), budget_ms=RERANKER.budget_ms) as sp:
+        ranked, info = RERANKER.rerank(question, docs, top_n, key=chunk_id)
+        sp.update(**info, chunk_ids=[chunk_id(d) for d, _ in ranked])
+    return [d for d, _ in ranked]
+
+def _usage(resp) -> Dict[str, int]:
+    """Token counts from a LangChain message (0 when the provider omits them)."""
+    meta = getattr(resp, "usage_metadata", None) or {}
+    if not meta:
+        tu = (getattr(resp, "response_metadata", None) or {}).get("token_usage") or {}
+        meta = {
+            "input_tokens": tu.get("prompt_tokens", 0),
+            "output_tokens": tu.get("completion_tokens", 0),
+        }
+    return {
+        "input_tokens": int(meta.get("input_tokens") or 0),
+        "output_tokens": int(meta.get("output_tokens") or 0),
+    }
+
+def _stream_invoke(prompt: str, kwargs: Dict[str, Any], on_token: Callable[[str], None]) -> ReplayMessage:
+    """LLM.stream, forwarding each text chunk to on_token; returns the whole message."""
+    parts, usage = [], {"input_tokens": 0, "output_tokens": 0}
+    for chunk in LLM.stream(prompt, **kwargs):
+        piece = getattr(chunk, "content", "") or ""
+        if piece:
+            parts.append(piece)
+            on_token(piece)
+        for name, n in _usage(chunk).items():
+            usage[name] += n
+    return ReplayMessage("".join(parts), usage)
+
+def llm_complete(prompt: str, max_tokens: Optional[int] = None, cache: bool = True,
+                 on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Single LLM call site: returns {"text": str, "usage": {...}, "cached": bool}.
+
+    Identical (model, temperature, max_tokens, prompt) calls are served from
+    LLM_CACHE; ``cache=False`` bypasses it for one call. Cache hits report
+    zero token usage since nothing was spent. With ``on_token`` the backend
+    is streamed and each text chunk is passed to it as it arrives (a cache
+    hit arrives as one chunk); raising from it aborts the call. A stream
+    that fails after its first chunk is not retried, so no text is repeated.
+    """
+    kwargs = {"max_tokens": int(max_tokens)} if max_tokens else {}
+    key = prompt_key(CFG["llm_model"], CFG["llm_temperature"], prompt, max_tokens)
+    with querylog.stage("llm.invoke", model=CFG["llm_model"], prompt_chars=len(prompt)) as sp:
+        hit = LLM_CACHE.get(key) if cache else None
+        if hit is not None:
+            sp.set("cache_hit", True)
+            querylog.note_llm_call(cache_hit=True)
+            if on_token:
+                on_token(hit["text"])
+            return {"text": hit["text"], "usage": {"input_tokens": 0, "output_tokens": 0}, "cached": True}
+        gw: Dict[str, Any] = {}
+        streaming = on_token is not None and hasattr(LLM, "stream")
+        sent: List[str] = []  # once text is passed on, a retry would repeat it
+
+        def forward(piece: str) -> None:
+            sent.append(piece)
+            on_token(piece)
+
+        resp = GATEWAY.call(
+            (lambda: _stream_invoke(prompt, kwargs, forward)) if streaming else (lambda: LLM.invoke(prompt, **kwargs)),
+            est_tokens=len(prompt) // 4 + int(max_tokens or 500),
+            actual_tokens=lambda r: sum(_usage(r).values()),
+            info=gw,
+            can_retry=lambda: not sent,
+        )
+        text = getattr(resp, "content", str(resp)) or ""
+        usage = _usage(resp)
+        sp.update(cache_hit=False, streamed=streaming, **gw, **usage)
+        querylog.note_llm_call(cache_hit=False)
+    if cache and text:
+        LLM_CACHE.put(key, CFG["llm_model"], text, usage)
+    return {"text": text, "usage": usage, "cached": False}
 
 
 # ----------------------------
 # 4) Main Q&A function
 # ----------------------------
-def qa_chain(question: str) -> Dict[str, Any]:
-    """Retrieve → build prompt → query LLM → return answer + docs."""
-    docs = RETR.get_relevant_documents(question)
+def qa_chain(
+    question: str,
+    k: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    on_stage: Optional[Callable[[str], None]] = None,
+    docs: Optional[List[Any]] = None,
+) -> Dict[str, Any]:
+    """Retrieve → build prompt → query LLM → return answer + docs.
 
-    if not docs:
-        return {
-            "result": (
-                "No documents found in the vector store. "
-                "Run `python data/process_sources.py` to ingest your sources into ./chroma_db."
-            ),
-            "source_documents": [],
-        }
+    Without ``k``, the question's intent (prompts.classify_intent) picks the
+    retrieval depth, snippet size and query expansion (`adaptive_retrieval`).
+    ``k`` and ``max_tokens`` override ``retrieval_k`` and the model's default
+    completion length (the agent pipeline profiles use both). ``on_stage`` is
+    called with "retrieve" / "generate" as each stage starts; raising from it
+    aborts the request (used for cancellation by jobs.py). ``docs`` are
+    results already retrieved for ``question`` (best first), reused instead
+    of searching again.
+    """
+    intent = classify_intent(question)
+    policy = get_intent_policy(intent) if (k is None and CFG["adaptive_retrieval"]) else None
+    with querylog.logged("standard", question) as qlog, pinned_index(), \
+            tracing.span("qa_chain", intent=intent) as root:
+        qlog.update(intent=intent, trace_id=root.trace_id)
+        if on_stage:
+            on_stage("retrieve")
+        root.set("prefetched", docs is not None)
+        top_k = int(policy["retrieval_k"] if policy else (k or CFG["retrieval_k"]))
+        # with reranking, search wider and let the cross-encoder pick the top_k
+        fetch = max(int(CFG["rerank_candidates"]), top_k) if RERANKER is not None else top_k
+        if docs is not None and len(docs) < fetch:
+            docs = None  # prefetched results are too few to rerank from
+        if policy:
+            docs = retrieve_for_intent(question, {**policy, "retrieval_k": fetch}, first=docs)
+            k = top_k
+            root.update(retrieval_k=k, expand=bool(policy["expand"]))
+        elif docs is not None:
+            docs = docs[:fetch]
+        else:
+            docs = retrieve(question, fetch if fetch != top_k else k)
+        if RERANKER is not None and docs:
+            docs = rerank(question, docs, top_k)
 
-    prompt_tmpl = route_prompt(question)
-    prompt_text = prompt_tmpl.format(
-        question=question,
-        context=_ctx(docs),
-    )
+        if not docs:
+            qlog["chunk_ids"] = []
+            return {
+                "result": (
+                    "No documents found in the vector store. "
+                    "Run `python data/process_sources.py` to ingest your sources into ./chroma_db."
+                ),
+                "source_documents": [],
+                "trace_id": root.trace_id,
+            }
+
+        with querylog.stage("prompt.build") as sp:
+            prompt_tmpl = route_prompt(question)
+            prompt_text = prompt_tmpl.format(
+                question=question,
+                context=_ctx(docs, k, policy["snippet_chars"]) if policy else _ctx(docs, k),
+            )
+            sp.set("prompt_chars", len(prompt_text))
 
-    resp = LLM.invoke(prompt_text)
-    answer = getattr(resp, "content", str(resp))
-    return {"result": answer, "source_documents": docs}
+        if on_stage:
+            on_stage("generate")
+        out = llm_complete(prompt_text, max_tokens=max_tokens)
+        qlog.update(chunk_ids=[chunk_id(d) for d in docs], cached=out["cached"], **out["usage"])
+        return {
+            "result": out["text"],
+            "source_documents": docs,
+            "usage": out["usage"],
+            "intent": intent,
+            "trace_id": root.trace_id,
+        }
 
 
 # ----------------------------
@@ -123,13 +563,25 @@ def healthcheck() -> Dict[str, Any]:
     """Quick status info you can print in a diagnostics tab."""
     try:
         n = VSTORE._collection.count()  # type: ignore[attr-defined]
+        hnsw = {k: v for k, v in (VSTORE._collection.metadata or {}).items() if k.startswith("hnsw:")}  # type: ignore[attr-defined]
     except Exception:
         n = "unknown"
+        hnsw = {}
     return {
         "persist_directory": CFG["persist_directory"],
+        "index_version": INDEX_VERSION,
+        "sources": len(SOURCES),
         "embedding_model": CFG["embedding_model"],
         "llm_model": CFG["llm_model"],
+        "llm_backend": CFG["llm_backend"],
         "retrieval_k": CFG["retrieval_k"],
+        "agent_profile": CFG["agent_profile"],
         "chroma_count": n,
+        "hnsw": hnsw,
         "openai_key_set": bool(os.getenv("OPENAI_API_KEY")),
+        **tracing.stats(),
+        **LLM_CACHE.stats(),
+        **GATEWAY.stats(),
+        **(RERANKER.stats() if RERANKER is not None else {"rerank": False}),
+        **querylog.stats(),
     }
@@ -0,0 +1,126 @@
+# llm_cache.py — Exact-match, prompt-level LLM response cache (SQLite).
+# Keyed by (model, temperature, max_tokens, full prompt) hash and shared by
+# every LLM call site (qa_chain, synthesizer, critic) through
+# langchain_rag.llm_complete. Least-recently-used rows are evicted once the
+# stored text exceeds `max_bytes`.
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    model       TEXT NOT NULL,
+    text        TEXT NOT NULL,
+    usage       TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    created     REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access);
+"""
+
+
+def prompt_key(model: str, temperature: float, prompt: str, max_tokens: Optional[int] = None) -> str:
+    """Hash of everything that determines an LLM completion."""
+    h = hashlib.sha256()
+    h.update(f"{model}\x1f{float(temperature):.3f}\x1f{max_tokens or ''}\x1f".encode("utf-8"))
+    h.update(prompt.encode("utf-8"))
+    return h.hexdigest()
+
+
+class LLMCache:
+    """Thread-safe SQLite response cache with size-based LRU eviction."""
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024, enabled: bool = True):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.enabled = bool(enabled) and os.getenv("LLM_CACHE_BYPASS", "") not in ("1", "true", "yes")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._bytes = 0
+
+    def _db(self) -> sqlite3.Connection:
+        # Opened lazily so a disabled cache never touches the filesystem.
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached {"text", "usage"} for a key, or None (counts a hit/miss)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT text, usage FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            db.commit()
+            self.hits += 1
+        return {"text": row[0], "usage": json.loads(row[1])}
+
+    def put(self, key: str, model: str, text: str, usage: Dict[str, int]) -> None:
+        if not self.enabled:
+            return
+        size = len(text.encode("utf-8")) + 256  # row overhead estimate
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            old = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, text, json.dumps(usage), size, now, now),
+            )
+            self._bytes += size - (old[0] if old else 0)
+            if self._bytes > self.max_bytes:
+                self._evict(db)
+            db.commit()
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        """Drop least-recently-used rows until the cache is at 90% of its budget."""
+        # Other processes may share the file; re-sync before trimming.
+        self._bytes = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        rows = db.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+        doomed = []
+        for key, size in rows:
+            if self._bytes <= target:
+                break
+            doomed.append((key,))
+            self._bytes -= size
+        db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM responses")
+            db.commit()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "llm_cache": self.enabled,
+            "llm_cache_hits": self.hits,
+            "llm_cache_misses": self.misses,
+            "llm_cache_hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "llm_cache_evictions": self.evictions,
+            "llm_cache_mb": round(self._bytes / 1e6, 2),
+        }
@@ -0,0 +1,221 @@
+# llm_gateway.py — Process-wide admission control for LLM calls.
+# Every backend call made by langchain_rag.llm_complete goes through one
+# LLMGateway, which
+#   - queues callers by priority (standard Q&A ahead of multi-agent runs),
+#   - enforces requests/min and tokens/min with token buckets,
+#   - adapts its concurrency limit (AIMD): +1/limit per success, halved on
+#     a 429 or timeout, so a burst backs off together instead of every
+#     session retrying at once,
+#   - retries rate-limited / timed-out calls itself with jittered backoff,
+#   - rejects new callers once the queue is full (GatewayBusy).
+
+import time
+import heapq
+import random
+import threading
+import contextlib
+import contextvars
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+PRIORITIES = {"standard": 0, "multi_agent": 1, "batch": 2}
+
+_PRIORITY: "contextvars.ContextVar[str]" = contextvars.ContextVar("llm_priority", default="standard")
+
+
+@contextlib.contextmanager
+def priority(level: str):
+    """Run LLM calls in this block at the given PRIORITIES level."""
+    if level not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority '{level}' (choose from {', '.join(PRIORITIES)})")
+    token = _PRIORITY.set(level)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+class GatewayBusy(RuntimeError):
+    """The LLM queue is full or the wait exceeded the queue timeout."""
+
+
+def is_overload_error(e: BaseException) -> bool:
+    """429 / rate-limit / timeout errors from OpenAI, httpx or the replay stub."""
+    if isinstance(e, TimeoutError) or getattr(e, "status_code", None) == 429:
+        return True
+    name = type(e).__name__
+    return "RateLimit" in name or "Timeout" in name
+
+
+class TokenBucket:
+    """`per_minute` units refilled continuously, burst up to one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.rate = float(per_minute) / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, n: float) -> float:
+        """Debit n (the level may go negative); returns seconds to wait before proceeding."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level -= min(n, self.capacity)
+            return max(0.0, -self.level / self.rate)
+
+    def adjust(self, delta: float) -> None:
+        """Correct an earlier estimate once the real token count is known."""
+        if self.rate > 0:
+            with self._lock:
+                self.level -= delta
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        rpm: float = 0,
+        tpm: float = 0,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        max_queue: int = 64,
+        queue_timeout_s: float = 60.0,
+        max_retries: int = 3,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = int(max_concurrency)
+        self.min_concurrency = max(1, int(min_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.max_queue = int(max_queue)
+        self.queue_timeout_s = float(queue_timeout_s)
+        self.max_retries = int(max_retries)
+
+        self._cond = threading.Condition()
+        self._heap: list = []           # (priority, seq) of waiting callers
+        self._seq = 0
+        self.in_flight = 0
+        self._last_backoff = 0.0
+        self._waits: "deque[float]" = deque(maxlen=500)
+        self.counters = {"calls": 0, "retries": 0, "overloads": 0, "rejected": 0, "errors": 0}
+
+    def _count(self, name: str) -> None:
+        with self._cond:
+            self.counters[name] += 1
+
+    # ---- concurrency slots ----
+    def _acquire(self, level: str) -> float:
+        t0 = time.monotonic()
+        with self._cond:
+            if len(self._heap) >= self.max_queue:
+                self.counters["rejected"] += 1
+                raise GatewayBusy(f"LLM queue full ({self.max_queue} waiting)")
+            self._seq += 1
+            me = (PRIORITIES[level], self._seq)
+            heapq.heappush(self._heap, me)
+            try:
+                while self._heap[0] != me or self.in_flight >= int(self.limit):
+                    remaining = self.queue_timeout_s - (time.monotonic() - t0)
+                    if remaining <= 0:
+                        self.counters["rejected"] += 1
+                        raise GatewayBusy(f"waited {self.queue_timeout_s:.0f}s for an LLM slot")
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._heap.remove(me)
+                heapq.heapify(self._heap)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._heap)
+            self.in_flight += 1
+            self._cond.notify_all()  # the next waiter may fit too
+        waited = time.monotonic() - t0
+        self._waits.append(waited)
+        return waited
+
+    def _release(self, outcome: str) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if outcome == "overload":
+                # Multiplicative decrease, at most once per second so one burst of
+                # 429s doesn't collapse the limit to the floor.
+                if now - self._last_backoff > 1.0:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self._last_backoff = now
+            elif outcome == "ok":
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / max(self.limit, 1.0))
+            self._cond.notify_all()
+
+    # ---- public ----
+    def call(self, fn: Callable[[], Any], est_tokens: int = 0,
+             actual_tokens: Optional[Callable[[Any], int]] = None,
+             info: Optional[Dict[str, Any]] = None,
+             can_retry: Optional[Callable[[], bool]] = None) -> Any:
+        """Run fn() under the gateway's limits; returns its result.
+
+        ``est_tokens`` is debited from the tokens/min bucket up front and
+        corrected with ``actual_tokens(result)`` afterwards. ``info`` (if
+        given) receives this call's queue_wait_ms and retries. An overload
+        is only retried while ``can_retry()`` (if given) is true, e.g. not
+        after a stream has already passed text on.
+        """
+        if not self.enabled:
+            return fn()
+        level = _PRIORITY.get()
+        self._count("calls")
+        info = info if info is not None else {}
+        info.update(queue_wait_ms=0.0, retries=0)
+        attempt = 0
+        while True:
+            waited = self._acquire(level)
+            wait = max(self.requests.take(1), self.tokens.take(est_tokens))
+            if wait > 0:
+                time.sleep(wait)
+            info["queue_wait_ms"] += round((waited + wait) * 1000, 1)
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_overload_error(e):
+                    self._count("errors")
+                    self._release("error")
+                    raise
+                self._count("overloads")
+                self._release("overload")
+                if attempt >= self.max_retries or (can_retry is not None and not can_retry()):
+                    raise
+                attempt += 1
+                info["retries"] = attempt
+                self._count("retries")
+                time.sleep(min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0))
+                continue
+            self._release("ok")
+            if actual_tokens is not None:
+                self.tokens.adjust(actual_tokens(result) - est_tokens)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            depth = {name: 0 for name in PRIORITIES}
+            by_level = {v: k for k, v in PRIORITIES.items()}
+            for level, _ in self._heap:
+                depth[by_level[level]] += 1
+            waits = sorted(self._waits)
+        p = lambda q: round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 1) if waits else 0.0
+        return {
+            "llm_gateway": self.enabled,
+            "llm_in_flight": self.in_flight,
+            "llm_concurrency_limit": round(self.limit, 2),
+            "llm_queue_depth": sum(depth.values()),
+            "llm_queue_by_priority": depth,
+            "llm_queue_wait_p50_ms": p(0.5),
+            "llm_queue_wait_p95_ms": p(0.95),
+            **{f"llm_{k}": v for k, v in self.counters.items()},
+        }
@@ -0,0 +1,56 @@
+# profiles.py — Multi-agent pipeline depth profiles (used by agents.agent_run).
+# Kept separate from agents.py so the app can list profiles without loading
+# the RAG pipeline (e.g. when it runs as a thin client of server.py).
+
+from typing import Dict, Any, Optional
+from settings import CFG
+
+# Each profile trades answer quality against latency / token cost:
+#   expansions      number of research queries (original + expansions)
+#   retrieval_k     docs fetched per research query
+#   merge_critique  True → one self-checking synthesis call instead of
+#                   synthesizer + critic (saves a full LLM round trip)
+#   max_tokens      per-stage completion budgets (None = model default)
+PIPELINE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "fast": {
+        "label": "⚡ Fast",
+        "expansions": 1,
+        "retrieval_k": 3,
+        "merge_critique": True,
+        "max_tokens": {"research": 300, "synthesis": 450, "critique": None},
+    },
+    "balanced": {
+        "label": "⚖️ Balanced",
+        "expansions": 2,
+        "retrieval_k": 3,
+        "merge_critique": False,
+        "max_tokens": {"research": 400, "synthesis": 500, "critique": 500},
+    },
+    "deep": {
+        "label": "🔬 Deep",
+        "expansions": 3,
+        "retrieval_k": 5,
+        "merge_critique": False,
+        "max_tokens": {"research": None, "synthesis": None, "critique": None},
+    },
+}
+
+DEFAULT_PROFILE = "balanced"
+
+def get_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """Resolve a profile by name (falls back to config.yaml's `agent_profile`).
+
+    `agent_profiles:` in config.yaml may override individual fields, e.g.
+    `agent_profiles: {fast: {retrieval_k: 4}}`.
+    """
+    name = name or CFG.get("agent_profile") or DEFAULT_PROFILE
+    if name not in PIPELINE_PROFILES:
+        raise ValueError(f"Unknown agent profile '{name}' (choose from {', '.join(PIPELINE_PROFILES)})")
+    prof = {**PIPELINE_PROFILES[name], "name": name}
+    override = (CFG.get("agent_profiles") or {}).get(name) or {}
+    for key, val in override.items():
+        if key == "max_tokens" and isinstance(val, dict):
+            prof["max_tokens"] = {**prof["max_tokens"], **val}
+        else:
+            prof[key] = val
+    return prof
@@ -0,0 +1,229 @@
+# profiling.py — Opt-in per-request sampling profiler.
+# While a profiled request runs, a helper thread looks at the request
+# thread's Python stack every `profiling_interval_ms` (sys._current_frames)
+# and counts identical stacks. The result is written to `profiling_dir` as
+# folded stacks ("a;b;c 42" per line), which flamegraph.pl, speedscope and
+# inferno read directly, with a small JSON sidecar (question, trace id,
+# duration).
+#
+# Requests are profiled when asked for (app sidebar toggle, server.py's
+# "sampling_profile": true) or for a `profiling_sample_rate` fraction of
+# traffic. Otherwise profile_request() only makes one comparison — no
+# thread, no sampling.
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import secrets
+import threading
+import contextlib
+import contextvars
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional
+
+from settings import CFG
+
+_ACTIVE: "contextvars.ContextVar[bool]" = contextvars.ContextVar("profiling_active", default=False)
+_REQUESTED: "contextvars.ContextVar[bool]" = contextvars.ContextVar("profiling_requested", default=False)
+
+
+def _where(filename: str) -> str:
+    # "langchain_huggingface/embeddings/huggingface.py" rather than an absolute venv path
+    i = filename.rfind("site-packages" + os.sep)
+    return filename[i + len("site-packages") + 1:] if i >= 0 else os.path.basename(filename)
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval into folded-stack counts."""
+
+    def __init__(self, thread_id: Optional[int] = None, interval_s: float = 0.005, skip_frames: int = 0):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval_s = float(interval_s)
+        self.skip_frames = skip_frames   # outer frames (job runner, server glue) left out
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.duration_s = 0.0
+        self.id = ""
+        self.meta: Dict[str, Any] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        self._t0 = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        labels: Dict[Any, str] = {}
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = f"{_where(code.co_filename)}:{code.co_name}"
+                stack.append(label)
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.counts[";".join(stack[self.skip_frames:])] += 1
+                self.samples += 1
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration_s = time.perf_counter() - self._t0
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.counts.most_common())
+
+
+# ----------------------------
+# Per-request hook
+# ----------------------------
+@contextlib.contextmanager
+def requested(flag: bool = True) -> Iterator[None]:
+    """Ask for the requests in this block to be profiled (read by profile_request and api_client)."""
+    token = _REQUESTED.set(bool(flag))
+    try:
+        yield
+    finally:
+        _REQUESTED.reset(token)
+
+
+def is_requested() -> bool:
+    return _REQUESTED.get()
+
+
+def _depth(frame: Any) -> int:
+    n = 0
+    while frame is not None:
+        n += 1
+        frame = frame.f_back
+    return n
+
+
+@contextlib.contextmanager
+def profile_request(label: str, force: Optional[bool] = None, **meta: Any) -> Iterator[Optional[SamplingProfiler]]:
+    """Profile the block when forced (default: requested()) or sampled; yields the profiler or None.
+
+    Set keys on ``profiler.meta`` inside the block (e.g. the trace id) to
+    store them with the profile; ``profiler.id`` names the saved files.
+    Nested calls inside a profiled block don't start a second profiler.
+    """
+    force = _REQUESTED.get() if force is None else force
+    rate = float(CFG["profiling_sample_rate"] or 0)
+    if _ACTIVE.get() or not (force or (rate > 0 and random.random() < rate)):
+        yield None
+        return
+
+    # the `with` statement's frame becomes the root of every sampled stack
+    caller = sys._getframe(2)
+    prof = SamplingProfiler(interval_s=float(CFG["profiling_interval_ms"]) / 1000.0,
+                            skip_frames=_depth(caller) - 1)
+    prof.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{secrets.token_hex(3)}"
+    prof.meta.update(meta, label=label, sampled=not force)
+    token = _ACTIVE.set(True)
+    prof.start()
+    try:
+        yield prof
+    finally:
+        prof.stop()
+        _ACTIVE.reset(token)
+        save(prof)
+
+
+# ----------------------------
+# Storage
+# ----------------------------
+def save(prof: SamplingProfiler, out_dir: Optional[str] = None) -> Optional[str]:
+    """Write <id>.folded and <id>.json; returns the .folded path (None on I/O errors)."""
+    out_dir = out_dir or CFG["profiling_dir"]
+    path = os.path.join(out_dir, f"{prof.id}.folded")
+    try:
+        os.makedirs(out_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(prof.folded())
+        with open(os.path.join(out_dir, f"{prof.id}.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "id": prof.id,
+                "ts": time.time(),
+                "duration_s": round(prof.duration_s, 3),
+                "samples": prof.samples,
+                "interval_ms": prof.interval_s * 1000,
+                **prof.meta,
+            }, f, ensure_ascii=False, default=str)
+        _prune(out_dir, int(CFG["profiling_keep"]))
+    except OSError:
+        return None
+    return path
+
+
+def _prune(out_dir: str, keep: int) -> None:
+    for meta_path in sorted(glob.glob(os.path.join(out_dir, "*.json")))[:-keep or None]:
+        for p in (meta_path, meta_path[:-5] + ".folded"):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+
+def list_profiles(out_dir: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    """Newest first: the JSON sidecars plus "path" to each .folded file."""
+    out_dir = out_dir or CFG["profiling_dir"]
+    rows = []
+    for meta_path in sorted(glob.glob(os.path.join(out_dir, "*.json")), reverse=True)[:limit]:
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                rows.append({**json.load(f), "path": meta_path[:-5] + ".folded"})
+        except (OSError, ValueError):
+            continue
+    return rows
+
+
+def profile_path(profile_id: str, out_dir: Optional[str] = None) -> Optional[str]:
+    """The .folded file for an id (None if unknown or not a plain id)."""
+    if not profile_id or os.sep in profile_id or profile_id.startswith("."):
+        return None
+    path = os.path.join(out_dir or CFG["profiling_dir"], f"{profile_id}.folded")
+    return path if os.path.exists(path) else None
+
+
+def top_frames(folded: str, limit: int = 15) -> List[Dict[str, Any]]:
+    """Frames by self samples (leaf) with their total (inclusive) samples."""
+    self_n: Counter = Counter()
+    total_n: Counter = Counter()
+    for line in folded.splitlines():
+        stack, _, n = line.rpartition(" ")
+        if not stack:
+            continue
+        frames = stack.split(";")
+        self_n[frames[-1]] += int(n)
+        for fr in set(frames):
+            total_n[fr] += int(n)
+    all_n = sum(self_n.values()) or 1
+    return [
+        {"frame": fr, "self": n, "self_pct": round(100 * n / all_n, 1),
+         "total_pct": round(100 * total_n[fr] / all_n, 1)}
+        for fr, n in self_n.most_common(limit)
+    ]
+
+
+if __name__ == "__main__":
+    # python profiling.py [profile_id]   — list recent profiles, or show one's hottest frames
+    if len(sys.argv) > 1:
+        path = profile_path(sys.argv[1])
+        if path is None:
+            raise SystemExit(f"No profile '{sys.argv[1]}' in {CFG['profiling_dir']}")
+        with open(path, encoding="utf-8") as f:
+            for row in top_frames(f.read(), 25):
+                print(f"{row['self_pct']:5.1f}% self {row['total_pct']:5.1f}% total  {row['frame']}")
+    else:
+        for row in list_profiles():
+            print(f"{row['id']}  {row['duration_s']:7.2f}s  {row['samples']:5d} samples  {row.get('question', '')[:60]}")
@@ -1,5 +1,8 @@
 # prompts.py — CLEAR version
+from typing import Any, Dict, List
+
 from langchain.prompts import PromptTemplate
+from settings import CFG
 
 # -------------------------------------------------------
 #  CLEAR Prompt Philosophy
@@ -132,12 +135,53 @@ SYNTHESIS_PROMPT = PromptTemplate.from_template(SYNTHESIS_TEMPLATE)
 # -------------------------------------------------------
 # Routing Logic
 # -------------------------------------------------------
-def route_prompt(user_q: str):
+INTENT_PROMPTS = {
+    "factual": FACTUAL_PROMPT,
+    "troubleshoot": TROUBLESHOOT_PROMPT,
+    "comparative": COMPARATIVE_PROMPT,
+    "synthesis": SYNTHESIS_PROMPT,
+}
+
+def classify_intent(user_q: str) -> str:
     q = user_q.lower()
     if any(k in q for k in ["why", "cause", "sour", "bitter", "channel", "fix", "troubleshoot"]):
-        return TROUBLESHOOT_PROMPT
+        return "troubleshoot"
     if any(k in q for k in ["difference", "vs", "compare", "comparison"]):
-        return COMPARATIVE_PROMPT
+        return "comparative"
     if any(k in q for k in ["how does", "affect", "impact", "across", "in different"]):
-        return SYNTHESIS_PROMPT
-    return FACTUAL_PROMPT
+        return "synthesis"
+    return "factual"
+
+def route_prompt(user_q: str):
+    return INTENT_PROMPTS[classify_intent(user_q)]
+
+# -------------------------------------------------------
+# Retrieval policy per intent (used by qa_chain when no k is given)
+#   retrieval_k    chunks packed into the context
+#   snippet_chars  characters kept per chunk
+#   expand         also retrieve for related phrasings and merge
+# Factual lookups need one or two short snippets; only comparisons and
+# syntheses pay for a wide context. Override in config.yaml, e.g.
+# `intent_policies: {factual: {retrieval_k: 3}}`.
+# -------------------------------------------------------
+INTENT_POLICIES: Dict[str, Dict[str, Any]] = {
+    "factual":      {"retrieval_k": 2, "snippet_chars": 600, "expand": False},
+    "troubleshoot": {"retrieval_k": 3, "snippet_chars": 800, "expand": False},
+    "comparative":  {"retrieval_k": 5, "snippet_chars": 600, "expand": True},
+    "synthesis":    {"retrieval_k": 5, "snippet_chars": 700, "expand": True},
+}
+
+def get_intent_policy(intent: str) -> Dict[str, Any]:
+    override = (CFG.get("intent_policies") or {}).get(intent) or {}
+    return {**INTENT_POLICIES[intent], **override, "intent": intent}
+
+def generate_related_queries(q: str, n: int = 2) -> List[str]:
+    """Heuristic expansion for coverage without going off-topic (kept small for speed)."""
+    ql = q.lower()
+    if any(k in ql for k in ["why", "cause", "reason", "sour", "bitter", "channel"]):
+        extra = [f"{q} cause", f"{q} how to fix"]
+    elif any(k in ql for k in ["difference", "vs", "compare", "comparison"]):
+        extra = [f"{q} key differences", f"{q} similarities"]
+    else:
+        extra = [f"{q} overview", f"{q} practical tips"]
+    return ([q] + extra)[:max(1, n)]
@@ -0,0 +1,326 @@
+# querylog.py — Structured per-request query log and hot-query analyzer.
+# qa_chain, agent_answer and auto_answer wrap each top-level request in
+# logged(); nested calls (the researcher's qa_chain inside a multi-agent run)
+# fold into the outer request instead of writing their own line. Finished
+# records go to a bounded in-memory queue that a background thread appends
+# to `query_log_path` in batches, rotating the file at `query_log_max_mb`,
+# so the request path never waits on disk. Stage latencies, LLM calls and
+# cache hits are added to the record as the request runs (stage() wraps
+# tracing.span), so they are there with `tracing` off too.
+#
+#   python querylog.py                       # hottest questions, slowest paths, cache potential
+#   python querylog.py --since-hours 24 --top 30
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import hashlib
+import argparse
+import threading
+import contextlib
+import contextvars
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+
+from settings import CFG
+from singleflight import normalize_question
+import tracing
+
+_ACTIVE: "contextvars.ContextVar[Optional[Dict[str, Any]]]" = contextvars.ContextVar("querylog_active", default=None)
+
+# span name passed to stage() → key in the record's stages_ms
+STAGE_SPANS = {
+    "route": "route",
+    "retrieve": "retrieve",
+    "rerank": "rerank",
+    "prompt.build": "prompt",
+    "llm.invoke": "llm",
+    "evidence.compress": "evidence",
+    "research": "research",
+    "synthesize": "synthesize",
+    "critique": "critique",
+    "self_check": "self_check",
+}
+
+
+class QueryLogWriter:
+    """Non-blocking buffered JSONL writer with size-based rotation."""
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024, backups: int = 5,
+                 flush_interval_s: float = 1.0, max_queue: int = 10000):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.backups = int(backups)
+        self.flush_interval_s = float(flush_interval_s)
+        self.q: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self.q.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1  # never block the request path
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-log", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.q.get()]
+            deadline = time.monotonic() + self.flush_interval_s
+            while len(batch) < 1000:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for _ in batch:
+                self.q.task_done()
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in batch))
+            self.written += len(batch)
+        except OSError:
+            self.dropped += len(batch)
+
+    def flush(self, timeout: float = 3.0) -> None:
+        """Wait (bounded) for queued records to hit disk; used at interpreter exit."""
+        deadline = time.monotonic() + timeout
+        while self.q.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"query_log_queue": self.q.qsize(), "query_log_written": self.written,
+                "query_log_dropped": self.dropped}
+
+
+_WRITER = QueryLogWriter(
+    CFG["query_log_path"] or "",
+    max_bytes=int(float(CFG["query_log_max_mb"]) * 1024 * 1024),
+    backups=int(CFG["query_log_backups"]),
+    flush_interval_s=float(CFG["query_log_flush_s"]),
+)
+atexit.register(_WRITER.flush)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: setattr(_WRITER, "_thread", None))
+
+
+def question_hash(question: str) -> str:
+    return hashlib.sha1(normalize_question(question).encode("utf-8")).hexdigest()[:12]
+
+
+@contextlib.contextmanager
+def logged(mode: str, question: str) -> Iterator[Dict[str, Any]]:
+    """Record one top-level request; yields the record dict for the caller to fill in.
+
+    Inside another logged() block (or with `query_log` off) it yields a
+    scratch dict that is never written.
+    """
+    if _ACTIVE.get() is not None or not (CFG["query_log"] and CFG["query_log_path"]):
+        yield {}
+        return
+    rec: Dict[str, Any] = {
+        "ts": round(time.time(), 3),
+        "question": normalize_question(question),
+        "question_hash": question_hash(question),
+        "mode": mode,
+        "stages_ms": {},
+        "retrieved_chunk_ids": [],
+        "llm_calls": 0,
+        "llm_cache_hits": 0,
+    }
+    token = _ACTIVE.set(rec)
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    except BaseException as e:
+        rec["error"] = type(e).__name__
+        raise
+    finally:
+        _ACTIVE.reset(token)
+        rec["latency_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        rec["stages_ms"] = {k: round(v, 1) for k, v in rec["stages_ms"].items()}
+        _WRITER.submit(rec)
+
+
+@contextlib.contextmanager
+def stage(name: str, **attributes: Any) -> Iterator[Any]:
+    """tracing.span(name) that also adds its time to the request's ``stages_ms``.
+
+    Totals are per stage and can nest: a multi-agent "research" includes the
+    "retrieve" and "llm" time of its lookups.
+    """
+    rec = _ACTIVE.get()
+    t0 = time.perf_counter()
+    try:
+        with tracing.span(name, **attributes) as sp:
+            yield sp
+    finally:
+        if rec is not None:
+            key = STAGE_SPANS[name]
+            rec["stages_ms"][key] = rec["stages_ms"].get(key, 0.0) + (time.perf_counter() - t0) * 1000
+
+
+def note_retrieved(chunk_ids: List[str]) -> None:
+    """Add retrieved chunk ids to the request's record (first retrieval order, no repeats)."""
+    rec = _ACTIVE.get()
+    if rec is not None:
+        seen = rec["retrieved_chunk_ids"]
+        seen.extend(c for c in chunk_ids if c not in seen)
+
+
+def note_llm_call(cache_hit: bool) -> None:
+    rec = _ACTIVE.get()
+    if rec is not None:
+        rec["llm_calls"] += 1
+        rec["llm_cache_hits"] += bool(cache_hit)
+
+
+def stats() -> Dict[str, Any]:
+    return {"query_log": bool(CFG["query_log"]), **_WRITER.stats()}
+
+
+# ----------------------------
+# Analyzer
+# ----------------------------
+def load(path: str, since_hours: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Records from the log and its rotated backups, oldest first."""
+    cutoff = time.time() - since_hours * 3600 if since_hours else 0
+    files = sorted((p for p in (f"{path}.{i}" for i in range(1, 100)) if os.path.exists(p)),
+                   key=lambda p: -int(p.rsplit(".", 1)[1]))
+    rows = []
+    for p in files + ([path] if os.path.exists(path) else []):
+        with open(p, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue  # a torn last line after a crash
+                if row.get("ts", 0) >= cutoff:
+                    rows.append(row)
+    return rows
+
+
+def _pct(xs: List[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100 * len(xs)))] if xs else 0.0
+
+
+def analyze(rows: List[Dict[str, Any]], top: int = 20) -> Dict[str, Any]:
+    by_q: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for r in rows:
+        by_q[r["question"]].append(r)
+
+    hottest = sorted(by_q.items(), key=lambda kv: -len(kv[1]))[:top]
+    hot = [{
+        "question": q,
+        "count": len(rs),
+        "share": round(len(rs) / len(rows), 4),
+        "modes": dict(Counter(r["mode"] for r in rs)),
+        "avg_ms": round(sum(r["latency_ms"] for r in rs) / len(rs), 1),
+        # time a precomputed answer would have saved: every ask after the first
+        "saved_s_if_precomputed": round(sum(r["latency_ms"] for r in rs[1:]) / 1000, 1),
+    } for q, rs in hottest]
+
+    paths: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for r in rows:
+        paths[f"{'auto:' if r.get('auto') else ''}{r['mode']}/{r.get('intent') or '-'}"].append(r)
+    slow_paths = []
+    for name, rs in paths.items():
+        stages: Dict[str, float] = defaultdict(float)
+        for r in rs:
+            for s, ms in (r.get("stages_ms") or {}).items():
+                stages[s] += ms
+        lat = [r["latency_ms"] for r in rs]
+        slow_paths.append({
+            "path": name,
+            "n": len(rs),
+            "p50_ms": round(_pct(lat, 50), 1),
+            "p95_ms": round(_pct(lat, 95), 1),
+            "avg_stage_ms": {s: round(v / len(rs), 1) for s, v in sorted(stages.items(), key=lambda kv: -kv[1])},
+        })
+    slow_paths.sort(key=lambda p: -p["p95_ms"])
+
+    repeats = sum(len(rs) - 1 for rs in by_q.values())
+    llm_calls = sum(r.get("llm_calls", 0) for r in rows)
+    llm_hits = sum(r.get("llm_cache_hits", 0) for r in rows)
+    return {
+        "requests": len(rows),
+        "unique_questions": len(by_q),
+        "errors": sum(1 for r in rows if r.get("error")),
+        "hottest": hot,
+        "slowest_paths": slow_paths,
+        "cache": {
+            # a request whose normalized question was asked before could be served from an answer cache
+            "repeat_share": round(repeats / len(rows), 4),
+            "repeat_time_s": round(sum(r["latency_ms"] for rs in by_q.values() for r in rs[1:]) / 1000, 1),
+            "llm_calls": llm_calls,
+            "llm_cache_hit_rate": round(llm_hits / llm_calls, 4) if llm_calls else 0.0,
+        },
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Hottest questions, slowest paths and cache potential from the query log.")
+    ap.add_argument("--log", default=CFG["query_log_path"])
+    ap.add_argument("--since-hours", type=float, default=None)
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args()
+
+    rows = load(args.log, args.since_hours)
+    if not rows:
+        raise SystemExit(f"No requests logged in {args.log}")
+    rep = analyze(rows, args.top)
+    if args.json:
+        json.dump(rep, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+        return
+
+    print(f"{rep['requests']} requests, {rep['unique_questions']} unique questions, {rep['errors']} errors\n")
+    print(f"Hottest questions (top {args.top}):")
+    print(f"  {'n':>5} {'share':>6} {'avg ms':>8} {'saved s':>8}  question")
+    for h in rep["hottest"]:
+        print(f"  {h['count']:5d} {h['share'] * 100:5.1f}% {h['avg_ms']:8.0f} {h['saved_s_if_precomputed']:8.1f}  {h['question'][:70]}")
+
+    print("\nSlowest paths (mode/intent by p95):")
+    for p in rep["slowest_paths"]:
+        stages = ", ".join(f"{s} {ms:.0f}" for s, ms in list(p["avg_stage_ms"].items())[:4])
+        print(f"  {p['path']:28} n={p['n']:<5d} p50={p['p50_ms']:7.0f} ms p95={p['p95_ms']:7.0f} ms  [{stages}]")
+
+    c = rep["cache"]
+    print(f"\nCache potential: {c['repeat_share'] * 100:.1f}% of requests repeat an earlier question "
+          f"({c['repeat_time_s']:.0f} s of pipeline time); LLM cache hit rate {c['llm_cache_hit_rate'] * 100:.1f}% "
+          f"of {c['llm_calls']} calls")
+
+
+if __name__ == "__main__":
+    main()
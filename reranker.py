@@ -0,0 +1,135 @@
+# reranker.py — Local cross-encoder reranking for retrieved chunks.
+# qa_chain over-fetches `rerank_candidates` chunks from the vector store and
+# keeps the few this model scores highest, so the prompt stays at
+# retrieval_k chunks but they are the best of a wider pool. Pairs are scored
+# in batches on CPU (sentence-transformers CrossEncoder, optionally its ONNX
+# backend), and scores are cached per (query hash, chunk id) so repeated
+# questions and overlapping candidate sets skip the model.
+
+import time
+import hashlib
+import threading
+import warnings
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from singleflight import normalize_question
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha1(normalize_question(query).encode("utf-8")).hexdigest()[:16]
+
+
+class CrossEncoderReranker:
+    """Batched cross-encoder scoring with an LRU score cache and latency stats."""
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        batch_size: int = 16,
+        backend: str = "torch",
+        max_length: int = 512,
+        cache_size: int = 4096,
+        budget_ms: float = 150.0,
+    ):
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"Unknown rerank_backend '{backend}' (torch | onnx)")
+        self.model_name = model_name
+        self.batch_size = int(batch_size)
+        self.backend = backend
+        self.max_length = int(max_length)
+        self.cache_size = int(cache_size)
+        self.budget_ms = float(budget_ms)
+        self._model: Any = None
+        self._load_lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._latencies: "deque[float]" = deque(maxlen=500)
+        self.counters = {"calls": 0, "pairs_scored": 0, "cache_hits": 0, "over_budget": 0}
+
+    # ---- model ----
+    def _get_model(self) -> Any:
+        with self._load_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                kwargs: Dict[str, Any] = {"device": "cpu", "max_length": self.max_length}
+                if self.backend == "onnx":
+                    try:
+                        self._model = CrossEncoder(self.model_name, backend="onnx", **kwargs)
+                    except (TypeError, ImportError, ValueError) as e:
+                        # older sentence-transformers or no onnxruntime/optimum installed
+                        warnings.warn(f"ONNX cross-encoder unavailable ({e}); using torch")
+                        self.backend = "torch"
+                if self._model is None:
+                    self._model = CrossEncoder(self.model_name, **kwargs)
+            return self._model
+
+    def warm(self) -> None:
+        """Load the model and run one batch (before forking, or at startup)."""
+        self._get_model().predict([("warm up", "warm up")], batch_size=1, show_progress_bar=False)
+
+    # ---- scoring ----
+    def score(self, query: str, docs: List[Any], key: Callable[[Any], str]) -> Tuple[List[float], int]:
+        """Relevance score per doc (higher is better); returns (scores, cache_hits)."""
+        qh = query_hash(query)
+        keys = [(qh, key(d)) for d in docs]
+        scores: List[Optional[float]] = [None] * len(docs)
+        with self._lock:
+            for i, k in enumerate(keys):
+                if k in self._cache:
+                    self._cache.move_to_end(k)
+                    scores[i] = self._cache[k]
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if missing:
+            pairs = [(query, docs[i].page_content or "") for i in missing]
+            fresh = self._get_model().predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+            with self._lock:
+                for i, s in zip(missing, fresh):
+                    scores[i] = float(s)
+                    self._cache[keys[i]] = float(s)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return [float(s) for s in scores], len(docs) - len(missing)  # type: ignore[arg-type]
+
+    def rerank(self, query: str, docs: List[Any], top_n: int,
+               key: Callable[[Any], str]) -> Tuple[List[Tuple[Any, float]], Dict[str, Any]]:
+        """Best ``top_n`` (doc, score) pairs, plus this call's timing for tracing."""
+        t0 = time.perf_counter()
+        scores, hits = self.score(query, docs, key) if docs else ([], 0)
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)[:int(top_n)]
+        ms = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            self._latencies.append(ms)
+            self.counters["calls"] += 1
+            self.counters["pairs_scored"] += len(docs) - hits
+            self.counters["cache_hits"] += hits
+            self.counters["over_budget"] += ms > self.budget_ms
+        info = {"candidates": len(docs), "cache_hits": hits, "rerank_ms": round(ms, 2),
+                "over_budget": ms > self.budget_ms}
+        return [(docs[i], scores[i]) for i in order], info
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lat = sorted(self._latencies)
+            counters = dict(self.counters)
+        p = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))], 1) if lat else 0.0
+        return {
+            "rerank_model": self.model_name,
+            "rerank_backend": self.backend,
+            "rerank_budget_ms": self.budget_ms,
+            "rerank_p50_ms": p(0.5),
+            "rerank_p95_ms": p(0.95),
+            "rerank_cache_entries": len(self._cache),
+            **{f"rerank_{k}": v for k, v in counters.items()},
+        }
+
+
+def build_reranker(cfg: Dict[str, Any]) -> CrossEncoderReranker:
+    return CrossEncoderReranker(
+        model_name=cfg["rerank_model"],
+        batch_size=int(cfg["rerank_batch_size"]),
+        backend=cfg["rerank_backend"],
+        cache_size=int(cfg["rerank_cache_size"]),
+        budget_ms=float(cfg["rerank_budget_ms"]),
+    )
@@ -0,0 +1,172 @@
+# serve_prefork.py — Pre-forked multi-process server for server.py.
+# The parent loads the embedding model and maps a read-only snapshot of the
+# vector index (index_store.MmapStore) once, freezes the GC so refcount/GC
+# bookkeeping doesn't dirty the shared pages, then forks N workers that all
+# accept on the same socket. Model weights are shared copy-on-write; index
+# vectors and chunk text are shared through memory-mapped files. The parent
+# supervises workers (restarting any that die) and reports per-worker
+# resident / shared / private memory from /proc (Linux).
+#
+#   python serve_prefork.py --workers 8 --port 8000
+#   python serve_prefork.py --workers 4 --report-every 30
+
+import os
+import gc
+import json
+import time
+import signal
+import socket
+import argparse
+from typing import Dict, List
+
+
+def read_memory(pid: int) -> Dict[str, float]:
+    """RSS / PSS / shared / private MB for a process (from smaps_rollup)."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024.0  # kB → MB
+    except OSError:
+        return {}
+    return {
+        "rss_mb": fields.get("Rss", 0.0),
+        "pss_mb": fields.get("Pss", 0.0),
+        "shared_mb": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def print_report(parent: int, workers: List[int]) -> None:
+    rows = [("parent", parent)] + [(f"worker {i}", pid) for i, pid in enumerate(workers)]
+    print(f"\n{'process':10} {'pid':>7} {'RSS MB':>9} {'PSS MB':>9} {'shared MB':>10} {'private MB':>11}")
+    total_pss = 0.0
+    for name, pid in rows:
+        m = read_memory(pid)
+        if not m:
+            print(f"{name:10} {pid:7d}   (memory stats unavailable)")
+            continue
+        total_pss += m["pss_mb"]
+        print(f"{name:10} {pid:7d} {m['rss_mb']:9.1f} {m['pss_mb']:9.1f} {m['shared_mb']:10.1f} {m['private_mb']:11.1f}")
+    # PSS splits shared pages between sharers, so its sum is the real footprint.
+    print(f"{'total PSS':10} {'':7} {'':9} {total_pss:9.1f}", flush=True)
+
+
+def prepare_parent(snapshot_dir: str, refresh_snapshot: bool = False) -> None:
+    """Load everything workers share, swapping VSTORE for a memory-mapped snapshot.
+
+    The snapshot is re-exported when the published index version changed, or
+    always with ``refresh_snapshot``.
+    """
+    import langchain_rag as rag
+    from index_store import export_snapshot, MmapStore, hnsw_settings
+
+    try:
+        with open(os.path.join(snapshot_dir, "snapshot.json")) as f:
+            stale = json.load(f).get("index_version") != rag.INDEX_VERSION
+    except (OSError, ValueError):
+        stale = True
+    if stale or refresh_snapshot:
+        info = export_snapshot(rag.VSTORE._collection, snapshot_dir, hnsw_settings(rag.CFG)["space"], rag.INDEX_VERSION)
+        print(f"Exported index snapshot: {info['count']} chunks → {snapshot_dir}")
+    rag.VSTORE = MmapStore(snapshot_dir, rag.EMB)
+    rag.CFG["index_hot_swap"] = False  # workers serve the snapshot; restart to pick up a new index
+    rag.refresh_retriever()
+    rag.EMB.embed_query("warm up")  # finish lazy model init before forking
+    if rag.RERANKER is not None:
+        rag.RERANKER.warm()  # cross-encoder weights shared copy-on-write too
+
+    import server  # noqa: F401 — build the app (and its imports) in the parent
+
+    gc.collect()
+    gc.freeze()  # move everything to the permanent generation: no COW from GC passes
+
+
+def worker_main(sock: socket.socket, threads_per_worker: int) -> None:
+    import uvicorn
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)  # N workers × all cores would oversubscribe
+    except ImportError:
+        pass
+    import server
+
+    config = uvicorn.Config(server.app, log_level="warning", lifespan="off")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pre-forked server with shared model / index memory.")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--snapshot-dir", default="./.cache/index_snapshot")
+    ap.add_argument("--refresh-snapshot", action="store_true", help="re-export even if the published index version hasn't changed")
+    ap.add_argument("--threads-per-worker", type=int, default=1)
+    ap.add_argument("--report-every", type=float, default=0, help="seconds between memory reports (0 = once)")
+    args = ap.parse_args()
+
+    prepare_parent(args.snapshot_dir, refresh_snapshot=args.refresh_snapshot)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+
+    workers: List[int] = []
+
+    def spawn() -> int:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                worker_main(sock, args.threads_per_worker)
+            finally:
+                os._exit(0)
+        return pid
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(args.workers):
+        workers.append(spawn())
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers (parent pid {os.getpid()})", flush=True)
+
+    time.sleep(3.0)  # let workers import and accept before the first report
+    print_report(os.getpid(), workers)
+    next_report = time.monotonic() + args.report_every if args.report_every else None
+
+    while workers:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            workers.remove(pid)
+            if not stopping:
+                print(f"[prefork] worker {pid} exited; restarting", flush=True)
+                workers.append(spawn())
+            continue
+        if next_report and time.monotonic() >= next_report:
+            print_report(os.getpid(), workers)
+            next_report = time.monotonic() + args.report_every
+        time.sleep(0.5)
+
+
+if __name__ == "__main__":
+    main()
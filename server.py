@@ -0,0 +1,262 @@
+# server.py — Headless HTTP API (ASGI) for qa_chain / agent_run.
+# Runs the RAG pipeline behind a load balancer, independent of the Streamlit
+# UI. Requests go to a bounded worker pool (jobs.JobRunner); when running +
+# queued requests reach `api_max_pending` new ones get 503 + Retry-After (as
+# do requests the LLM gateway turns away), and requests exceeding
+# `api_timeout_s` get 504 and are cancelled at the next pipeline stage.
+#
+#   uvicorn server:app --host 0.0.0.0 --port 8000
+#   LLM_BACKEND=replay uvicorn server:app        # fully local, no OpenAI calls
+#
+#   POST /qa            {"question": "...", "k": 3}            → JSON answer
+#   POST /agent         {"question": "...", "profile": "fast"} → JSON answer
+#   POST /qa/stream     same body → NDJSON: {"event": "stage", ...} … {"event": "result", ...}
+#   POST /agent/stream  same body → NDJSON, plus {"event": "research", "source_documents": [...]}
+#                       and {"event": "draft" | "critique", "token": "..."} as the agents write
+#   POST /auto          {"question": "...", "profile": "fast"} → picks standard or multi-agent
+#   POST /auto/stream   same body → NDJSON (agent events too when escalated)
+#   GET  /health        healthcheck() + pool state
+#   GET  /profiles      recent sampling profiles; GET /profiles/{id} → folded stacks
+#
+# Add "sampling_profile": true to any question body to profile that request
+# (profiling.py); the answer then carries its "profile_id".
+
+import json
+import time
+import asyncio
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from settings import CFG
+from langchain_rag import qa_chain, healthcheck, source_info
+from agents import agent_answer, auto_answer
+from jobs import JobRunner, JobCancelled
+from llm_gateway import GatewayBusy
+from singleflight import get_singleflight, flight_key
+from profiling import profile_request, list_profiles, profile_path
+
+RUNNER = JobRunner(max_workers=int(CFG["api_workers"]), keep_seconds=300)
+FLIGHTS = get_singleflight(CFG["singleflight_lock_dir"])
+MAX_PENDING = int(CFG["api_max_pending"])
+TIMEOUT_S = float(CFG["api_timeout_s"])
+
+app = FastAPI(title="Coffee Learning Portal API")
+
+
+class AskRequest(BaseModel):
+    question: str
+    k: Optional[int] = None
+    profile: Optional[str] = None
+    sampling_profile: bool = False
+
+
+# ----------------------------
+# Pipeline calls (worker threads)
+# ----------------------------
+def serialize_doc(d: Any) -> Dict[str, Any]:
+    return {"page_content": d.page_content, "metadata": dict(d.metadata or {}), "source": source_info(d)}
+
+def _qa_body(req: AskRequest, on_stage: Callable[[str], None]) -> Dict[str, Any]:
+    r = qa_chain(req.question, k=req.k, on_stage=on_stage)
+    return {
+        "result": r["result"],
+        "source_documents": [serialize_doc(d) for d in r.get("source_documents", [])],
+        "usage": r.get("usage"),
+        "trace_id": r.get("trace_id"),
+        "intent": r.get("intent"),
+        "mode": "Standard RAG",
+    }
+
+def _agent_body(req: AskRequest, on_stage: Callable[[str], None],
+                on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    r = agent_answer(req.question, profile=req.profile, on_stage=on_stage, on_event=on_event)
+    return {
+        "result": r["result"],
+        "source_documents": [serialize_doc(d) for d in r["source_documents"]],
+        "usage": r["usage"],
+        "trace_id": r["trace_id"],
+        "stages": r["stats"]["stages"],
+        "mode": "Multi-Agent AI",
+    }
+
+MODE_LABELS = {"standard": "Standard RAG", "multi_agent": "Multi-Agent AI"}
+
+def _auto_body(req: AskRequest, on_stage: Callable[[str], None],
+               on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    r = auto_answer(req.question, profile=req.profile, on_stage=on_stage, on_event=on_event)
+    return {
+        "result": r["result"],
+        "source_documents": [serialize_doc(d) for d in r.get("source_documents", [])],
+        "usage": r.get("usage"),
+        "trace_id": r.get("trace_id"),
+        "routing": r["routing"],
+        "mode": MODE_LABELS[r["mode"]],
+    }
+
+def _profiled(kind: str, req: AskRequest, fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    with profile_request(kind, force=req.sampling_profile, question=req.question) as prof:
+        out = fn()
+        if prof is not None:
+            prof.meta["trace_id"] = out.get("trace_id")
+    return {**out, "profile_id": prof.id} if prof is not None else out
+
+def _coalesced(kind: str, req: AskRequest, on_stage: Callable[[str], None], check: Callable[[], None],
+               coalesce: bool, fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """Concurrent identical requests (same question and params) share one run.
+
+    Streams don't coalesce (``coalesce=False``): a follower would only see
+    the "shared" stage, not the leader's stages, evidence and draft tokens.
+    """
+    run = lambda: _profiled(kind, req, fn)
+    if not (coalesce and CFG["singleflight"]):
+        return run()
+    key = flight_key(kind, req.question, k=req.k, profile=req.profile if kind != "standard" else None)
+    result, shared = FLIGHTS.do(key, run, on_join=lambda: on_stage("shared"), retry_on=(JobCancelled,),
+                                check=check)  # a timed-out follower gives its worker back
+    return {**result, "shared": shared}
+
+def _run_qa(req: AskRequest, on_stage: Callable[[str], None], check: Callable[[], None],
+            coalesce: bool = True) -> Dict[str, Any]:
+    return _coalesced("standard", req, on_stage, check, coalesce, lambda: _qa_body(req, on_stage))
+
+def _run_agent(req: AskRequest, on_stage: Callable[[str], None], check: Callable[[], None],
+               coalesce: bool = True, on_event=None) -> Dict[str, Any]:
+    return _coalesced("multi_agent", req, on_stage, check, coalesce, lambda: _agent_body(req, on_stage, on_event))
+
+def _run_auto(req: AskRequest, on_stage: Callable[[str], None], check: Callable[[], None],
+              coalesce: bool = True, on_event=None) -> Dict[str, Any]:
+    return _coalesced("auto", req, on_stage, check, coalesce, lambda: _auto_body(req, on_stage, on_event))
+
+
+# ----------------------------
+# Admission, timeout, streaming
+# ----------------------------
+def _submit(kind: str, req: AskRequest, fn: Callable[..., Dict[str, Any]], with_events: bool = False,
+            coalesce: bool = True):
+    if not req.question.strip():
+        raise HTTPException(status_code=422, detail="question must not be empty")
+    if RUNNER.pending() >= MAX_PENDING:
+        raise HTTPException(status_code=503, detail="server busy, retry shortly", headers={"Retry-After": "2"})
+    return RUNNER.get(RUNNER.submit(kind, req.question, fn, req, with_events=with_events, with_check=True,
+                                    coalesce=coalesce))
+
+def _error_status(job) -> int:
+    return 503 if isinstance(job.exception, GatewayBusy) else 500
+
+def _finish(job) -> Dict[str, Any]:
+    if job.status == "error":
+        status = _error_status(job)
+        raise HTTPException(status_code=status, detail=job.error,
+                            headers={"Retry-After": "2"} if status == 503 else None)
+    if job.status == "cancelled":
+        raise HTTPException(status_code=504, detail=f"timed out after {TIMEOUT_S:.0f}s")
+    return {**job.result, "job_id": job.id, "elapsed_s": round(job.elapsed, 3)}
+
+async def _answer(kind: str, req: AskRequest, fn: Callable[..., Dict[str, Any]]) -> Dict[str, Any]:
+    job = _submit(kind, req, fn)
+    try:
+        # shield: a timeout must not cancel the worker's future out from under it
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.future)), timeout=TIMEOUT_S)
+    except asyncio.TimeoutError:
+        job.cancel()
+        raise HTTPException(status_code=504, detail=f"timed out after {TIMEOUT_S:.0f}s")
+    return _finish(job)
+
+def _pipeline_event(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if event["event"] == "final":
+        return None  # the "result" line carries it
+    if "source_documents" in event:
+        return {**event, "source_documents": [serialize_doc(d) for d in event["source_documents"]]}
+    return event
+
+def _stream(kind: str, req: AskRequest, fn: Callable[..., Dict[str, Any]]) -> StreamingResponse:
+    job = _submit(kind, req, fn, with_events=kind != "standard", coalesce=False)
+
+    async def events():
+        sent = sent_events = 0
+        sent_text: Dict[str, int] = {}
+        deadline = time.monotonic() + TIMEOUT_S
+        try:
+            while True:
+                finished = job.done  # read first so the last tokens are flushed below
+                for stage, ts in job.stages[sent:]:
+                    sent += 1
+                    yield json.dumps({"event": "stage", "stage": stage, "t": ts}) + "\n"
+                for event in job.events[sent_events:]:
+                    sent_events += 1
+                    out = _pipeline_event(event)
+                    if out is not None:
+                        yield json.dumps(out) + "\n"
+                for name, text in list(job.partial.items()):
+                    if len(text) > sent_text.get(name, 0):
+                        yield json.dumps({"event": name, "token": text[sent_text.get(name, 0):]}) + "\n"
+                        sent_text[name] = len(text)
+                if finished:
+                    break
+                if time.monotonic() > deadline:
+                    job.cancel()
+                    yield json.dumps({"event": "error", "status": 504, "error": f"timed out after {TIMEOUT_S:.0f}s"}) + "\n"
+                    return
+                await asyncio.sleep(0.1)
+            if job.status == "done":
+                yield json.dumps({"event": "result", **_finish(job)}) + "\n"
+            else:
+                yield json.dumps({"event": "error", "status": _error_status(job), "error": job.error or job.status}) + "\n"
+        finally:
+            if not job.done:
+                job.cancel()  # client went away
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+# ----------------------------
+# Routes
+# ----------------------------
+@app.post("/qa")
+async def qa(req: AskRequest) -> Dict[str, Any]:
+    return await _answer("standard", req, _run_qa)
+
+@app.post("/agent")
+async def agent(req: AskRequest) -> Dict[str, Any]:
+    return await _answer("multi_agent", req, _run_agent)
+
+@app.post("/auto")
+async def auto(req: AskRequest) -> Dict[str, Any]:
+    return await _answer("auto", req, _run_auto)
+
+@app.post("/qa/stream")
+async def qa_stream(req: AskRequest) -> StreamingResponse:
+    return _stream("standard", req, _run_qa)
+
+@app.post("/agent/stream")
+async def agent_stream(req: AskRequest) -> StreamingResponse:
+    return _stream("multi_agent", req, _run_agent)
+
+@app.post("/auto/stream")
+async def auto_stream(req: AskRequest) -> StreamingResponse:
+    return _stream("auto", req, _run_auto)
+
+@app.get("/health")
+async def health() -> Dict[str, Any]:
+    return {
+        **healthcheck(),
+        **RUNNER.stats(),
+        **{f"singleflight_{k}": v for k, v in FLIGHTS.stats.items()},
+        "api_workers": int(CFG["api_workers"]),
+        "api_max_pending": MAX_PENDING,
+    }
+
+@app.get("/profiles")
+async def profiles(limit: int = 20) -> Dict[str, Any]:
+    return {"profiles": [{k: v for k, v in p.items() if k != "path"} for p in list_profiles(limit=limit)]}
+
+@app.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def profile(profile_id: str) -> str:
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"no profile '{profile_id}'")
+    with open(path, encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,84 @@
+# settings.py — config.yaml loader shared by every entry point.
+import os
+import yaml
+from typing import Dict, Any
+
+DEFAULT_CFG = {
+    "llm_model": "gpt-4o-mini",                           # fast & economical
+    "llm_temperature": 0.2,
+    "embedding_model": "sentence-transformers/all-MiniLM-L6-v2",
+    "persist_directory": "./chroma_db",
+    "retrieval_k": 3,
+    "adaptive_retrieval": True,                           # per-intent k / snippets (prompts.INTENT_POLICIES)
+    "index_hot_swap": True,                               # pick up newly published index versions
+    "index_check_interval_s": 2,                          # how often to look at CURRENT
+    "index_keep_versions": 2,                             # old versions kept after publishing
+    "chunk_size": 1000,                                   # used at ingest time
+    "chunk_overlap": 200,                                 # used at ingest time
+    "dedup": True,                                        # drop near-duplicate chunks at ingest
+    "dedup_threshold": 0.8,                               # estimated Jaccard over word shingles
+    "agent_profile": "balanced",                          # fast | balanced | deep (agents.py)
+    "answer_mode": "auto",                                # default app mode: auto | standard | multi_agent
+    "auto_min_coverage": 0.6,                             # auto mode: below → evidence looks incomplete
+    "auto_min_spread": 0.05,                              # auto mode: below → no single chunk stands out
+    "mode_log_path": "./logs/mode_decisions.jsonl",       # auto-mode decisions (None = off)
+    "rerank": False,                                      # cross-encoder rerank in qa_chain (reranker.py)
+    "rerank_model": "cross-encoder/ms-marco-MiniLM-L-6-v2",
+    "rerank_candidates": 20,                              # chunks fetched before reranking to retrieval_k
+    "rerank_batch_size": 16,
+    "rerank_backend": "torch",                            # torch | onnx
+    "rerank_cache_size": 4096,                            # cached (query, chunk) scores
+    "rerank_budget_ms": 150,                              # latency budget, reported in spans and /health
+    "evidence_compression": True,                         # dedup + sentence selection for agent prompts
+    "evidence_max_tokens": 700,                           # evidence budget per agent prompt
+    "evidence_dedup_threshold": 0.92,                     # cosine above which excerpts are redundant
+    "tracing": True,                                      # span export (tracing.py)
+    "trace_path": "./traces/spans.jsonl",
+    "query_log": True,                                    # one JSONL record per request (querylog.py)
+    "query_log_path": "./logs/queries.jsonl",
+    "query_log_max_mb": 50,                               # rotate at this size
+    "query_log_backups": 5,                               # rotated files kept (queries.jsonl.1 …)
+    "query_log_flush_s": 1.0,                             # writer batches records this long
+    "profiling_sample_rate": 0.0,                         # fraction of requests profiled (profiling.py)
+    "profiling_interval_ms": 5,                           # stack sampling interval
+    "profiling_dir": "./profiles",                        # folded stacks + JSON sidecars
+    "profiling_keep": 200,                                # newest profiles kept
+    "llm_cache": True,                                    # exact-match response cache
+    "llm_cache_path": "./.cache/llm_cache.sqlite",
+    "llm_cache_max_mb": 64,
+    "llm_backend": "openai",                              # openai | record | replay
+    "llm_recordings": "./recordings/llm.jsonl",
+    "replay_latency_ms": 300,                             # synthetic time to first token
+    "replay_tokens_per_sec": 60,                          # synthetic generation speed
+    "replay_on_miss": "stub",                             # stub | error
+    "replay_rpm_limit": 0,                                # simulate provider 429s (0 = off)
+    "llm_gateway": True,                                  # process-wide LLM admission control
+    "llm_rpm": 500,                                       # requests/min (0 = unlimited)
+    "llm_tpm": 200000,                                    # tokens/min (0 = unlimited)
+    "llm_max_concurrency": 16,                            # adaptive limit ceiling
+    "llm_min_concurrency": 1,                             # adaptive limit floor
+    "llm_max_queue": 64,                                  # waiting calls before GatewayBusy
+    "llm_queue_timeout_s": 60,
+    "llm_max_retries": 3,                                 # on 429 / timeout, with backoff
+    "job_workers": 4,                                     # app background worker pool (jobs.py)
+    "singleflight": True,                                 # coalesce identical concurrent questions
+    "singleflight_lock_dir": None,                        # set → also coalesce across processes
+    "api_url": None,                                      # set → app.py is a thin client of server.py
+    "api_workers": 4,                                     # server.py worker pool
+    "api_max_pending": 16,                                # running + queued before 503
+    "api_timeout_s": 90,                                  # per-request timeout (504)
+}
+
+def load_cfg(path: str = "config.yaml") -> Dict[str, Any]:
+    try:
+        with open(path, "r") as f:
+            data = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        data = {}
+    return {**DEFAULT_CFG, **data}
+
+CFG = load_cfg()
+# Let CI / perf boxes switch backends without editing config.yaml
+CFG["llm_backend"] = os.getenv("LLM_BACKEND", CFG["llm_backend"])
+# Point the app at a running server.py without editing config.yaml
+CFG["api_url"] = os.getenv("COFFEE_API_URL", CFG["api_url"])
@@ -0,0 +1,183 @@
+# singleflight.py — Coalesce identical in-flight questions.
+# When many users ask the same question at once (everyone clicking the same
+# pillar question at the start of a class), the first request runs the
+# pipeline and concurrent duplicates wait for its result instead of repeating
+# the same retrieval and LLM calls. Only requests that overlap in time are
+# coalesced; a request arriving after the leader finished runs again.
+#
+# Within a process this uses threading.Event. With `lock_dir` set, leaders
+# also hold an flock on <lock_dir>/<key>.lock and leave the pickled result
+# next to it, so duplicates in other worker processes (serve_prefork.py,
+# several Streamlit servers on one host) can pick it up.
+
+import os
+import re
+import time
+import pickle
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process coalescing only
+    fcntl = None
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(q: str) -> str:
+    """Case, whitespace and trailing punctuation don't make a different question."""
+    return _SPACES.sub(" ", q.strip().lower()).rstrip(" ?!.")
+
+
+def flight_key(kind: str, question: str, **params: Any) -> str:
+    parts = [kind, normalize_question(question)] + [f"{k}={params[k]}" for k in sorted(params)]
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    def __init__(self, lock_dir: Optional[str] = None, result_ttl_s: float = 30.0, poll_s: float = 0.2):
+        self.lock_dir = lock_dir if (lock_dir and fcntl is not None) else None
+        self.result_ttl_s = float(result_ttl_s)
+        self.poll_s = float(poll_s)
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.stats = {"leaders": 0, "coalesced": 0, "coalesced_cross_process": 0}
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key: str, fn: Callable[[], Any], on_join: Optional[Callable[[], None]] = None,
+           retry_on: Tuple[Type[BaseException], ...] = (),
+           check: Optional[Callable[[], None]] = None) -> Tuple[Any, bool]:
+        """Run fn() once per concurrent key; returns (result, shared).
+
+        ``on_join`` is called when this caller waits on someone else's
+        flight. If the leader fails with one of ``retry_on`` (e.g. its job
+        was cancelled), followers run again instead of inheriting the error.
+        While waiting, followers call ``check()`` every `poll_s`; whatever it
+        raises (e.g. their own job being cancelled) ends the wait.
+        """
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                else:
+                    flight.followers += 1
+            if leader:
+                break
+            if on_join:
+                on_join()
+                on_join = None
+            while not flight.done.wait(self.poll_s):
+                if check:
+                    check()
+            if flight.error is None:
+                with self._lock:
+                    self.stats["coalesced"] += 1
+                return flight.result, True
+            if not isinstance(flight.error, retry_on):
+                raise flight.error
+
+        try:
+            flight.result, shared = self._run(key, fn, on_join, check)
+            return flight.result, shared
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    # ---- cross-process ----
+    def _run(self, key: str, fn: Callable[[], Any], on_join: Optional[Callable[[], None]],
+             check: Optional[Callable[[], None]]) -> Tuple[Any, bool]:
+        if not self.lock_dir:
+            with self._lock:
+                self.stats["leaders"] += 1
+            return fn(), False
+        lock_path = os.path.join(self.lock_dir, f"{key}.lock")
+        result_path = os.path.join(self.lock_dir, f"{key}.pkl")
+        with open(lock_path, "a+") as lf:
+            try:
+                fcntl.flock(lf, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # another process is computing it: wait for its lock, then its result
+                if on_join:
+                    on_join()
+                started = time.time()
+                self._wait_lock(lf, check)
+                shared = self._read(result_path, newer_than=started)
+                if shared is not None:
+                    fcntl.flock(lf, fcntl.LOCK_UN)
+                    with self._lock:
+                        self.stats["coalesced_cross_process"] += 1
+                    return shared[0], True
+            try:
+                with self._lock:
+                    self.stats["leaders"] += 1
+                result = fn()
+                self._write(result_path, result)
+                return result, False
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _wait_lock(self, lf: Any, check: Optional[Callable[[], None]]) -> None:
+        if check is None:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            return
+        while True:
+            try:
+                fcntl.flock(lf, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                check()
+                time.sleep(self.poll_s)
+
+    def _read(self, path: str, newer_than: float) -> Optional[Tuple[Any]]:
+        try:
+            mtime = os.path.getmtime(path)
+            # written by the flight we waited on (not an older one) and still fresh
+            if mtime < newer_than - 1.0 or time.time() - mtime > self.result_ttl_s:
+                return None
+            with open(path, "rb") as f:
+                return (pickle.load(f),)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _write(self, path: str, result: Any) -> None:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump(result, f)
+            os.replace(tmp, path)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            pass  # unpicklable result: other processes just compute their own
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+_SF: Optional[SingleFlight] = None
+_SF_LOCK = threading.Lock()
+
+
+def get_singleflight(lock_dir: Optional[str] = None) -> SingleFlight:
+    """The process-wide instance (created on first use)."""
+    global _SF
+    with _SF_LOCK:
+        if _SF is None:
+            _SF = SingleFlight(lock_dir=lock_dir)
+        return _SF
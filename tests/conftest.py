@@ -0,0 +1,15 @@
+# tests/conftest.py — Run the suite offline from the repo root.
+# Like bench/common.py: config.yaml and ./chroma_db resolve from the repo
+# root, and the pipeline uses the replay LLM backend with the response cache
+# bypassed, so no test needs network access or an API key.
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+os.chdir(ROOT)
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault("LLM_BACKEND", "replay")
+os.environ.setdefault("LLM_CACHE_BYPASS", "1")
@@ -0,0 +1,214 @@
+# tests/test_llm_gateway.py — LLMGateway against the replay backend.
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import llm_gateway
+from llm_gateway import GatewayBusy, LLMGateway, TokenBucket, priority
+import langchain_rag as rag
+from langchain_rag import ReplayLLM, ReplayRateLimited
+
+
+class FakeClock:
+    """monotonic()/sleep() for llm_gateway: sleeping just advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, s):
+        self.slept.append(s)
+        self.now += s
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    monkeypatch.setattr(llm_gateway, "time", SimpleNamespace(monotonic=c.monotonic, sleep=c.sleep))
+    return c
+
+
+def replay(rpm_limit=0):
+    # no recordings file → deterministic stub answers, no synthetic latency
+    return ReplayLLM("/nonexistent/llm.jsonl", latency_ms=0, tokens_per_sec=0, rpm_limit=rpm_limit)
+
+
+# ---- token buckets ----
+def test_token_bucket_refills_and_asks_to_wait(clock):
+    bucket = TokenBucket(60)  # 1 per second, burst 60
+    assert bucket.take(60) == 0.0
+    assert bucket.take(1) == pytest.approx(1.0)
+    clock.now += 3.0  # refilled 3, one of them owed
+    assert bucket.take(1) == 0.0
+    assert bucket.level == pytest.approx(1.0)
+
+
+def test_gateway_sleeps_when_requests_per_minute_spent(clock):
+    llm = replay()
+    gw = LLMGateway(rpm=60, max_retries=0)
+    info = {}
+    for _ in range(60):
+        gw.call(lambda: llm.invoke("What is a ristretto?"), info=info)
+    assert clock.slept == []
+    gw.call(lambda: llm.invoke("What is a ristretto?"), info=info)
+    assert clock.slept == [pytest.approx(1.0)]
+    assert info["queue_wait_ms"] == pytest.approx(1000.0)
+
+
+# ---- AIMD ----
+def test_429_halves_limit_then_successes_add_back(clock):
+    gw = LLMGateway(max_concurrency=8, min_concurrency=1, max_retries=0)
+    limited = replay(rpm_limit=2)
+    gw.call(lambda: limited.invoke("q"))
+    gw.call(lambda: limited.invoke("q"))
+    assert gw.limit == 8.0
+
+    with pytest.raises(ReplayRateLimited):
+        gw.call(lambda: limited.invoke("q"))
+    assert gw.limit == 4.0
+    assert gw.counters["overloads"] == 1
+
+    # a second 429 within the same second doesn't halve again
+    with pytest.raises(ReplayRateLimited):
+        gw.call(lambda: limited.invoke("q"))
+    assert gw.limit == 4.0
+    clock.now += 2.0
+    with pytest.raises(ReplayRateLimited):
+        gw.call(lambda: limited.invoke("q"))
+    assert gw.limit == 2.0
+
+    # additive increase: +1/limit per success, capped at max_concurrency
+    ok = replay()
+    gw.call(lambda: ok.invoke("q"))
+    assert gw.limit == pytest.approx(2.5)
+    gw.call(lambda: ok.invoke("q"))
+    assert gw.limit == pytest.approx(2.9)
+    for _ in range(200):
+        gw.call(lambda: ok.invoke("q"))
+    assert gw.limit == 8.0
+
+
+def test_429_is_retried_with_backoff(clock):
+    gw = LLMGateway(max_concurrency=4, max_retries=2)
+    limited = replay(rpm_limit=1)
+    gw.call(lambda: limited.invoke("q"))
+    info = {}
+    with pytest.raises(ReplayRateLimited):
+        gw.call(lambda: limited.invoke("q"), info=info)
+    assert info["retries"] == 2
+    assert gw.counters["retries"] == 2
+    assert len(clock.slept) == 2  # jittered backoff between attempts
+
+
+
+class FlakyStream(ReplayLLM):
+    """First stream times out after ``fail_after`` chunks; later ones complete."""
+
+    def __init__(self, fail_after):
+        super().__init__("/nonexistent/llm.jsonl", latency_ms=0, tokens_per_sec=0)
+        self.fail_after = fail_after
+        self.attempts = 0
+
+    def stream(self, prompt, **kwargs):
+        self.attempts += 1
+        for i, chunk in enumerate(super().stream(prompt, **kwargs)):
+            if self.attempts == 1 and i == self.fail_after:
+                raise TimeoutError("stream stalled")
+            yield chunk
+
+
+def test_stream_failing_before_any_text_is_retried(clock, monkeypatch):
+    monkeypatch.setattr(rag, "LLM", FlakyStream(fail_after=0))
+    monkeypatch.setattr(rag, "GATEWAY", LLMGateway(max_retries=2))
+    tokens = []
+    out = rag.llm_complete("Why is my espresso sour?", cache=False, on_token=tokens.append)
+    assert rag.LLM.attempts == 2
+    assert "".join(tokens) == out["text"]
+
+
+def test_stream_failing_mid_answer_is_not_replayed(clock, monkeypatch):
+    monkeypatch.setattr(rag, "LLM", FlakyStream(fail_after=3))
+    monkeypatch.setattr(rag, "GATEWAY", LLMGateway(max_retries=2))
+    tokens = []
+    with pytest.raises(TimeoutError):
+        rag.llm_complete("Why is my espresso sour?", cache=False, on_token=tokens.append)
+    assert rag.LLM.attempts == 1
+    assert len(tokens) == 3
+
+# ---- queueing ----
+def _hold_slot(gw):
+    """Occupy the gateway's only slot until the returned event is set."""
+    release, started = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    t = threading.Thread(target=gw.call, args=(blocker,))
+    t.start()
+    assert started.wait(5)
+    return release, t
+
+
+def _wait_for_queue(gw, depth):
+    deadline = time.monotonic() + 5
+    while len(gw._heap) < depth:
+        assert time.monotonic() < deadline, "callers never queued"
+        time.sleep(0.005)
+
+
+def test_waiters_run_in_priority_order():
+    gw = LLMGateway(max_concurrency=1, min_concurrency=1)
+    llm = replay()
+    release, holder = _hold_slot(gw)
+    order = []
+
+    def ask(level):
+        with priority(level):
+            gw.call(lambda: order.append(level) or llm.invoke(level))
+
+    threads = []
+    for n, level in enumerate(["batch", "multi_agent", "standard", "batch"], start=1):
+        t = threading.Thread(target=ask, args=(level,))
+        t.start()
+        threads.append(t)
+        _wait_for_queue(gw, n)
+    assert gw.stats()["llm_queue_by_priority"] == {"standard": 1, "multi_agent": 1, "batch": 2}
+
+    release.set()
+    for t in [holder] + threads:
+        t.join(5)
+    assert order == ["standard", "multi_agent", "batch", "batch"]
+
+
+def test_full_queue_rejects_with_gateway_busy():
+    gw = LLMGateway(max_concurrency=1, min_concurrency=1, max_queue=1)
+    llm = replay()
+    release, holder = _hold_slot(gw)
+    waiter = threading.Thread(target=gw.call, args=(lambda: llm.invoke("q"),))
+    waiter.start()
+    _wait_for_queue(gw, 1)
+
+    with pytest.raises(GatewayBusy, match="queue full"):
+        gw.call(lambda: llm.invoke("q"))
+    assert gw.counters["rejected"] == 1
+
+    release.set()
+    holder.join(5)
+    waiter.join(5)
+    assert gw.stats()["llm_queue_depth"] == 0
+
+
+def test_queue_timeout_raises_gateway_busy():
+    gw = LLMGateway(max_concurrency=1, min_concurrency=1, queue_timeout_s=0.05)
+    release, holder = _hold_slot(gw)
+    with pytest.raises(GatewayBusy, match="waited"):
+        gw.call(lambda: None)
+    release.set()
+    holder.join(5)
+    assert gw._heap == []
@@ -0,0 +1,44 @@
+# tests/test_querylog.py — query log records on the replay backend.
+import json
+
+import pytest
+
+import langchain_rag as rag
+import querylog
+import tracing
+from langchain_rag import ReplayLLM
+
+
+@pytest.fixture(params=[True, False], ids=["tracing", "no-tracing"])
+def log_path(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(rag, "LLM", ReplayLLM("/nonexistent/llm.jsonl", latency_ms=0, tokens_per_sec=0))
+    monkeypatch.setitem(tracing._STATE, "enabled", request.param)
+    path = tmp_path / "queries.jsonl"
+    monkeypatch.setattr(querylog._WRITER, "path", str(path))
+    return path
+
+
+def records(path):
+    querylog._WRITER.flush()
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_standard_record_has_stages_and_llm_counts(log_path):
+    rag.qa_chain("Why does my espresso taste sour?")
+    (rec,) = records(log_path)
+    assert rec["mode"] == "standard"
+    assert {"retrieve", "prompt", "llm"} <= set(rec["stages_ms"])
+    assert rec["retrieved_chunk_ids"]
+    assert rec["llm_calls"] == 1
+
+
+def test_agent_record_folds_in_researcher_lookups(log_path):
+    from agents import agent_answer
+
+    agent_answer("Compare V60 and French press brewing.", profile="fast")
+    (rec,) = records(log_path)
+    assert rec["mode"] == "multi_agent"
+    assert {"research", "retrieve", "llm"} <= set(rec["stages_ms"])
+    assert rec["stages_ms"]["research"] >= rec["stages_ms"]["retrieve"]
+    assert rec["llm_calls"] >= 2
+    assert 0 <= rec["llm_cache_hits"] <= rec["llm_calls"]
@@ -0,0 +1,166 @@
+# tests/test_server.py — server.py end to end on the replay backend.
+import json
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+
+import langchain_rag as rag
+import server
+from langchain_rag import ReplayLLM
+from llm_gateway import LLMGateway
+
+QUESTION = "Why does my espresso taste sour?"
+COMPARE = "Compare V60 and French press brewing."
+
+
+def replay(latency_ms=0):
+    return ReplayLLM("/nonexistent/llm.jsonl", latency_ms=latency_ms, tokens_per_sec=0)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(rag, "LLM", replay())
+    return TestClient(server.app)
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.iter_lines() if line]
+
+
+# ---- JSON endpoints ----
+def test_qa_answers_with_sources(client):
+    r = client.post("/qa", json={"question": QUESTION})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["mode"] == "Standard RAG"
+    assert body["result"].startswith("Replayed stub answer")
+    assert body["source_documents"]
+    assert {"page_content", "metadata", "source"} <= set(body["source_documents"][0])
+    assert body["job_id"] and body["elapsed_s"] >= 0
+
+
+def test_agent_answers_with_stages(client):
+    r = client.post("/agent", json={"question": COMPARE, "profile": "fast"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["mode"] == "Multi-Agent AI"
+    assert body["result"]
+    assert "research" in body["stages"]
+    assert body["source_documents"]
+
+
+def test_empty_question_is_rejected(client):
+    assert client.post("/qa", json={"question": "  "}).status_code == 422
+
+
+# ---- streaming ----
+def test_qa_stream_sends_stages_then_result(client):
+    with client.stream("POST", "/qa/stream", json={"question": QUESTION}) as r:
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        events = ndjson(r)
+    stages = [e["stage"] for e in events if e["event"] == "stage"]
+    assert stages[0] == "started"
+    assert "retrieve" in stages and "generate" in stages
+    assert events[-1]["event"] == "result"
+    assert events[-1]["result"].startswith("Replayed stub answer")
+
+
+def test_agent_stream_sends_research_and_draft_tokens(client):
+    with client.stream("POST", "/agent/stream", json={"question": COMPARE, "profile": "fast"}) as r:
+        events = ndjson(r)
+    kinds = [e["event"] for e in events]
+    assert "research" in kinds
+    research = next(e for e in events if e["event"] == "research")
+    assert research["source_documents"] and "page_content" in research["source_documents"][0]
+    draft = "".join(e["token"] for e in events if e["event"] == "draft")
+    assert draft
+    assert "final" not in kinds  # carried by the result line
+    assert kinds[-1] == "result"
+    assert events[-1]["result"]
+
+
+def test_auto_standard_path_emits_final(client):
+    from agents import auto_answer
+
+    events = []
+    out = auto_answer(QUESTION, profile="fast", on_event=events.append)
+    assert out["mode"] == "standard"
+    assert [e["event"] for e in events] == ["final"]
+    assert events[0]["result"] == out["result"]
+    assert events[0]["source_documents"] == out["source_documents"]
+
+
+# ---- backpressure and timeouts ----
+def test_503_when_worker_pool_is_full(client, monkeypatch):
+    monkeypatch.setattr(server, "MAX_PENDING", 0)
+    r = client.post("/qa", json={"question": QUESTION})
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "2"
+
+
+def test_503_when_llm_gateway_is_busy(client, monkeypatch):
+    monkeypatch.setattr(rag, "GATEWAY", LLMGateway(max_queue=0))  # every call is turned away
+    r = client.post("/qa", json={"question": QUESTION})
+    assert r.status_code == 503
+    assert "queue full" in r.json()["detail"]
+    assert r.headers["retry-after"] == "2"
+
+    with client.stream("POST", "/qa/stream", json={"question": QUESTION}) as r:
+        events = ndjson(r)
+    assert events[-1]["event"] == "error" and events[-1]["status"] == 503
+
+
+def test_504_on_timeout(client, monkeypatch):
+    monkeypatch.setattr(rag, "LLM", replay(latency_ms=1500))
+    monkeypatch.setattr(server, "TIMEOUT_S", 0.2)
+    r = client.post("/qa", json={"question": "How long should a French press steep?"})
+    assert r.status_code == 504
+
+    with client.stream("POST", "/qa/stream", json={"question": "How hot should V60 water be?"}) as r:
+        events = ndjson(r)
+    assert events[-1] == {"event": "error", "status": 504, "error": "timed out after 0s"}
+
+
+# ---- coalescing ----
+def _leader_in_flight(req):
+    """Submit a JSON-route job and wait until it leads a singleflight flight."""
+    leader = server._submit("standard", req, server._run_qa)
+    deadline = time.monotonic() + 5
+    while server.FLIGHTS.in_flight() == 0:
+        assert time.monotonic() < deadline, "leader never started"
+        time.sleep(0.01)
+    return leader
+
+
+def test_cancelled_follower_stops_waiting_for_leader(client, monkeypatch):
+    monkeypatch.setattr(rag, "LLM", replay(latency_ms=1500))
+    req = server.AskRequest(question="How fine should a moka pot grind be?")
+    leader = _leader_in_flight(req)
+    follower = server._submit("standard", req, server._run_qa)
+    deadline = time.monotonic() + 5
+    while follower.stage != "shared":
+        assert time.monotonic() < deadline, "follower never joined"
+        time.sleep(0.01)
+
+    follower.cancel()
+    follower.future.result(timeout=1)
+    assert follower.status == "cancelled"
+    assert not leader.done
+    leader.future.result(timeout=5)
+    assert leader.status == "done"
+
+
+def test_streams_run_their_own_pipeline(client, monkeypatch):
+    monkeypatch.setattr(rag, "LLM", replay(latency_ms=300))
+    leader = _leader_in_flight(server.AskRequest(question=QUESTION))
+    with client.stream("POST", "/qa/stream", json={"question": QUESTION}) as r:
+        events = ndjson(r)
+    stages = [e["stage"] for e in events if e["event"] == "stage"]
+    assert "shared" not in stages
+    assert "retrieve" in stages and "generate" in stages
+    assert "shared" not in events[-1]
+    leader.future.result(timeout=5)
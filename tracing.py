@@ -0,0 +1,253 @@
+# tracing.py — Lightweight nested spans for qa_chain and the agent pipeline.
+# Spans are written as OpenTelemetry (OTLP/JSON) `resourceSpans` lines to a
+# local JSONL file by a background thread, so the request path only pays for
+# a queue.put_nowait().
+
+import os
+import json
+import time
+import atexit
+import queue
+import secrets
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+SERVICE_NAME = "coffee-plp"
+
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar("coffee_current_span", default=None)
+
+_STATE: Dict[str, Any] = {"enabled": True, "path": "./traces/spans.jsonl"}
+
+
+def configure(enabled: bool = True, path: Optional[str] = None) -> None:
+    """Turn tracing on/off and set the JSONL export path (called by langchain_rag)."""
+    _STATE["enabled"] = bool(enabled)
+    if path:
+        _STATE["path"] = path
+
+
+# ----------------------------
+# Span
+# ----------------------------
+class Span:
+    """One timed operation; nests via a context variable."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes",
+                 "start_ns", "end_ns", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "OK"
+        self.error = ""
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def update(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_otel(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": "SPAN_KIND_INTERNAL",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [{"key": k, "value": _otel_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": f"STATUS_CODE_{'ERROR' if self.status == 'ERROR' else 'OK'}"},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"]["message"] = self.error
+        return span
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled; swallows attribute writes."""
+    trace_id = ""
+    span_id = ""
+    duration_ms = 0.0
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def update(self, **attributes: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _otel_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    if isinstance(v, (list, tuple)):
+        return {"arrayValue": {"values": [_otel_value(x) for x in v]}}
+    return {"stringValue": str(v)}
+
+
+# ----------------------------
+# Export (background thread)
+# ----------------------------
+class _Exporter:
+    """Batches finished spans and appends them to a JSONL file off-thread."""
+
+    def __init__(self, max_queue: int = 10000):
+        self.q: "queue.Queue[Span]" = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, span: Span) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self.q.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1  # never block the request path
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.q.get()]
+            while len(batch) < 512:
+                try:
+                    batch.append(self.q.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for _ in batch:
+                self.q.task_done()
+
+    def _write(self, batch: List[Span]) -> None:
+        line = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": "coffee-plp.tracing"}, "spans": [s.to_otel() for s in batch]}],
+            }]
+        }
+        path = _STATE["path"]
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        except OSError:
+            self.dropped += len(batch)
+
+    def flush(self, timeout: float = 2.0) -> None:
+        """Wait (bounded) for queued spans to hit disk; used at interpreter exit."""
+        deadline = time.monotonic() + timeout
+        while self.q.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+_EXPORTER = _Exporter()
+atexit.register(_EXPORTER.flush)
+if hasattr(os, "register_at_fork"):
+    # Threads don't survive fork(); a pre-forked worker (serve_prefork.py)
+    # starts its own exporter on its first span.
+    os.register_at_fork(after_in_child=lambda: setattr(_EXPORTER, "_thread", None))
+
+# Recent traces kept in memory for the app's per-request breakdown panel.
+_RECENT: "OrderedDict[str, List[Span]]" = OrderedDict()
+_RECENT_MAX = 200
+_RECENT_LOCK = threading.Lock()
+
+
+def _record(span: Span) -> None:
+    with _RECENT_LOCK:
+        spans = _RECENT.setdefault(span.trace_id, [])
+        spans.append(span)
+        _RECENT.move_to_end(span.trace_id)
+        while len(_RECENT) > _RECENT_MAX:
+            _RECENT.popitem(last=False)
+    _EXPORTER.submit(span)
+
+
+# ----------------------------
+# Public API
+# ----------------------------
+@contextmanager
+def span(name: str, **attributes: Any):
+    """Time a block as a child of the current span (or start a new trace)."""
+    if not _STATE["enabled"]:
+        yield _NOOP
+        return
+    parent = _CURRENT.get()
+    trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+    s = Span(name, trace_id, parent.span_id if parent is not None else None, attributes)
+    token = _CURRENT.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status = "ERROR"
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _CURRENT.reset(token)
+        _record(s)
+
+
+def current_span():
+    """The innermost active span (a no-op span outside any trace)."""
+    return _CURRENT.get() or _NOOP
+
+
+def get_trace(trace_id: str) -> List[Dict[str, Any]]:
+    """Finished spans of a trace as rows ordered by start time, with nesting depth."""
+    with _RECENT_LOCK:
+        spans = list(_RECENT.get(trace_id, []))
+    by_id = {s.span_id: s for s in spans}
+
+    def depth(s: Span) -> int:
+        d = 0
+        while s.parent_id in by_id:
+            s = by_id[s.parent_id]
+            d += 1
+        return d
+
+    rows = []
+    for s in sorted(spans, key=lambda s: s.start_ns):
+        rows.append({
+            "name": s.name,
+            "depth": depth(s),
+            "duration_ms": round(s.duration_ms, 1),
+            "status": s.status,
+            "attributes": dict(s.attributes),
+        })
+    return rows
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "tracing": _STATE["enabled"],
+        "trace_path": _STATE["path"],
+        "trace_queue": _EXPORTER.q.qsize(),
+        "trace_dropped": _EXPORTER.dropped,
+    }